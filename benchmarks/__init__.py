@@ -0,0 +1,3 @@
+"""
+Пакет с бенчмарками производительности
+"""
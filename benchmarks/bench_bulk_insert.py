@@ -0,0 +1,96 @@
+"""
+Бенчмарк вставки: ORM (db.add + один коммит) против пакетной вставки через Core.
+
+Запуск:
+    python -m benchmarks.bench_bulk_insert --rows 1000000 --batch-size 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import Base
+from models import Expense
+from services.bulk import BulkInserter
+
+CATEGORIES = ["Еда", "Транспорт", "Развлечения", "Жилье", "Здоровье"]
+
+
+def generate_records(rows: int):
+    """
+    Детерминированный генератор тестовых записей.
+    Комментарий уникален: иначе строки повторяются по отпечатку и пропускаются при вставке.
+    """
+    for i in range(rows):
+        day = date(2024, i % 12 + 1, i % 28 + 1)
+        yield {
+            "date": day.isoformat(),
+            "iso_date": day,
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "amount": float(i % 1000 + 1),
+            "comment": f"#{i}",
+        }
+
+
+def make_session(path: str):
+    """Создание новой БД и сессии к ней"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def run_orm(db, rows: int):
+    """Старый путь: объект ORM на каждую строку и один коммит"""
+    for record in generate_records(rows):
+        db.add(Expense(**record))
+    db.commit()
+
+
+def run_bulk(db, rows: int, batch_size: int, atomic: bool):
+    """Новый путь: executemany пакетами"""
+    inserter = BulkInserter(db, batch_size=batch_size, atomic=atomic)
+    for record in generate_records(rows):
+        inserter.add(record)
+    inserter.finish()
+
+
+def measure(name: str, func, rows: int, *args):
+    """Замер одного варианта на свежей БД"""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine, db = make_session(path)
+    try:
+        start = time.perf_counter()
+        func(db, rows, *args)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+        engine.dispose()
+        os.unlink(path)
+    print(f"{name:<24} {elapsed:8.2f} s  {rows / elapsed:12,.0f} rows/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--skip-orm", action="store_true", help="не запускать медленный ORM-вариант")
+    args = parser.parse_args()
+
+    print(f"Строк: {args.rows:,}, размер пакета: {args.batch_size:,}")
+    if not args.skip_orm:
+        measure("ORM db.add", run_orm, args.rows)
+    measure("Core bulk (per batch)", run_bulk, args.rows, args.batch_size, False)
+    measure("Core bulk (atomic)", run_bulk, args.rows, args.batch_size, True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк разбора загрузки: построчный parse_line, последовательный
+iter_records (колоночный разбор) и параллельный iter_records_parallel (пул процессов).
+
+Запуск:
+    python -m benchmarks.bench_parse --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import UploadFile
+
+from benchmarks.bench_bulk_insert import generate_records
+from services.ingest import iter_lines, iter_records, iter_records_parallel, parse_line
+
+
+def make_file(rows: int) -> bytes:
+    """Файл загрузки в формате дата;категория;сумма;комментарий"""
+    lines = (
+        f"{r['date']};{r['category']};{r['amount']};Комментарий {i}"
+        for i, r in enumerate(generate_records(rows))
+    )
+    return "\n".join(lines).encode("utf-8")
+
+
+async def iter_records_per_line(file: UploadFile):
+    """Прежний построчный разбор (эталон для сравнения)"""
+    line_no = 0
+    async for line in iter_lines(file):
+        line_no += 1
+        record, error = parse_line(line)
+        if record is not None or error is not None:
+            yield line_no, record, error
+
+
+async def consume(iterator) -> int:
+    """Прогон итератора записей, возвращает число принятых строк"""
+    accepted = 0
+    async for _, record, _ in iterator:
+        if record is not None:
+            accepted += 1
+    return accepted
+
+
+def measure(name: str, rows: int, make_iterator):
+    """Замер одного варианта"""
+    start = time.perf_counter()
+    accepted = asyncio.run(consume(make_iterator()))
+    elapsed = time.perf_counter() - start
+    assert accepted == rows
+    print(f"{name:<24} {elapsed:8.2f} s  {rows / elapsed:12,.0f} lines/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-bytes", type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args()
+
+    data = make_file(args.rows)
+    print(f"Строк: {args.rows:,}, размер: {len(data) / 1e6:.1f} МБ, CPU: {os.cpu_count()}")
+
+    measure("per-line parse_line", args.rows, lambda: iter_records_per_line(UploadFile(file=BytesIO(data))))
+    measure("sequential", args.rows, lambda: iter_records(UploadFile(file=BytesIO(data))))
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Прогрев: запуск процессов не входит в замер
+            list(executor.map(abs, range(workers)))
+            measure(
+                f"parallel x{workers}", args.rows,
+                lambda: iter_records_parallel(UploadFile(file=BytesIO(data)), args.chunk_bytes, executor, workers),
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Бенчмарк бэкендов PDF: wkhtmltopdf (внешний процесс) против fpdf2 (в процессе).
+
+Запуск:
+    python -m benchmarks.bench_pdf_render --repeat 20 --months 36 --categories 15
+Бэкенд, для которого нет wkhtmltopdf или fpdf2, пропускается.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jinja2 import Environment, FileSystemLoader
+
+from config import TEMPLATES_DIR
+from services.pdf import create_renderer
+
+
+def make_context(months: int, categories: int) -> dict:
+    """Синтетический контекст отчета заданного размера"""
+    month_stats = [
+        {"month": f"{2000 + i // 12:04d}-{i % 12 + 1:02d}", "sum": 1000.0 + i, "avg": 50.0 + i}
+        for i in range(months)
+    ]
+    category_stats = [
+        {"category": f"Категория {i}", "sum": 500.0 + i, "avg": 25.0 + i}
+        for i in range(categories)
+    ]
+    return {
+        "total": sum(row["sum"] for row in month_stats),
+        "avg": 42.0,
+        "month_stats": month_stats,
+        "category_stats": category_stats,
+        "generated_at": "01.01.2024 00:00",
+        "current_year": 2024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--categories", type=int, default=15)
+    args = parser.parse_args()
+
+    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True)
+    context = make_context(args.months, args.categories)
+    print(f"Месяцев: {args.months}, категорий: {args.categories}, повторов: {args.repeat}")
+
+    for backend in ("wkhtmltopdf", "fpdf"):
+        renderer = create_renderer(env, backend)
+        try:
+            renderer.render(context)  # прогрев
+        except Exception as e:
+            print(f"{backend:<12} пропущен: {e}")
+            continue
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            size = len(renderer.render(context))
+        per_pdf = (time.perf_counter() - start) / args.repeat
+        print(f"{backend:<12} {per_pdf * 1000:8.1f} ms/PDF  {size:>9,} байт")
+
+
+if __name__ == "__main__":
+    main()
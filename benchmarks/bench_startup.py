@@ -0,0 +1,78 @@
+"""
+Бенчмарк холодного старта воркера: время импорта main, время запуска приложения
+(lifespan: БД, миграции), первые запросы страниц (компиляция шаблонов) и RSS
+процесса - каждый замер в новом интерпретаторе.
+
+Запуск (из корня проекта - пути к БД и шаблонам относительные):
+    python -m benchmarks.bench_startup --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Код, выполняемый в новом процессе; выводит замеры одной строкой JSON
+CHILD = r"""
+import asyncio, json, resource, sys, time
+unit = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: байты на macOS, КБ на Linux
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+rss_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+async def boot():
+    lifespan = main.app.router.lifespan_context
+    async with lifespan(main.app):
+        pass
+
+asyncio.run(boot())
+ready = time.perf_counter()
+
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    pages = time.perf_counter()
+    for url in ("/", "/upload", "/docs-page"):
+        client.get(url).raise_for_status()
+    pages = time.perf_counter() - pages
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_pages_ms": pages * 1000,
+    "import_rss_mb": rss_import / unit,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+    "pdf_loaded": any(name in sys.modules for name in ("pdfkit", "fpdf", "services.pdf")),
+}))
+"""
+
+
+def measure_once() -> dict:
+    """Один запуск нового интерпретатора"""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        sys.exit("Замер RSS требует модуля resource (Linux/macOS)")
+
+    measure_once()  # прогрев кэшей ОС и байткода
+    runs = [measure_once() for _ in range(args.repeat)]
+    print(f"Запусков: {args.repeat}, медианы:")
+    for key in ("import_ms", "startup_ms", "first_pages_ms", "import_rss_mb", "rss_mb"):
+        print(f"{key:<16} {statistics.median(run[key] for run in runs):10.1f}")
+    print(f"{'pdf_loaded':<16} {runs[-1]['pdf_loaded']!s:>10}")
+
+
+if __name__ == "__main__":
+    main()
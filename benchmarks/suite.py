@@ -0,0 +1,270 @@
+"""
+Набор бенчмарков приложения с сохранением результатов в JSON и сравнением с базой.
+
+Замеры на синтетических данных (benchmarks.synthetic) через HTTP-интерфейс приложения:
+  * upload_rows_per_sec - пропускная способность POST /upload (upload_file);
+  * report_*_ms - медиана задержки /report: холодный (кэш отчетов сброшен),
+    теплый (из кэша) и за период с неполными крайними месяцами;
+  * report_pdf_*_ms - то же для /report/pdf (холодный - без дискового кэша PDF);
+  * peak_rss_mb - пиковый RSS процесса (нет на Windows).
+Приложение работает на временной БД; рабочая БД и кэши не затрагиваются.
+
+Запуск:
+    python -m benchmarks.suite run --rows 100000 --output baseline.json
+    python -m benchmarks.suite run --rows 100000 --baseline baseline.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.15
+Сравнение завершается с кодом 1, если какая-то метрика ухудшилась больше порога.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import routers.reports as reports_router
+from benchmarks.synthetic import DEFAULT_START, write_upload_file
+from config import PDF_BACKEND
+from database import Base, DatabaseWriter, configure_sqlite, get_read_db, get_reader_sessions, get_writer
+from main import app
+from models import Expense
+from services.pdf import create_renderer
+from services.pdf_cache import pdf_cache
+from services.report_cache import report_cache
+from templating import templates
+
+# Метрика -> (единица, что лучше: higher / lower)
+METRICS = {
+    "upload_rows_per_sec": ("rows/s", "higher"),
+    "report_cold_ms": ("ms", "lower"),
+    "report_warm_ms": ("ms", "lower"),
+    "report_period_cold_ms": ("ms", "lower"),
+    "report_pdf_cold_ms": ("ms", "lower"),
+    "report_pdf_warm_ms": ("ms", "lower"),
+    "peak_rss_mb": ("MB", "lower"),
+}
+
+# Параметры данных, без совпадения которых результаты несравнимы
+DATA_PARAMS = ("rows", "categories", "days", "seed")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS процесса в МБ (None, если платформа не сообщает)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает КБ, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def isolated_app(directory: str, pdf_backend: str):
+    """Тестовый клиент приложения с БД и кэшем PDF во временной директории"""
+    db_path = os.path.join(directory, "bench.db")
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    configure_sqlite(engine)
+    Base.metadata.create_all(bind=engine)
+    # Без пула: соединения aiosqlite привязаны к event loop клиента
+    reader_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    configure_sqlite(reader_engine, read_only=True)
+    readers = async_sessionmaker(reader_engine, autoflush=False, expire_on_commit=False)
+    writer = DatabaseWriter(engine)
+
+    async def read_db():
+        async with readers() as db:
+            yield db
+
+    overrides = {get_read_db: read_db, get_reader_sessions: lambda: readers, get_writer: lambda: writer}
+    saved = pdf_cache.directory, reports_router.pdf_renderer
+    app.dependency_overrides.update(overrides)
+    pdf_cache.directory = os.path.join(directory, "pdf_cache")
+    reports_router.pdf_renderer = create_renderer(templates.env, pdf_backend)
+    report_cache.clear()
+    try:
+        with TestClient(app) as client:
+            client.engine = engine
+            yield client
+    finally:
+        for dependency in overrides:
+            app.dependency_overrides.pop(dependency, None)
+        pdf_cache.directory, reports_router.pdf_renderer = saved
+        report_cache.clear()
+        writer.close()
+        engine.dispose()
+
+
+def median_ms(request: Callable[[], object], repeat: int, reset: Callable[[], None] = None) -> float:
+    """Медиана времени запроса в мс; reset выполняется перед каждым замером вне его"""
+    samples = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        response = request()
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return statistics.median(samples)
+
+
+def run_suite(rows: int, categories: int = 10, days: int = 3 * 365, seed: int = 0,
+              repeat: int = 5, pdf_backend: str = PDF_BACKEND) -> dict:
+    """Прогон всех замеров; результат в формате JSON-базы"""
+    meta = {
+        "rows": rows, "categories": categories, "days": days, "seed": seed,
+        "repeat": repeat, "pdf_backend": pdf_backend,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    values = {}
+
+    with tempfile.TemporaryDirectory(prefix="expense-bench-") as directory:
+        upload_path = os.path.join(directory, "expenses.txt")
+        write_upload_file(upload_path, rows, categories=categories, days=days, seed=seed)
+
+        with isolated_app(directory, pdf_backend) as client:
+            with open(upload_path, "rb") as f:
+                start = time.perf_counter()
+                response = client.post("/upload", files={"file": ("expenses.txt", f, "text/plain")})
+                elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            with client.engine.connect() as conn:
+                stored = conn.execute(select(func.count(Expense.id))).scalar_one()
+            if stored != rows:
+                raise RuntimeError(f"Загружено {stored} строк из {rows}")
+            values["upload_rows_per_sec"] = rows / elapsed
+
+            period = {
+                "from": (DEFAULT_START + timedelta(days=days // 6)).isoformat(),
+                "to": (DEFAULT_START + timedelta(days=days * 2 // 3)).isoformat(),
+            }
+            values["report_cold_ms"] = median_ms(lambda: client.get("/report"), repeat, report_cache.clear)
+            values["report_warm_ms"] = median_ms(lambda: client.get("/report"), repeat)
+            values["report_period_cold_ms"] = median_ms(
+                lambda: client.get("/report", params=period), repeat, report_cache.clear,
+            )
+
+            def reset_pdf():
+                report_cache.clear()
+                shutil.rmtree(pdf_cache.directory, ignore_errors=True)
+
+            try:
+                values["report_pdf_cold_ms"] = median_ms(lambda: client.get("/report/pdf"), repeat, reset_pdf)
+                values["report_pdf_warm_ms"] = median_ms(lambda: client.get("/report/pdf"), repeat)
+            except Exception as e:
+                print(f"Замер /report/pdf пропущен ({pdf_backend}): {e}", file=sys.stderr)
+
+        values["peak_rss_mb"] = peak_rss_mb()
+
+    metrics = {
+        name: {"value": values[name], "unit": unit, "better": better}
+        for name, (unit, better) in METRICS.items()
+        if values.get(name) is not None
+    }
+    return {"meta": meta, "metrics": metrics}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """
+    Сравнение результатов с базой по общим метрикам.
+    change - относительное ухудшение (отрицательное - улучшение);
+    regressed - ухудшение больше threshold.
+    """
+    rows = []
+    for name, base in baseline["metrics"].items():
+        if name not in current["metrics"]:
+            continue
+        base_value, value = base["value"], current["metrics"][name]["value"]
+        if base_value == 0:
+            continue
+        change = (value - base_value) / base_value
+        if base["better"] == "higher":
+            change = -change
+        rows.append({
+            "name": name, "unit": base["unit"], "baseline": base_value, "current": value,
+            "change": change, "regressed": change > threshold,
+        })
+    return rows
+
+
+def print_metrics(result: dict):
+    """Таблица метрик одного прогона"""
+    for name, metric in result["metrics"].items():
+        print(f"{name:<24} {metric['value']:14,.1f} {metric['unit']}")
+
+
+def print_comparison(rows: List[dict], threshold: float):
+    """Таблица сравнения с базой"""
+    print(f"{'метрика':<24} {'база':>14} {'сейчас':>14} {'ухудшение':>10}")
+    for row in rows:
+        flag = "  РЕГРЕССИЯ" if row["regressed"] else ""
+        print(f"{row['name']:<24} {row['baseline']:14,.1f} {row['current']:14,.1f} "
+              f"{row['change']:+10.1%}{flag}")
+    print(f"Порог: {threshold:.0%}")
+
+
+def check_against(baseline: dict, current: dict, threshold: float) -> int:
+    """Сравнение с выводом; код завершения 1 при регрессии"""
+    mismatch = [p for p in DATA_PARAMS if baseline["meta"].get(p) != current["meta"].get(p)]
+    if mismatch:
+        print(f"Внимание: различаются параметры данных {', '.join(mismatch)} - результаты несравнимы",
+              file=sys.stderr)
+    rows = compare(baseline, current, threshold)
+    print_comparison(rows, threshold)
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="прогон замеров")
+    run.add_argument("--rows", type=int, default=100_000, help="строк в загрузке (1e4 - 1e7)")
+    run.add_argument("--categories", type=int, default=10)
+    run.add_argument("--days", type=int, default=3 * 365, help="разброс дат в днях")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeat", type=int, default=5, help="повторов каждого замера задержки")
+    run.add_argument("--pdf-backend", default=PDF_BACKEND)
+    run.add_argument("--output", help="файл для сохранения результатов (JSON)")
+    run.add_argument("--baseline", help="база для сравнения после прогона")
+    run.add_argument("--threshold", type=float, default=0.15)
+
+    cmp = commands.add_parser("compare", help="сравнение результатов с базой")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.15, help="допустимое ухудшение (доля)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(check_against(load(args.baseline), load(args.current), args.threshold))
+
+    result = run_suite(args.rows, args.categories, args.days, args.seed, args.repeat, args.pdf_backend)
+    print_metrics(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        sys.exit(check_against(load(args.baseline), result, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
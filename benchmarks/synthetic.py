@@ -0,0 +1,47 @@
+"""
+Детерминированный генератор синтетических расходов для бенчмарков.
+
+Один и тот же seed и параметры разброса дают один и тот же набор строк,
+поэтому замеры разных версий кода сравнимы между собой.
+  * categories - число категорий; популярность убывает как 1/номер (как в живых данных);
+  * days - разброс дат от start (включительно);
+  * суммы - логнормальные, с копейками; 10% дат записаны в формате DD.MM.YYYY.
+Комментарий уникален, поэтому строки не отбрасываются как повторы.
+"""
+import random
+from datetime import date, timedelta
+from typing import Iterator, List
+
+DEFAULT_START = date(2022, 1, 1)
+
+
+def category_names(count: int) -> List[str]:
+    """Названия категорий"""
+    return [f"Категория {i + 1}" for i in range(count)]
+
+
+def generate_expenses(rows: int, categories: int = 10, days: int = 3 * 365,
+                      start: date = DEFAULT_START, seed: int = 0) -> Iterator[dict]:
+    """Записи расходов в формате, который выдает разбор загрузки"""
+    rng = random.Random(seed)
+    names = category_names(categories)
+    weights = [1 / (i + 1) for i in range(categories)]
+    days_list = [start + timedelta(days=i) for i in range(days)]
+
+    for i in range(rows):
+        day = rng.choice(days_list)
+        yield {
+            "date": day.strftime("%d.%m.%Y") if rng.random() < 0.1 else day.isoformat(),
+            "iso_date": day,
+            "category": rng.choices(names, weights)[0],
+            "amount": round(rng.lognormvariate(6, 1), 2),
+            "comment": f"#{i}",
+        }
+
+
+def write_upload_file(path: str, rows: int, **spread) -> int:
+    """Файл загрузки (дата;категория;сумма;комментарий); возвращает размер в байтах"""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for record in generate_expenses(rows, **spread):
+            f.write(f"{record['date']};{record['category']};{record['amount']};{record['comment']}\n")
+        return f.tell()
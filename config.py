@@ -1,12 +1,95 @@
 """
 Конфигурация приложения
 """
+import os
 
 # Пути к файлам и БД
 DB_PATH = "sqlite:///expenses.db"
-PDF_PATH = "report.pdf"
+ASYNC_DB_PATH = "sqlite+aiosqlite:///expenses.db"
 WKHTMLTOPDF_PATH = r"D:\wkhtmltopdf\bin\wkhtmltopdf.exe"
 
-# Директория с шаблонами
+# Директория с шаблонами и дисковый кэш их скомпилированного байткода
 TEMPLATES_DIR = "templates"
+TEMPLATE_CACHE_DIR = "template_cache"
+# Потоковый рендеринг отчета: размер отправляемого блока HTML (байт)
+TEMPLATE_STREAM_CHUNK_SIZE = 16 * 1024
 
+
+# Размер блока чтения загружаемого файла (байт)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Пакетная вставка при загрузке: размер пакета (строк) и режим "всё или ничего".
+# При UPLOAD_ATOMIC = False каждый пакет коммитится отдельно, при True - один
+# коммит в конце загрузки (при ошибке не сохраняется ни одна строка).
+BULK_BATCH_SIZE = 10_000
+UPLOAD_ATOMIC = False
+
+# Кэш данных отчетов (число хранимых вариантов в процессе)
+REPORT_CACHE_SIZE = 32
+
+# Генерация PDF: бэкенд ("wkhtmltopdf" или "fpdf") и число одновременных рендерингов
+PDF_BACKEND = "wkhtmltopdf"
+PDF_MAX_WORKERS = 2
+
+# TTF-шрифты с кириллицей для бэкенда "fpdf"
+PDF_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+PDF_FONT_BOLD_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+# Дисковый кэш готовых PDF: директория и предельный суммарный размер (байт)
+PDF_CACHE_DIR = "pdf_cache"
+PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Настройки SQLite для всех соединений: WAL позволяет читателям не ждать
+# транзакцию записи; cache_size в KiB (отрицательное значение), mmap_size в байтах
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+}
+# Дополнительно для соединений отчетов (только чтение, сортировки в памяти)
+SQLITE_READER_PRAGMAS = {
+    "query_only": "ON",
+    "temp_store": "MEMORY",
+}
+# Размер пула соединений только для чтения
+READER_POOL_SIZE = 5
+
+# Параллельный разбор загрузок в пуле процессов (включается также параметром ?parallel=true;
+# при одном процессе разбора, PARSE_WORKERS = 1, файл разбирается последовательно)
+UPLOAD_PARALLEL = False
+PARSE_WORKERS = os.cpu_count() or 1
+PARSE_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Выгрузка /export: строк за одно чтение курсора (yield_per) и в одном блоке ответа
+EXPORT_BATCH_SIZE = 5_000
+
+# Относительная погрешность квантилей (медиана, p90, p99) в отчетах
+QUANTILE_ACCURACY = 0.01
+
+# Постраничный просмотр /api/expenses: размер страницы по умолчанию и предельный
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Фоновые загрузки (POST /upload/jobs): каталог для файлов в очереди,
+# сколько завершенных задач помнить и сколько текстов ошибок хранить на задачу
+UPLOAD_SPOOL_DIR = "upload_spool"
+JOB_HISTORY_SIZE = 100
+JOB_MAX_ERRORS = 100
+
+# Границы корзин гистограмм времени на /metrics (секунды)
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Журнал медленных SQL-запросов (GET /debug/slow-queries): порог в мс и число хранимых запросов
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_LOG_SIZE = 50
+
+# Отладочные эндпоинты (/debug/...): текст SQL-запросов раскрывает устройство БД,
+# поэтому по умолчанию они не подключаются
+DEBUG_ENDPOINTS = False
+
+# Архивные разделы расходов по годам (python manage.py archive): каталог файлов
+# разделов и число потоков для параллельного чтения разделов в отчетах
+PARTITIONS_DIR = "partitions"
+PARTITION_QUERY_WORKERS = 4
@@ -1,21 +1,162 @@
 """
-Настройка базы данных и сессий SQLAlchemy
+Настройка базы данных и сессий SQLAlchemy.
+
+Схема доступа к SQLite:
+  * WAL и настройки из config.SQLITE_PRAGMAS на каждом соединении;
+  * отчеты читают через отдельный пул соединений только для чтения (aiosqlite);
+  * все записи из обработчиков идут через единственного писателя (DatabaseWriter) -
+    один поток с одним соединением и очередью задач, поэтому писатели не
+    конкурируют за блокировку, а читатели в WAL не ждут запись;
+  * каждый запрос замеряется, медленные - с планом - попадают в журнал
+    (profile_queries, services.query_log).
 """
-from sqlalchemy import create_engine
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from config import DB_PATH
+from config import DB_PATH, ASYNC_DB_PATH, SQLITE_PRAGMAS, SQLITE_READER_PRAGMAS, READER_POOL_SIZE
+from services.metrics import DB_QUERY_DURATION, DB_SLOW_QUERIES
+from services.query_log import SlowQueryLog, explain, slow_query_log
+
+
+def configure_sqlite(engine, read_only: bool = False):
+    """Установка PRAGMA на каждое новое соединение engine"""
+    pragmas = dict(SQLITE_PRAGMAS)
+    if read_only:
+        # journal_mode хранится в файле БД и задается соединениями на запись
+        pragmas.pop("journal_mode", None)
+        pragmas.update(SQLITE_READER_PRAGMAS)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    target = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    event.listen(target, "connect", set_pragmas)
+
+
+def profile_queries(engine, source: str, log: SlowQueryLog = slow_query_log):
+    """
+    Замер каждого запроса engine (db_query_duration_seconds) и запись медленных
+    в журнал вместе с EXPLAIN QUERY PLAN. Для потоковых запросов учитывается
+    только выполнение, без чтения строк.
+    """
+    target = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
 
-# Создание engine
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_DURATION.observe(elapsed, engine=source)
+        if not log.is_slow(elapsed * 1000):
+            return
+
+        DB_SLOW_QUERIES.inc(engine=source)
+        plan = None
+        if not executemany:
+            # Отдельный курсор DBAPI: план не проходит через события и не попадает в замеры
+            explain_cursor = conn.connection.cursor()
+            try:
+                plan = explain(explain_cursor, statement, parameters)
+            except Exception:
+                plan = None
+            finally:
+                explain_cursor.close()
+        log.record(statement, parameters, elapsed * 1000, executemany, plan, source)
+
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    event.listen(target, "after_cursor_execute", after_cursor_execute)
+    event.listen(target, "handle_error", handle_error)
+
+
+# Создание engine (синхронный - для писателя, миграций и служебных команд)
 engine = create_engine(DB_PATH, connect_args={"check_same_thread": False})
+configure_sqlite(engine)
+profile_queries(engine, "writer")
 
 # Фабрика сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Пул соединений только для чтения (aiosqlite) для отчетов
+reader_engine = create_async_engine(ASYNC_DB_PATH, pool_size=READER_POOL_SIZE)
+configure_sqlite(reader_engine, read_only=True)
+profile_queries(reader_engine, "reader")
+ReaderSessionLocal = async_sessionmaker(reader_engine, autoflush=False, expire_on_commit=False)
+
 # Базовый класс для моделей
 Base = declarative_base()
 
 
+class DatabaseWriter:
+    """
+    Единственный писатель в БД.
+    Задачи выполняются по очереди в одном потоке на одном соединении;
+    каждая задача - отдельная транзакция (откат при исключении).
+    Задача получает Connection; TEMP-таблицы этого соединения живут между задачами.
+    Поток запускается при первой задаче, после close() - заново.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._executor = None
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+            return self._executor
+
+    def _run(self, fn: Callable, args: tuple):
+        """Выполнение задачи в потоке писателя"""
+        if self._conn is None:
+            self._conn = self.engine.connect()
+        with self._conn.begin():
+            return fn(self._conn, *args)
+
+    async def run(self, fn: Callable[..., object], *args):
+        """Постановка задачи fn(conn, *args) в очередь и ожидание результата"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._run, fn, args)
+
+    def run_sync(self, fn: Callable[..., object], *args):
+        """То же для синхронного кода"""
+        return self._get_executor().submit(self._run, fn, args).result()
+
+    def close(self):
+        """Закрытие соединения писателя и остановка потока"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+
+        def close_connection():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        executor.submit(close_connection).result()
+        executor.shutdown()
+
+
+db_writer = DatabaseWriter(engine)
+
+
 def get_db():
     """
     Dependency для получения сессии БД.
@@ -28,8 +169,32 @@ def get_db():
         db.close()
 
 
+async def get_read_db():
+    """
+    Dependency для асинхронной сессии только для чтения.
+    Ожидание ввода-вывода отдает управление event loop.
+    """
+    async with ReaderSessionLocal() as db:
+        yield db
+
+
+def get_reader_sessions() -> async_sessionmaker:
+    """
+    Dependency для фабрики сессий только для чтения.
+    Нужна потоковым ответам: они читают БД уже после выхода из обработчика,
+    когда сессия из get_read_db закрыта.
+    """
+    return ReaderSessionLocal
+
+
+def get_writer() -> DatabaseWriter:
+    """Dependency для доступа к писателю БД"""
+    return db_writer
+
+
 def init_db():
-    """Создание всех таблиц в БД"""
+    """Создание всех таблиц в БД и применение миграций"""
     from models import Expense  # импорт здесь для избежания циклических зависимостей
+    from migrations import run_migrations
     Base.metadata.create_all(bind=engine)
-
+    run_migrations(engine)
@@ -1,30 +1,58 @@
 """
-Главный модуль FastAPI приложения для учета расходов
+Главный модуль FastAPI приложения для учета расходов.
+
+Импорт модуля не обращается к БД и диску: таблицы, миграции и кэш шаблонов
+готовятся при старте приложения (lifespan), а при остановке завершаются
+фоновые загрузки и закрываются соединения.
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
-from database import init_db
-from config import TEMPLATES_DIR
-from routers import upload, reports
+from config import DEBUG_ENDPOINTS
+from database import db_writer, init_db, reader_engine
+from routers import upload, reports, export, expenses, metrics, debug
+from services.ingest import shutdown_process_pool
+from services.jobs import job_manager
+from services.metrics import MetricsMiddleware
+from services.partitions import partition_set
+from templating import enable_bytecode_cache, templates
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка воркера"""
+    init_db()
+    enable_bytecode_cache()
+    yield
+    # Сначала фоновые загрузки: они пишут через db_writer
+    job_manager.shutdown()
+    shutdown_process_pool()
+    db_writer.close()
+    await reader_engine.dispose()
+    partition_set.dispose()
+
 
 # === Инициализация приложения ===
 app = FastAPI(
     title="Expense Tracker",
     description="Приложение для учета расходов с генерацией отчетов",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
-# Инициализация шаблонов
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
-
-# Инициализация базы данных
-init_db()
+# Учет времени и статусов всех запросов для /metrics
+app.add_middleware(MetricsMiddleware)
 
 # === Подключение роутеров ===
 app.include_router(upload.router, tags=["Upload"])
 app.include_router(reports.router, tags=["Reports"])
+app.include_router(export.router, tags=["Export"])
+app.include_router(expenses.router, tags=["API"])
+app.include_router(metrics.router, tags=["Metrics"])
+if DEBUG_ENDPOINTS:
+    app.include_router(debug.router, tags=["Debug"])
 
 
 # === Главная страница ===
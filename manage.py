@@ -0,0 +1,62 @@
+"""
+Служебные команды приложения.
+
+Использование:
+    python manage.py migrate
+    python manage.py rebuild-rollup
+    python manage.py archive --before 2024 [--vacuum]
+"""
+import argparse
+
+from database import engine, init_db
+from services.partitions import archive_before
+from services.rollup import rebuild_rollup
+
+
+def cmd_migrate(args):
+    """Создание таблиц и применение миграций (в т.ч. заполнение iso_date)"""
+    init_db()
+    print("Миграции применены")
+
+
+def cmd_rebuild_rollup(args):
+    """Пересчет сводной таблицы по месяцам и категориям из таблицы расходов"""
+    init_db()
+    with engine.begin() as conn:
+        rebuild_rollup(conn)
+    print("Сводная таблица пересчитана")
+
+
+def cmd_archive(args):
+    """Перенос закрытых годов в архивные разделы (неизменяемые файлы, новые строки пишутся в их копии)"""
+    init_db()
+    moved = archive_before(engine, args.before)
+    for year, rows in moved.items():
+        print(f"{year}: перенесено строк: {rows}")
+    if not moved:
+        print("Нет строк для переноса")
+    if args.vacuum:
+        # Освобожденные страницы возвращаются ОС; VACUUM ждет конца чтений
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("Файл БД сжат")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные команды Expense Tracker")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("migrate", help=cmd_migrate.__doc__).set_defaults(func=cmd_migrate)
+    subparsers.add_parser("rebuild-rollup", help=cmd_rebuild_rollup.__doc__).set_defaults(func=cmd_rebuild_rollup)
+
+    archive = subparsers.add_parser("archive", help=cmd_archive.__doc__)
+    archive.add_argument("--before", type=int, required=True, help="первый год, остающийся в основной таблице")
+    archive.add_argument("--vacuum", action="store_true", help="сжать файл БД после переноса")
+    archive.set_defaults(func=cmd_archive)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
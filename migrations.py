@@ -0,0 +1,161 @@
+"""
+Миграции схемы БД.
+Каждая миграция идемпотентна и выполняется при старте приложения (init_db),
+а также может быть запущена вручную: python manage.py migrate
+"""
+from sqlalchemy import Date, LargeBinary, bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from config import BULK_BATCH_SIZE
+from models import Expense, ExpenseRollup, normalize_date, row_fingerprint
+from services.partitions import partition_set
+from services.rollup import rebuild_rollup
+
+
+def add_iso_date(conn: Connection):
+    """Добавление колонки iso_date, заполнение существующих строк и индекс"""
+    columns = {c["name"] for c in inspect(conn).get_columns(Expense.__tablename__)}
+    if "iso_date" not in columns:
+        conn.execute(text("ALTER TABLE expenses ADD COLUMN iso_date DATE"))
+
+    # Заполнение пакетами по id, чтобы не держать всю таблицу в памяти
+    table = Expense.__table__
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.date)
+            .where(table.c.iso_date.is_(None), table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BULK_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = []
+        for row in rows:
+            try:
+                params.append({"b_id": row.id, "b_iso_date": normalize_date(row.date)})
+            except ValueError:
+                # Строки с нераспознанной датой остаются с NULL
+                continue
+        if params:
+            conn.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(iso_date=bindparam("b_iso_date", type_=Date)),
+                params,
+            )
+
+    for index in table.indexes:
+        if "iso_date" in index.columns.keys():
+            index.create(conn, checkfirst=True)
+
+
+def add_fingerprint(conn: Connection):
+    """
+    Добавление колонки fingerprint, заполнение существующих строк и уникальный индекс.
+    Повторы среди старых строк не удаляются: отпечаток остается только у первой
+    из них, у остальных - NULL.
+    """
+    table = Expense.__table__
+    columns = {c["name"] for c in inspect(conn).get_columns(Expense.__tablename__)}
+    if "fingerprint" not in columns:
+        conn.execute(text("ALTER TABLE expenses ADD COLUMN fingerprint BLOB"))
+
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(table.c.id, table.c.date, table.c.iso_date, table.c.category,
+                       table.c.amount, table.c.comment)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(BULK_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            conn.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(fingerprint=bindparam("b_fingerprint", type_=LargeBinary)),
+                [
+                    {
+                        "b_id": row.id,
+                        "b_fingerprint": row_fingerprint(row.iso_date or row.date, row.category,
+                                                         row.amount, row.comment),
+                    }
+                    for row in rows
+                ],
+            )
+
+        first_ids = select(func.min(table.c.id)).group_by(table.c.fingerprint)
+        conn.execute(update(table).where(table.c.id.not_in(first_ids)).values(fingerprint=None))
+
+    for index in table.indexes:
+        if "fingerprint" in index.columns.keys():
+            index.create(conn, checkfirst=True)
+
+
+def autoincrement_ids(conn: Connection):
+    """
+    Пересоздание expenses с AUTOINCREMENT: без него SQLite выдает новым строкам
+    id, освободившиеся после переноса строк в архивные разделы. Счетчик id
+    начинается после наибольшего id как в expenses, так и в разделах.
+    """
+    schema = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'expenses'"
+    )).scalar()
+    if "AUTOINCREMENT" in schema.upper():
+        return
+
+    table = Expense.__table__
+    columns = ", ".join(column.name for column in table.columns)
+    conn.execute(text("ALTER TABLE expenses RENAME TO expenses_old"))
+    # Индексы переименованной таблицы сохраняют имена - освобождаем их для новой
+    for index in inspect(conn).get_indexes("expenses_old"):
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    table.create(conn)
+    conn.execute(text(f"INSERT INTO expenses ({columns}) SELECT {columns} FROM expenses_old"))
+    conn.execute(text("DROP TABLE expenses_old"))
+
+    last_id = max([conn.execute(select(func.max(table.c.id))).scalar() or 0]
+                  + [partition_set.max_id(year) for year in partition_set.years()])
+    if last_id:
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'expenses'"))
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('expenses', :seq)"),
+                     {"seq": last_id})
+
+
+def add_rollup_sketches(conn: Connection):
+    """Колонка скетчей квантилей в сводной таблице; скетчи строятся пересчетом сводки"""
+    columns = {c["name"] for c in inspect(conn).get_columns(ExpenseRollup.__tablename__)}
+    if "sketch" in columns:
+        return
+    conn.execute(text("ALTER TABLE expense_rollup ADD COLUMN sketch BLOB"))
+    if conn.execute(select(ExpenseRollup.month).limit(1)).first():
+        rebuild_rollup(conn)
+
+
+def init_rollup(conn: Connection):
+    """Первичное заполнение сводной таблицы для БД, созданной до ее появления"""
+    has_rollup = conn.execute(select(ExpenseRollup.month).limit(1)).first()
+    has_expenses = conn.execute(select(Expense.id).limit(1)).first()
+    if has_expenses and not has_rollup:
+        rebuild_rollup(conn)
+
+
+def create_indexes(conn: Connection):
+    """Индексы, добавленные в модель после создания таблицы"""
+    for index in Expense.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [add_iso_date, add_fingerprint, autoincrement_ids, create_indexes, add_rollup_sketches, init_rollup]
+
+
+def run_migrations(engine: Engine):
+    """Применение всех миграций в одной транзакции"""
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
@@ -1,20 +1,121 @@
 """
 Модели базы данных
 """
-from sqlalchemy import Column, Integer, String, Float
+import hashlib
+from datetime import date, datetime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, LargeBinary, event
+from sqlalchemy.orm import validates
 from database import Base
 
+# Форматы дат, принимаемые во входных файлах
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y")
+
+
+def normalize_date(value: str) -> date:
+    """Приведение даты (YYYY-MM-DD или DD.MM.YYYY) к datetime.date"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Неизвестный формат даты: {value}")
+
+
+def row_fingerprint(day, category: str, amount: float, comment) -> bytes:
+    """
+    Отпечаток строки расхода для поиска повторов: первые 16 байт SHA-256 от
+    (каноническая дата, категория, сумма, комментарий). 128 бит достаточно,
+    чтобы случайные совпадения были невероятны, а короткий ключ заметно
+    дешевле длинной hex-строки при вставке в уникальный индекс.
+    day - datetime.date (или исходная строка, если дата не распознана);
+    пустой и отсутствующий комментарий считаются одинаковыми.
+    """
+    raw = "\x1f".join((str(day), category, repr(float(amount)), comment or ""))
+    return hashlib.sha256(raw.encode("utf-8")).digest()[:16]
+
 
 class Expense(Base):
     """Модель расхода"""
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Группировка по месяцам и фильтр по диапазону дат идут по индексу
+        Index("ix_expenses_iso_date_category", "iso_date", "category"),
+        # Постраничный просмотр /api/expenses: ключ (iso_date, id) - id неявно
+        # завершает каждый индекс SQLite, поэтому порядок дается индексом без сортировки
+        Index("ix_expenses_iso_date", "iso_date"),
+        Index("ix_expenses_category_iso_date", "category", "iso_date"),
+        # Повторно загруженные строки пропускаются (INSERT ... ON CONFLICT DO NOTHING)
+        Index("ux_expenses_fingerprint", "fingerprint", unique=True),
+        # id не переиспользуются после удаления строк: строки, перенесенные
+        # в архивные разделы (services.partitions), сохраняют свои id
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(String, nullable=False)
     category = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
     comment = Column(String, nullable=True)
+    # Каноническая дата (заполняется при загрузке, хранится в ISO-формате)
+    iso_date = Column(Date, nullable=True)
+    # Отпечаток строки (row_fingerprint); NULL у дублей, найденных в старых данных
+    fingerprint = Column(LargeBinary(16), nullable=True)
+
+    @validates("date")
+    def _sync_iso_date(self, key, value):
+        """Заполнение iso_date при установке исходной даты через ORM"""
+        try:
+            self.iso_date = normalize_date(value)
+        except (TypeError, ValueError):
+            self.iso_date = None
+        return value
     
     def __repr__(self):
         return f"<Expense(id={self.id}, date={self.date}, category={self.category}, amount={self.amount})>"
 
+
+@event.listens_for(Expense, "before_insert")
+def _fill_fingerprint(mapper, connection, target):
+    """Отпечаток для строк, добавляемых через ORM"""
+    if target.fingerprint is None:
+        target.fingerprint = row_fingerprint(
+            target.iso_date or target.date, target.category, target.amount, target.comment,
+        )
+
+
+class ExpenseRollup(Base):
+    """Агрегаты расходов по месяцу и категории (обновляются при загрузке)"""
+    __tablename__ = "expense_rollup"
+
+    month = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    row_count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+    min_amount = Column(Float, nullable=True)
+    max_amount = Column(Float, nullable=True)
+    # Скетч квантилей сумм группы (services.sketch.QuantileSketch.to_bytes)
+    sketch = Column(LargeBinary, nullable=True)
+
+    def __repr__(self):
+        return f"<ExpenseRollup(month={self.month}, category={self.category}, total={self.total})>"
+
+
+class DataVersion(Base):
+    """Версия данных: счетчик, увеличиваемый в каждой транзакции, меняющей расходы"""
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class UploadedFile(Base):
+    """Загруженный файл: SHA-256 содержимого для пропуска повторных загрузок"""
+    __tablename__ = "uploaded_files"
+
+    sha256 = Column(String(64), primary_key=True)
+    filename = Column(String, nullable=True)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    uploaded_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<UploadedFile(sha256={self.sha256}, filename={self.filename})>"
@@ -0,0 +1,27 @@
+"""
+Роутер отладочных эндпоинтов (подключается при config.DEBUG_ENDPOINTS = True)
+"""
+from fastapi import APIRouter
+
+from services.query_log import slow_query_log
+
+router = APIRouter()
+
+
+@router.get("/debug/slow-queries")
+async def slow_queries():
+    """
+    Последние медленные SQL-запросы с планами, самые долгие первыми.
+    Значения параметров (данные пользователей) не отдаются - только их число.
+    """
+    queries = [
+        {key: value for key, value in query.items() if key != "parameters"}
+        for query in slow_query_log.worst()
+    ]
+    return {"threshold_ms": slow_query_log.threshold_ms, "queries": queries}
+
+
+@router.delete("/debug/slow-queries", status_code=204)
+async def clear_slow_queries():
+    """Очистка журнала медленных запросов"""
+    slow_query_log.clear()
@@ -0,0 +1,51 @@
+"""
+Роутер API для просмотра отдельных расходов
+"""
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_read_db
+from config import API_PAGE_SIZE, API_MAX_PAGE_SIZE
+from services.listing import decode_cursor, encode_cursor, expense_to_dict, fetch_page
+
+router = APIRouter()
+
+
+@router.get("/api/expenses")
+async def list_expenses(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    order: Literal["asc", "desc"] = "asc",
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Список расходов, упорядоченный по (дата, id), с фильтрами.
+    Следующая страница - тот же запрос с cursor=next_cursor из ответа;
+    next_cursor = null на последней странице.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    expenses = await fetch_page(db, date_from, date_to, category, min_amount, max_amount,
+                                after, limit, descending=order == "desc")
+
+    next_cursor = None
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        last = expenses[-1]
+        next_cursor = encode_cursor(last.iso_date, last.id)
+
+    return {
+        "items": [expense_to_dict(expense) for expense in expenses],
+        "next_cursor": next_cursor,
+    }
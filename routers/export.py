@@ -0,0 +1,39 @@
+"""
+Роутер для выгрузки расходов
+"""
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import get_reader_sessions
+from services.export import EXPORT_FORMATS, export_sources, stream_export
+
+router = APIRouter()
+
+
+@router.get("/export")
+async def export_expenses(
+    format: Literal["csv", "ndjson"] = "csv",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    category: Optional[str] = None,
+    gzip: bool = False,
+    sessions: async_sessionmaker = Depends(get_reader_sessions),
+):
+    """
+    Потоковая выгрузка расходов в CSV (формат загрузки) или NDJSON.
+    Фильтры: from/to (YYYY-MM-DD, включительно), category; gzip=true - сжатый файл.
+    """
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"expenses.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        stream_export(export_sources(sessions, date_from, date_to, category), format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,107 +1,138 @@
 """
 Роутер для генерации отчетов (HTML и PDF)
 """
-from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from datetime import date
+from functools import partial
+from typing import Optional, Tuple
+from fastapi import APIRouter, Request, Depends, Header, HTTPException, Query
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime as dt
-import pdfkit
 
-from database import get_db
-from models import Expense
-from config import TEMPLATES_DIR, PDF_PATH, WKHTMLTOPDF_PATH
+from database import get_read_db
+from services.data_version import get_data_version
+from services.metrics import PDF_RENDER, stage_timer
+from services.pdf_cache import pdf_cache
+from services.report_cache import report_cache, make_etag, etag_matches
+from services.reports import build_report, describe_filters, fetch_archived_rows
+from templating import stream_template, templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# Бэкенд PDF создается при первом запросе PDF: services.pdf и его
+# зависимости не загружаются воркерами, которые PDF не отдают
+pdf_renderer = None
+
+ReportFilters = Tuple[Optional[date], Optional[date], Optional[str]]
+
+
+def report_filters(date_from: Optional[str] = Query(None, alias="from"),
+                   date_to: Optional[str] = Query(None, alias="to"),
+                   category: Optional[str] = None) -> ReportFilters:
+    """
+    Фильтры отчета: from/to (YYYY-MM-DD, включительно) и category.
+    Пустые значения (незаполненные поля формы) означают отсутствие фильтра.
+    """
+    try:
+        return (
+            date.fromisoformat(date_from) if date_from else None,
+            date.fromisoformat(date_to) if date_to else None,
+            category or None,
+        )
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Даты фильтра должны быть в формате YYYY-MM-DD")
+
+
+def get_pdf_renderer():
+    """Бэкенд PDF (создается при первом обращении)"""
+    global pdf_renderer
+    if pdf_renderer is None:
+        from services.pdf import create_renderer
+        pdf_renderer = create_renderer(templates.env)
+    return pdf_renderer
+
+
+def report_builder(filters: ReportFilters):
+    """
+    Функция построения отчета с фильтрами для report_cache (принимает сессию).
+    Архивные разделы читаются до run_sync и ожидаются асинхронно: run_sync
+    выполняется в потоке event loop, и ожидание в нем остановило бы воркер.
+    """
+    date_from, date_to, category = filters
+
+    async def build(db: AsyncSession) -> dict:
+        archived_rows = await fetch_archived_rows(date_from, date_to, category)
+        return await db.run_sync(partial(
+            build_report, date_from=date_from, date_to=date_to, category=category,
+            archived_rows=archived_rows,
+        ))
+    return build
 
 
 @router.get("/report", response_class=HTMLResponse)
-async def report_page(request: Request, db: Session = Depends(get_db)):
-    """HTML-отчет со статистикой расходов"""
-    # Общие статистики
-    stats = db.query(
-        func.sum(Expense.amount).label("total"),
-        func.avg(Expense.amount).label("avg")
-    ).first()
-    total = stats.total or 0
-    avg = stats.avg or 0
-
-    # Статистика по месяцам
-    by_month = db.query(
-        func.substr(Expense.date, 1, 7).label("month"),
-        func.sum(Expense.amount).label("sum"),
-        func.avg(Expense.amount).label("avg")
-    ).group_by(func.substr(Expense.date, 1, 7)).order_by("month").all()
-
-    # Статистика по категориям
-    by_category = db.query(
-        Expense.category,
-        func.sum(Expense.amount).label("sum"),
-        func.avg(Expense.amount).label("avg")
-    ).group_by(Expense.category).order_by(Expense.category).all()
-
-    # Статистика по месяцам и категориям
-    by_month_category = db.query(
-        func.substr(Expense.date, 1, 7).label("month"),
-        Expense.category,
-        func.sum(Expense.amount).label("sum"),
-        func.avg(Expense.amount).label("avg")
-    ).group_by(
-        func.substr(Expense.date, 1, 7),
-        Expense.category
-    ).order_by("month", Expense.category).all()
-
-    return templates.TemplateResponse("report.html", {
+async def report_page(request: Request, filters: ReportFilters = Depends(report_filters),
+                      db: AsyncSession = Depends(get_read_db),
+                      if_none_match: Optional[str] = Header(None)):
+    """
+    HTML-отчет со статистикой расходов (с поддержкой ETag / 304).
+    ETag зависит только от версии данных, фильтров и шаблонов, поэтому 304
+    отдается до построения отчета - даже воркером, в кэше которого отчета нет.
+    """
+    with stage_timer("report", "data"):
+        version = await db.run_sync(get_data_version)
+        etag = make_etag(version, filters)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        version, report = await report_cache.get_or_build(db, report_builder(filters), filters, version)
+
+    # Страница отдается по мере рендеринга: карточки итогов приходят в браузер
+    # раньше, чем сформированы большие таблицы
+    context = {
         "request": request,
-        "total": total,
-        "avg": avg,
-        "by_month": by_month,
-        "by_category": by_category,
-        "by_month_category": by_month_category,
-    })
-
-
-@router.get("/report/pdf")
-async def report_pdf(db: Session = Depends(get_db)):
-    """Генерация PDF-отчета"""
-    # Общие статистики
-    stats = db.query(
-        func.sum(Expense.amount).label("total"),
-        func.avg(Expense.amount).label("avg")
-    ).first()
-    total = stats.total or 0
-    avg = stats.avg or 0
-
-    # Статистика по месяцам
-    by_month = db.query(
-        func.substr(Expense.date, 1, 7).label("month"),
-        func.sum(Expense.amount).label("sum"),
-        func.avg(Expense.amount).label("avg")
-    ).group_by(func.substr(Expense.date, 1, 7)).order_by("month").all()
-
-    # Статистика по категориям
-    by_category = db.query(
-        Expense.category,
-        func.sum(Expense.amount).label("sum"),
-        func.avg(Expense.amount).label("avg")
-    ).group_by(Expense.category).order_by(Expense.category).all()
-
-    # Рендеринг HTML-шаблона
-    template = templates.env.get_template("report.html.j2")
-    html = template.render(
-        total=total,
-        avg=avg,
-        month_stats=by_month,
-        category_stats=by_category,
-        generated_at=dt.now().strftime("%d.%m.%Y %H:%M"),
-        current_year=dt.now().year,
+        "total": report["total"],
+        "avg": report["avg"],
+        "median": report["p50"],
+        "by_month": report["by_month"],
+        "by_category": report["by_category"],
+        "by_month_category": report["by_month_category"],
+        "date_from": filters[0],
+        "date_to": filters[1],
+        "category": filters[2],
+        "filter_label": describe_filters(*filters),
+        "pdf_url": f"/report/pdf?{request.url.query}" if request.url.query else "/report/pdf",
+    }
+    return StreamingResponse(
+        stream_template("report.html", context, "report"),
+        media_type="text/html; charset=utf-8",
+        headers=headers,
     )
 
-    # Генерация PDF
-    config = pdfkit.configuration(wkhtmltopdf=WKHTMLTOPDF_PATH)
-    pdfkit.from_string(html, PDF_PATH, configuration=config)
-
-    return FileResponse(PDF_PATH, filename="report.pdf")
 
+@router.get("/report/pdf")
+async def report_pdf(filters: ReportFilters = Depends(report_filters),
+                     db: AsyncSession = Depends(get_read_db)):
+    """Генерация PDF-отчета (готовые файлы берутся из дискового кэша)"""
+    from services.pdf import render_pdf
+
+    with stage_timer("report_pdf", "data"):
+        version, report = await report_cache.get_or_build(db, report_builder(filters), filters)
+    renderer = get_pdf_renderer()
+    key = pdf_cache.make_key(version, filters, renderer.cache_token())
+
+    async def render():
+        # generated_at - время построения артефакта
+        with PDF_RENDER.time(backend=renderer.name):
+            return await render_pdf(renderer, {
+                "total": report["total"],
+                "avg": report["avg"],
+                "month_stats": report["by_month"],
+                "category_stats": report["by_category"],
+                "filter_label": describe_filters(*filters),
+                "generated_at": dt.now().strftime("%d.%m.%Y %H:%M"),
+                "current_year": dt.now().year,
+            })
+
+    with stage_timer("report_pdf", "pdf"):
+        path = await pdf_cache.get_or_render(key, render)
+
+    return FileResponse(path, media_type="application/pdf", filename="report.pdf")
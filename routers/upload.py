@@ -1,18 +1,16 @@
 """
 Роутер для загрузки файлов с расходами
 """
-from fastapi import APIRouter, Request, UploadFile, Depends
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from datetime import datetime as dt
+from fastapi import APIRouter, Request, UploadFile, Depends, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse
 
-from database import get_db
-from models import Expense
-from config import TEMPLATES_DIR
+from database import DatabaseWriter, get_writer
+from config import UPLOAD_PARALLEL
+from services.jobs import IngestJob, ingest_upload, job_manager
+from services.metrics import stage_timer
+from templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 
 @router.get("/upload", response_class=HTMLResponse)
@@ -22,60 +20,45 @@ async def upload_page(request: Request):
 
 
 @router.post("/upload", response_class=HTMLResponse)
-async def upload_file(request: Request, file: UploadFile, db: Session = Depends(get_db)):
-    """Обработка загруженного файла с расходами"""
-    inserted, errors = 0, []
+async def upload_file(request: Request, file: UploadFile, parallel: bool = UPLOAD_PARALLEL,
+                      writer: DatabaseWriter = Depends(get_writer)):
+    """
+    Обработка загруженного файла с расходами.
+    parallel=true - разбор в пуле процессов (для больших файлов).
+    """
+    job = IngestJob(filename=file.filename, max_errors=None)
+    inserted = await ingest_upload(file, writer, job, parallel)
 
-    content = await file.read()
-    lines = content.decode("utf-8").splitlines()
+    with stage_timer("upload", "render"):
+        return templates.TemplateResponse("upload.html", {
+            "request": request,
+            "inserted": inserted,
+            "duplicates": job.duplicates,
+            "duplicate_file": job.duplicate_file,
+            "errors": job.errors,
+        })
 
-    for line in lines:
-        try:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(";")
-            if len(parts) < 3:
-                errors.append(f"Недостаточно полей: {line}")
-                continue
 
-            # Валидация даты
-            try:
-                try:
-                    dt.strptime(parts[0], "%Y-%m-%d")
-                except ValueError:
-                    dt.strptime(parts[0], "%d.%m.%Y")
-            except Exception:
-                errors.append(f"Неверная дата: {line}")
-                continue
+@router.post("/upload/jobs", status_code=202)
+async def create_upload_job(request: Request, file: UploadFile, parallel: bool = UPLOAD_PARALLEL,
+                            writer: DatabaseWriter = Depends(get_writer)):
+    """
+    Фоновая загрузка: файл сохраняется на диск, ответ возвращается сразу.
+    Ход загрузки - GET /upload/jobs/{id}.
+    """
+    job = await job_manager.submit(file, writer, parallel)
+    status_url = str(request.url_for("get_upload_job", job_id=job.id))
+    return JSONResponse(
+        {**job.to_dict(), "status_url": status_url},
+        status_code=202,
+        headers={"Location": status_url},
+    )
 
-            # Валидация суммы
-            try:
-                amount = float(parts[2])
-                if amount <= 0:
-                    raise ValueError
-            except Exception:
-                errors.append(f"Неверная сумма: {line}")
-                continue
-
-            # Создание записи в БД
-            expense = Expense(
-                date=parts[0],
-                category=parts[1],
-                amount=amount,
-                comment=parts[3] if len(parts) > 3 else None
-            )
-            db.add(expense)
-            inserted += 1
-
-        except Exception as e:
-            errors.append(str(e))
-
-    db.commit()
-
-    return templates.TemplateResponse("upload.html", {
-        "request": request,
-        "inserted": inserted,
-        "errors": errors,
-    })
 
+@router.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Статус фоновой загрузки"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_dict()
@@ -0,0 +1,3 @@
+"""
+Пакет с сервисным слоем приложения (загрузка данных, отчеты)
+"""
@@ -0,0 +1,229 @@
+"""
+Пакетная вставка расходов через SQLAlchemy Core
+"""
+import uuid
+from typing import List
+
+from sqlalchemy import Column, MetaData, Table, insert, select, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from config import BULK_BATCH_SIZE, UPLOAD_ATOMIC
+from models import Expense, row_fingerprint
+from services.data_version import bump_data_version
+from services.partitions import move_to_partitions, partition_set
+from services.rollup import apply_inserted, month_key
+
+
+def add_fingerprints(batch: List[dict]):
+    """Заполнение отпечатков строк пакета (см. models.row_fingerprint)"""
+    for record in batch:
+        record["fingerprint"] = row_fingerprint(
+            record["iso_date"], record["category"], record["amount"], record["comment"],
+        )
+
+
+def _insert_new():
+    """
+    INSERT, пропускающий строки с уже известным отпечатком.
+    Возвращает (RETURNING) вставленные строки: id, iso_date, category, amount.
+    """
+    table = Expense.__table__
+    return (
+        sqlite_insert(table)
+        .on_conflict_do_nothing(index_elements=["fingerprint"])
+        .returning(table.c.id, table.c.iso_date, table.c.category, table.c.amount)
+    )
+
+
+def _apply_new(db, rows) -> int:
+    """
+    Учет строк, вставленных запросом _insert_new: сводная таблица и версия данных.
+    Возвращает число учтенных строк.
+
+    Новые строки берутся из RETURNING, а не как id > max(id) до вставки: между
+    таким чтением и INSERT другой процесс (воркер uvicorn, manage.py) может
+    закоммитить свои строки. Строки с датой до границы архива переносятся
+    в разделы своих годов (services.partitions.move_to_partitions) и учитываются,
+    только если их там еще не было. Границу можно читать только после INSERT -
+    тогда блокировка записи уже взята.
+    """
+    boundary = partition_set.boundary()
+    fresh, archived = [], False
+    for _, iso_date, category, amount in rows:
+        if iso_date is None:
+            continue
+        if boundary is not None and iso_date < boundary:
+            archived = True
+            continue
+        fresh.append((month_key(iso_date), category, amount))
+    if archived:
+        fresh.extend(
+            (month_key(iso_date), category, amount)
+            for iso_date, category, amount in move_to_partitions(db, boundary)
+        )
+
+    inserted = apply_inserted(db, fresh)
+    if inserted:
+        bump_data_version(db)
+    return inserted
+
+
+def write_batch(db: Session, batch: List[dict]) -> int:
+    """
+    Вставка пакета без повторов, обновление сводной таблицы и версии данных (без коммита).
+    Возвращает число вставленных строк; остальные - повторы уже загруженных.
+    """
+    add_fingerprints(batch)
+    return _apply_new(db, db.execute(_insert_new(), batch))
+
+
+class BaseBulkInserter:
+    """
+    Накапливает записи и вставляет их пакетами многострочных INSERT (с RETURNING),
+    минуя identity map и unit of work ORM. Сводная таблица по месяцам
+    и категориям и версия данных обновляются в той же транзакции, что и сам пакет.
+
+    Режимы:
+      * atomic=False - коммит после каждого пакета. Блокировка записи SQLite
+        держится только на время одного пакета; при сбое в середине файла
+        уже закоммиченные пакеты остаются в БД.
+      * atomic=True - один коммит в finish(). Либо сохраняются все строки,
+        либо (при исключении до finish) ни одной - откат выполняет закрытие сессии.
+
+    Строки с уже известным отпечатком (повторная загрузка) пропускаются:
+    processed - сколько строк передано в БД, inserted - сколько вставлено.
+    """
+
+    def __init__(self, db, batch_size: int = BULK_BATCH_SIZE, atomic: bool = UPLOAD_ATOMIC):
+        if batch_size < 1:
+            raise ValueError("batch_size должен быть положительным")
+        self.db = db
+        self.batch_size = batch_size
+        self.atomic = atomic
+        self.processed = 0
+        self.inserted = 0
+        self._batch: List[dict] = []
+
+    @property
+    def duplicates(self) -> int:
+        """Число пропущенных повторов (в атомарном режиме - после finish)"""
+        return self.processed - self.inserted
+
+    def _take_batch(self) -> List[dict]:
+        """Забирает накопленный пакет для записи"""
+        batch, self._batch = self._batch, []
+        self.processed += len(batch)
+        return batch
+
+
+class BulkInserter(BaseBulkInserter):
+    """Пакетная вставка через синхронную сессию"""
+
+    def __init__(self, db: Session, batch_size: int = BULK_BATCH_SIZE, atomic: bool = UPLOAD_ATOMIC):
+        super().__init__(db, batch_size, atomic)
+
+    def add(self, record: dict):
+        """Добавление записи в текущий пакет"""
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Вставка накопленного пакета (и коммит в неатомарном режиме)"""
+        if not self._batch:
+            return
+        self.inserted += write_batch(self.db, self._take_batch())
+        if not self.atomic:
+            self.db.commit()
+
+    def finish(self) -> int:
+        """Вставка остатка и финальный коммит. Возвращает число вставленных строк"""
+        self.flush()
+        self.db.commit()
+        return self.inserted
+
+
+def _staging_table(name: str) -> Table:
+    """Временная таблица для строк атомарной загрузки (живет в соединении писателя)"""
+    return Table(
+        name, MetaData(),
+        *(Column(column.name, column.type) for column in Expense.__table__.columns if not column.primary_key),
+        prefixes=["TEMPORARY"],
+    )
+
+
+def stage_batch(conn: Connection, name: str, batch: List[dict], create: bool):
+    """Запись пакета во временную таблицу без изменения основных данных"""
+    staging = _staging_table(name)
+    if create:
+        staging.create(conn)
+    add_fingerprints(batch)
+    conn.execute(insert(staging), batch)
+
+
+def publish_staging(conn: Connection, name: str) -> int:
+    """
+    Перенос строк из временной таблицы в expenses одной транзакцией (без повторов).
+    Возвращает число вставленных строк.
+    """
+    staging = _staging_table(name)
+    columns = [column.name for column in staging.columns]
+    # WHERE обязателен: без него SQLite читает ON CONFLICT как часть SELECT
+    rows = conn.execute(_insert_new().from_select(columns, select(*staging.columns).where(true())))
+    inserted = _apply_new(conn, rows)
+    staging.drop(conn)
+    return inserted
+
+
+def drop_staging(conn: Connection, name: str):
+    """Удаление временной таблицы прерванной загрузки"""
+    _staging_table(name).drop(conn, checkfirst=True)
+
+
+class QueuedBulkInserter(BaseBulkInserter):
+    """
+    Пакетная вставка через единственного писателя БД (DatabaseWriter).
+    Обработчик запроса только ставит пакеты в очередь и не блокирует event loop.
+
+    В атомарном режиме пакеты копятся во временной таблице соединения писателя,
+    а finish() переносит их в expenses одной транзакцией. Блокировка записи
+    не удерживается на время разбора файла, и другие загрузки идут параллельно.
+    """
+
+    def __init__(self, writer, batch_size: int = BULK_BATCH_SIZE, atomic: bool = UPLOAD_ATOMIC):
+        super().__init__(writer, batch_size, atomic)
+        self._staging = f"staging_{uuid.uuid4().hex}" if atomic else None
+        self._staged = False
+
+    async def add(self, record: dict):
+        """Добавление записи в текущий пакет"""
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Отправка накопленного пакета писателю"""
+        if not self._batch:
+            return
+        batch = self._take_batch()
+        if self.atomic:
+            await self.db.run(stage_batch, self._staging, batch, not self._staged)
+            self._staged = True
+        else:
+            self.inserted += await self.db.run(write_batch, batch)
+
+    async def finish(self) -> int:
+        """Запись остатка (и публикация в атомарном режиме). Возвращает число вставленных строк"""
+        await self.flush()
+        if self.atomic and self._staged:
+            self.inserted = await self.db.run(publish_staging, self._staging)
+            self._staged = False
+        return self.inserted
+
+    async def abort(self):
+        """Отмена атомарной загрузки: временная таблица удаляется"""
+        if self.atomic and self._staged:
+            await self.db.run(drop_staging, self._staging)
+            self._staged = False
@@ -0,0 +1,28 @@
+"""
+Версия данных расходов.
+Счетчик хранится в самой БД и увеличивается в той же транзакции, что и
+изменение данных, поэтому одинаково виден всем воркерам uvicorn.
+"""
+from sqlalchemy import insert, select, update
+
+from models import DataVersion
+
+# Единственная строка таблицы data_version
+_ROW_ID = 1
+
+
+def get_data_version(db) -> int:
+    """Текущая версия данных (0 для новой БД)"""
+    version = db.execute(select(DataVersion.version).where(DataVersion.id == _ROW_ID)).scalar()
+    return version or 0
+
+
+def bump_data_version(db):
+    """Увеличение версии данных (без коммита, в текущей транзакции)"""
+    result = db.execute(
+        update(DataVersion)
+        .where(DataVersion.id == _ROW_ID)
+        .values(version=DataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(DataVersion).values(id=_ROW_ID, version=1))
@@ -0,0 +1,43 @@
+"""
+Пропуск повторных загрузок.
+Файл целиком узнается по SHA-256 содержимого еще до разбора, отдельные
+строки - по отпечатку (models.row_fingerprint) при вставке (services.bulk).
+"""
+import hashlib
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from starlette.concurrency import run_in_threadpool
+
+from config import UPLOAD_CHUNK_SIZE
+from models import UploadedFile
+
+
+def _hash_fileobj(fileobj, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def file_sha256(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """SHA-256 содержимого загруженного файла; позиция чтения возвращается в начало"""
+    return await run_in_threadpool(_hash_fileobj, file.file, chunk_size)
+
+
+def is_known_file(conn: Connection, sha256: str) -> bool:
+    """Загружался ли уже файл с таким содержимым"""
+    return conn.execute(select(UploadedFile.sha256).where(UploadedFile.sha256 == sha256)).first() is not None
+
+
+def remember_file(conn: Connection, sha256: str, filename, rows_inserted: int):
+    """Запоминание успешно загруженного файла"""
+    conn.execute(
+        sqlite_insert(UploadedFile.__table__)
+        .values(sha256=sha256, filename=filename, rows_inserted=rows_inserted)
+        .on_conflict_do_nothing(index_elements=["sha256"])
+    )
@@ -0,0 +1,122 @@
+"""
+Потоковая выгрузка расходов в CSV (формат загрузки) или NDJSON.
+Строки читаются курсором порциями по EXPORT_BATCH_SIZE (yield_per),
+поэтому память не зависит от размера таблицы. Архивные разделы
+(services.partitions) выгружаются первыми, по годам, затем горячий раздел.
+"""
+import json
+import zlib
+from datetime import date
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import Select, String, or_, select, type_coerce
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import EXPORT_BATCH_SIZE
+from models import Expense
+from services.partitions import PartitionSet, partition_set
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+_CSV_UNSAFE = str.maketrans({";": ",", "\n": " ", "\r": " "})
+
+
+def export_query(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                 category: Optional[str] = None, since: Optional[date] = None) -> Select:
+    """
+    Запрос выгрузки с фильтрами (границы дат включительно).
+    При фильтре по дате строки идут по индексу (iso_date, category) в порядке дат
+    (сортируются по id только строки одного дня), без фильтра - по первичному ключу;
+    в обоих случаях без сортировки всей выборки.
+    since - граница архива для горячего раздела (строки без даты выгружаются).
+    """
+    table = Expense.__table__
+    # iso_date хранится строкой YYYY-MM-DD и отдается как есть, без разбора в date
+    stmt = select(table.c.id, table.c.date, type_coerce(table.c.iso_date, String).label("iso_date"),
+                  table.c.category, table.c.amount, table.c.comment)
+    if date_from is not None:
+        stmt = stmt.where(table.c.iso_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(table.c.iso_date <= date_to)
+    if category is not None:
+        stmt = stmt.where(table.c.category == category)
+    if since is not None:
+        stmt = stmt.where(or_(table.c.iso_date >= since, table.c.iso_date.is_(None)))
+
+    if date_from is not None or date_to is not None:
+        return stmt.order_by(table.c.iso_date, table.c.id)
+    return stmt.order_by(table.c.id)
+
+
+def _csv_safe(value: str) -> str:
+    if ";" in value or "\n" in value or "\r" in value:
+        return value.translate(_CSV_UNSAFE)
+    return value
+
+
+def format_csv(rows: List) -> str:
+    """
+    Строки в формате загрузки: дата;категория;сумма[;комментарий].
+    Дата - каноническая (YYYY-MM-DD), если распознана. Формат загрузки не
+    экранирует разделители, поэтому ";" и переводы строк в тексте заменяются.
+    """
+    lines = []
+    for _, raw_date, iso_date, category, amount, comment in rows:
+        line = f"{iso_date or raw_date};{_csv_safe(category)};{amount!r}"
+        if comment is not None:
+            line += ";" + _csv_safe(comment)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def format_ndjson(rows: List) -> str:
+    """Строки в виде JSON-объектов, по одному на строку"""
+    dumps = json.dumps
+    return "".join(
+        dumps({
+            "id": row_id,
+            "date": raw_date,
+            "iso_date": iso_date,
+            "category": category,
+            "amount": amount,
+            "comment": comment,
+        }, ensure_ascii=False) + "\n"
+        for row_id, raw_date, iso_date, category, amount, comment in rows
+    )
+
+
+def export_sources(sessions: async_sessionmaker, date_from: Optional[date] = None,
+                   date_to: Optional[date] = None, category: Optional[str] = None,
+                   partitions: PartitionSet = partition_set) -> List[Tuple[async_sessionmaker, Select]]:
+    """Запросы выгрузки по разделам периода: (фабрика сессий раздела, запрос)"""
+    sources = []
+    for part in partitions.plan(date_from, date_to):
+        if part.year is None:
+            sources.append((sessions, export_query(date_from, date_to, category, part.since)))
+        else:
+            sources.append((partitions.sessions(part.year), export_query(part.date_from, part.date_to, category)))
+    return sources
+
+
+async def stream_export(sources: List[Tuple[async_sessionmaker, Select]], fmt: str = "csv",
+                        compress: bool = False,
+                        batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Блоки ответа выгрузки по запросам sources (см. export_sources); compress=True - поток gzip"""
+    formatter = format_ndjson if fmt == "ndjson" else format_csv
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 - формат gzip
+
+    for sessions, stmt in sources:
+        async with sessions() as db:
+            result = await db.stream(stmt.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                data = formatter(rows).encode("utf-8")
+                if compressor is not None:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+
+    if compressor is not None:
+        yield compressor.flush()
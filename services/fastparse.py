@@ -0,0 +1,167 @@
+"""
+Быстрый колоночный разбор строк загружаемого файла.
+
+Кусок строк раскладывается в колонки, после чего каждая колонка проверяется
+целиком: даты - разбором по фиксированным позициям с кэшем уже встреченных
+значений (в выгрузках повторяются одни и те же сотни дат), суммы - одним
+проходом float() по колонке. Решения о приеме/отклонении строк и тексты
+ошибок совпадают с эталонным services.ingest.parse_line.
+
+Суммы разбираются именно float(), а не NumPy: правила разбора строк у NumPy
+отличаются (подчеркивания, пробелы), а результат должен совпадать с прежним.
+"""
+from datetime import date
+from typing import List, Optional, Sequence
+
+from models import normalize_date
+
+# Кэш разобранных дат: строка -> date или None (неверная дата)
+_date_memo = {}
+# Предел размера кэша: при превышении кэш очищается
+DATE_MEMO_LIMIT = 100_000
+
+
+def _parse_date_fixed(value: str) -> Optional[date]:
+    """
+    Разбор YYYY-MM-DD и DD.MM.YYYY по фиксированным позициям.
+    Возвращает None, если строка не в каноническом виде - тогда решение
+    принимает normalize_date (strptime), поэтому результат не расходится.
+    """
+    if len(value) != 10 or not value.isascii():
+        return None
+    if value[4] == "-" and value[7] == "-":
+        year, month, day = value[0:4], value[5:7], value[8:10]
+    elif value[2] == "." and value[5] == ".":
+        day, month, year = value[0:2], value[3:5], value[6:10]
+    else:
+        return None
+    if not (year.isdecimal() and month.isdecimal() and day.isdecimal()):
+        return None
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_date_cached(value: str) -> Optional[date]:
+    """Каноническая дата или None для неверной даты (с кэшем)"""
+    try:
+        return _date_memo[value]
+    except KeyError:
+        pass
+
+    result = _parse_date_fixed(value)
+    if result is None:
+        try:
+            result = normalize_date(value)
+        except Exception:
+            result = None
+
+    if len(_date_memo) >= DATE_MEMO_LIMIT:
+        _date_memo.clear()
+    _date_memo[value] = result
+    return result
+
+
+class ParsedBatch:
+    """
+    Результат разбора куска строк в колоночном виде.
+    Колонки выровнены по непустым строкам куска; errors[i] - текст ошибки
+    строки i или None, маска valid получается как errors[i] is None.
+    Значения в колонках для отклоненных строк не определены.
+    """
+    __slots__ = ("line_nos", "dates", "categories", "amounts", "comments", "iso_dates", "errors")
+
+    def __init__(self, line_nos, dates, categories, amounts, comments, iso_dates, errors):
+        self.line_nos: List[int] = line_nos
+        self.dates: List[str] = dates
+        self.categories: List[Optional[str]] = categories
+        self.amounts: List[Optional[float]] = amounts
+        self.comments: List[Optional[str]] = comments
+        self.iso_dates: List[Optional[date]] = iso_dates
+        self.errors: List[Optional[str]] = errors
+
+    def __len__(self):
+        return len(self.line_nos)
+
+    @property
+    def valid(self) -> List[bool]:
+        """Маска принятых строк"""
+        return [error is None for error in self.errors]
+
+    def records(self) -> List[dict]:
+        """Принятые строки в виде записей для вставки"""
+        return [
+            {"date": d, "category": c, "amount": a, "comment": cm, "iso_date": iso}
+            for d, c, a, cm, iso, error in zip(
+                self.dates, self.categories, self.amounts, self.comments, self.iso_dates, self.errors,
+            )
+            if error is None
+        ]
+
+    def results(self) -> List[tuple]:
+        """Тройки (номер строки, запись, ошибка) в порядке строк"""
+        return [
+            (n, {"date": d, "category": c, "amount": a, "comment": cm, "iso_date": iso}, None)
+            if error is None else (n, None, error)
+            for n, d, c, a, cm, iso, error in zip(
+                self.line_nos, self.dates, self.categories, self.amounts,
+                self.comments, self.iso_dates, self.errors,
+            )
+        ]
+
+
+_MISSING = object()
+
+
+def parse_lines(lines: Sequence[str], first_line_no: int = 1) -> ParsedBatch:
+    """Разбор куска строк; first_line_no - номер первой строки в исходном файле"""
+    # 1. Разбиение на поля; пустые строки пропускаются
+    rows = [line.strip() for line in lines]
+    if all(rows):
+        line_nos = list(range(first_line_no, first_line_no + len(rows)))
+    else:
+        line_nos = [n for n, row in enumerate(rows, first_line_no) if row]
+        rows = [row for row in rows if row]
+    parts_list = [row.split(";") for row in rows]
+    size = len(rows)
+
+    errors = [None] * size
+    short = [i for i, parts in enumerate(parts_list) if len(parts) < 3]
+    for i in short:
+        errors[i] = f"Недостаточно полей: {rows[i]}"
+
+    # 2. Колонка дат: кэш + разбор по фиксированным позициям
+    dates = [parts[0] for parts in parts_list]
+    memo_get = _date_memo.get
+    iso_dates = [memo_get(value, _MISSING) for value in dates]
+    for i, iso in enumerate(iso_dates):
+        if iso is _MISSING:
+            iso = iso_dates[i] = parse_date_cached(dates[i])
+        if iso is None and errors[i] is None:
+            errors[i] = f"Неверная дата: {rows[i]}"
+
+    # 3. Колонка сумм: один проход float(), построчно - только при ошибке
+    try:
+        amounts = [float(parts[2]) for parts in parts_list]
+    except (IndexError, ValueError):
+        amounts = [None] * size
+        for i, parts in enumerate(parts_list):
+            if len(parts) > 2:
+                try:
+                    amounts[i] = float(parts[2])
+                except ValueError:
+                    pass
+    # Как и в parse_line, проверка "<= 0": nan ее проходит
+    for i, amount in enumerate(amounts):
+        if (amount is None or amount <= 0) and errors[i] is None:
+            errors[i] = f"Неверная сумма: {rows[i]}"
+
+    # 4. Остальные колонки
+    if short:
+        categories = [parts[1] if len(parts) > 1 else None for parts in parts_list]
+    else:
+        categories = [parts[1] for parts in parts_list]
+    comments = [parts[3] if len(parts) > 3 else None for parts in parts_list]
+
+    return ParsedBatch(line_nos, dates, categories, amounts, comments, iso_dates, errors)
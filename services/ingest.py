@@ -0,0 +1,233 @@
+"""
+Потоковый разбор загружаемых файлов с расходами.
+
+Последовательный режим (iter_records) читает файл блоками и разбирает строки
+в event loop. Параллельный режим (iter_records_parallel) режет файл на куски
+по границам строк и разбирает их в пуле процессов, сохраняя порядок строк.
+Оба режима отдают тройки (номер строки в исходном файле, запись, ошибка).
+"""
+import asyncio
+import codecs
+import multiprocessing
+from collections import deque
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from config import UPLOAD_CHUNK_SIZE, PARSE_CHUNK_BYTES, PARSE_WORKERS
+from models import normalize_date
+from services.fastparse import parse_lines
+
+# Запись о расходе: dict с ключами date, category, amount, comment, iso_date
+Record = dict
+ParseResult = Tuple[Optional[Record], Optional[str]]
+NumberedResult = Tuple[int, Optional[Record], Optional[str]]
+
+
+async def iter_line_blocks(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[List[str]]:
+    """
+    Читает файл блоками фиксированного размера и отдает строки списками (по блоку).
+    Многобайтовые символы UTF-8 на границе блоков декодируются корректно,
+    разбиение на строки совпадает с str.splitlines().
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+
+    while True:
+        chunk = await file.read(chunk_size)
+        final = not chunk
+        text = pending + decoder.decode(chunk, final=final)
+        if not text:
+            if final:
+                break
+            continue
+
+        pending = ""
+        if not final:
+            # Последняя строка может быть неполной (или "\r" от разорванного "\r\n")
+            last = text.splitlines(keepends=True)[-1]
+            if last.endswith("\r") or last.splitlines()[0] == last:
+                pending = last
+                text = text[:-len(last)]
+
+        if text:
+            yield text.splitlines()
+
+        if final:
+            break
+
+
+async def iter_lines(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[str]:
+    """Строки файла по одной (см. iter_line_blocks)"""
+    async for block in iter_line_blocks(file, chunk_size):
+        for line in block:
+            yield line
+
+
+def parse_line(line: str) -> ParseResult:
+    """
+    Разбор и валидация одной строки файла.
+    Возвращает (запись, None), (None, текст ошибки) или (None, None) для пустой строки.
+    """
+    try:
+        line = line.strip()
+        if not line:
+            return None, None
+        parts = line.split(";")
+        if len(parts) < 3:
+            return None, f"Недостаточно полей: {line}"
+
+        # Валидация даты
+        try:
+            iso_date = normalize_date(parts[0])
+        except Exception:
+            return None, f"Неверная дата: {line}"
+
+        # Валидация суммы
+        try:
+            amount = float(parts[2])
+            if amount <= 0:
+                raise ValueError
+        except Exception:
+            return None, f"Неверная сумма: {line}"
+
+        return {
+            "date": parts[0],
+            "category": parts[1],
+            "amount": amount,
+            "comment": parts[3] if len(parts) > 3 else None,
+            "iso_date": iso_date,
+        }, None
+
+    except Exception as e:
+        return None, str(e)
+
+
+async def iter_records(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[NumberedResult]:
+    """
+    Генератор записей из загруженного файла.
+    Отдает тройки (номер строки, запись, ошибка), пустые строки пропускает.
+    Память не зависит от размера файла. Строки разбираются блоками
+    колоночным разборщиком (services.fastparse).
+    """
+    line_no = 0
+    async for block in iter_line_blocks(file, chunk_size):
+        for item in parse_lines(block, line_no + 1).results():
+            yield item
+        line_no += len(block)
+
+
+def parse_chunk(data: bytes) -> Tuple[list, int]:
+    """
+    Разбор куска файла, начинающегося и заканчивающегося на границе строк.
+    Выполняется в процессе пула, поэтому функция верхнего уровня.
+
+    Возвращает результаты с номерами строк внутри куска и число строк в нем.
+    Для дешевой передачи между процессами запись упакована в кортеж
+    (date, category, amount, comment, iso_date.toordinal()) - см. unpack_record.
+    """
+    lines = data.decode("utf-8").splitlines()
+    batch = parse_lines(lines)
+    results = []
+    for i, (line_no, error) in enumerate(zip(batch.line_nos, batch.errors)):
+        if error is None:
+            results.append((line_no, (
+                batch.dates[i], batch.categories[i], batch.amounts[i],
+                batch.comments[i], batch.iso_dates[i].toordinal(),
+            ), None))
+        else:
+            results.append((line_no, None, error))
+    return results, len(lines)
+
+
+def unpack_record(packed: tuple) -> Record:
+    """Восстановление записи из кортежа, полученного от parse_chunk"""
+    date_str, category, amount, comment, ordinal = packed
+    return {
+        "date": date_str,
+        "category": category,
+        "amount": amount,
+        "comment": comment,
+        "iso_date": date.fromordinal(ordinal),
+    }
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Пул процессов разбора (создается при первом параллельном разборе)"""
+    global _process_pool
+    if _process_pool is None:
+        # spawn: дочерние процессы не наследуют потоки писателя БД и event loop
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Остановка пула процессов разбора, если он создавался"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+async def iter_chunks(file: UploadFile, chunk_bytes: int = PARSE_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """
+    Нарезка файла на куски примерно по chunk_bytes, заканчивающиеся на b"\n".
+    В UTF-8 байт 0x0A не встречается внутри многобайтовых символов, а "\n"
+    всегда завершает строку для str.splitlines(), поэтому куски разбираются
+    независимо и дают те же строки, что и весь файл целиком.
+    """
+    pending = b""
+    while True:
+        block = await file.read(chunk_bytes)
+        if not block:
+            if pending:
+                yield pending
+            return
+        data = pending + block
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            pending = data
+            continue
+        pending = data[cut + 1:]
+        yield data[:cut + 1]
+
+
+async def iter_records_parallel(file: UploadFile, chunk_bytes: int = PARSE_CHUNK_BYTES,
+                                executor: Optional[ProcessPoolExecutor] = None,
+                                workers: int = PARSE_WORKERS) -> AsyncIterator[NumberedResult]:
+    """
+    Параллельный разбор файла в пуле процессов.
+    Результаты отдаются в порядке строк исходного файла, номера строк сквозные.
+    В работе одновременно не больше 2 x workers кусков, поэтому память
+    ограничена независимо от размера файла.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_process_pool()
+    max_in_flight = 2 * workers
+    in_flight = deque()
+    line_offset = 0
+
+    async def drain_one():
+        nonlocal line_offset
+        results, line_count = await in_flight.popleft()
+        for line_no, packed, error in results:
+            yield line_offset + line_no, (unpack_record(packed) if packed else None), error
+        line_offset += line_count
+
+    async for chunk in iter_chunks(file, chunk_bytes):
+        in_flight.append(loop.run_in_executor(executor, parse_chunk, chunk))
+        if len(in_flight) >= max_in_flight:
+            async for item in drain_one():
+                yield item
+
+    while in_flight:
+        async for item in drain_one():
+            yield item
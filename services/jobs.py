@@ -0,0 +1,259 @@
+"""
+Загрузка файлов с расходами: общий цикл разбора и вставки и фоновые задачи.
+
+Фоновая задача: файл сохраняется на диск (UPLOAD_SPOOL_DIR), клиент сразу
+получает id задачи, а разбор и вставку выполняет отдельный поток-обработчик.
+Задачи идут по одной - запись все равно выполняет единственный писатель БД.
+Состояние задач хранится в памяти процесса.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from config import PARSE_WORKERS, UPLOAD_SPOOL_DIR, UPLOAD_CHUNK_SIZE, JOB_HISTORY_SIZE, JOB_MAX_ERRORS
+from services.bulk import QueuedBulkInserter
+from services.dedup import file_sha256, is_known_file, remember_file
+from services.ingest import NumberedResult, iter_records, iter_records_parallel
+from services.metrics import INGEST_ROWS, STAGE_DURATION
+
+
+class IngestJob:
+    """
+    Ход загрузки одного файла.
+    max_errors - сколько текстов ошибок хранить (None - все), счетчик ошибок полный.
+    stages - время этапов загрузки в секундах.
+    """
+
+    def __init__(self, job_id: str = "", filename: Optional[str] = None, parallel: bool = False,
+                 max_errors: Optional[int] = JOB_MAX_ERRORS):
+        self.id = job_id
+        self.filename = filename
+        self.parallel = parallel
+        self.max_errors = max_errors
+        self.status = "queued"
+        self.rows_processed = 0
+        self.rows_inserted = 0
+        self.duplicates = 0
+        self.duplicate_file = False
+        self.file_sha256 = None
+        self.error_count = 0
+        self.errors = []
+        self.stages = {}
+        self.failure = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def add_error(self, error: str):
+        """Учет строки с ошибкой"""
+        self.error_count += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append(error)
+
+    def add_stage_time(self, stage: str, seconds: float):
+        """Учет времени этапа"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Замер этапа, выполняемого одним блоком"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        """Состояние задачи для API"""
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_processed": self.rows_processed,
+            "rows_inserted": self.rows_inserted,
+            "duplicates": self.duplicates,
+            "duplicate_file": self.duplicate_file,
+            "file_sha256": self.file_sha256,
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+            "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            "failure": self.failure,
+            "elapsed": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+async def ingest(records: AsyncIterator[NumberedResult], inserter: QueuedBulkInserter, job: IngestJob) -> int:
+    """
+    Разбор и вставка записей с учетом хода в job.
+    При ошибке или отмене незавершенная загрузка откатывается (inserter.abort).
+
+    Разбор и вставка чередуются, поэтому их время копится по строкам:
+    parse - ожидание очередной строки (чтение, декодирование, проверка),
+    insert - ожидание очереди писателя, commit - завершение загрузки.
+    Текст ошибки начинается с номера строки файла.
+    """
+    clock = time.perf_counter
+    parse_time = insert_time = 0.0
+    try:
+        mark = clock()
+        async for line_no, record, error in records:
+            now = clock()
+            parse_time += now - mark
+            job.rows_processed += 1
+            if error is not None:
+                job.add_error(f"Строка {line_no}: {error}")
+            else:
+                await inserter.add(record)
+                job.rows_inserted = inserter.inserted
+            mark = clock()
+            insert_time += mark - now
+
+        job.add_stage_time("parse", parse_time)
+        job.add_stage_time("insert", insert_time)
+        with job.stage("commit"):
+            job.rows_inserted = await inserter.finish()
+    except BaseException:
+        await inserter.abort()
+        raise
+    job.duplicates = inserter.duplicates
+    return job.rows_inserted
+
+
+async def ingest_upload(file: UploadFile, writer, job: IngestJob, parallel: bool = False) -> int:
+    """
+    Загрузка файла с пропуском повторов.
+    Файл, уже загруженный ранее (тот же SHA-256), не разбирается вовсе;
+    строки, уже имеющиеся в БД, пропускаются при вставке.
+    """
+    with job.stage("hash"):
+        job.file_sha256 = await file_sha256(file)
+        known = await writer.run(is_known_file, job.file_sha256)
+    if known:
+        job.duplicate_file = True
+        observe_upload(job)
+        return 0
+
+    # С одним процессом разбора пул только добавляет расходы на передачу кусков
+    records = iter_records_parallel(file) if parallel and PARSE_WORKERS > 1 else iter_records(file)
+    inserted = await ingest(records, QueuedBulkInserter(writer), job)
+    with job.stage("remember"):
+        await writer.run(remember_file, job.file_sha256, file.filename, inserted)
+    observe_upload(job)
+    return inserted
+
+
+def observe_upload(job: IngestJob):
+    """Учет завершенной загрузки в метриках (/metrics)"""
+    INGEST_ROWS.inc(job.rows_inserted, result="inserted")
+    INGEST_ROWS.inc(job.duplicates, result="duplicate")
+    INGEST_ROWS.inc(job.error_count, result="rejected")
+    for stage, seconds in job.stages.items():
+        STAGE_DURATION.observe(seconds, operation="upload", stage=stage)
+
+
+class JobManager:
+    """
+    Очередь фоновых загрузок с одним потоком-обработчиком.
+    Помнит не больше history_size задач: при переполнении забываются
+    самые старые из завершенных.
+    """
+
+    def __init__(self, spool_dir: str = UPLOAD_SPOOL_DIR, history_size: int = JOB_HISTORY_SIZE):
+        self.spool_dir = spool_dir
+        self.history_size = history_size
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    async def submit(self, file: UploadFile, writer, parallel: bool = False) -> IngestJob:
+        """Сохранение файла на диск и постановка задачи в очередь"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.spool_dir, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                await file.seek(0)
+                await run_in_threadpool(shutil.copyfileobj, file.file, out, UPLOAD_CHUNK_SIZE)
+        except BaseException:
+            os.unlink(path)
+            raise
+
+        job = IngestJob(uuid.uuid4().hex, file.filename, parallel)
+        self._register(job)
+        self._get_executor().submit(self._run, job, path, writer)
+        return job
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Поток-обработчик (создается при первой задаче и после shutdown)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-job")
+            return self._executor
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Задача по id или None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _register(self, job: IngestJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            excess = len(self._jobs) - self.history_size
+            for old_id in [i for i, old in self._jobs.items() if old.finished][:max(excess, 0)]:
+                del self._jobs[old_id]
+
+    def _run(self, job: IngestJob, path: str, writer):
+        """Выполнение задачи в потоке-обработчике (со своим event loop)"""
+        job.started_at = time.time()
+        job.status = "running"
+        status = "failed"
+        try:
+            asyncio.run(self._ingest_file(job, path, writer))
+            status = "done"
+        except Exception as e:
+            job.failure = str(e)
+        finally:
+            os.unlink(path)
+            job.finished_at = time.time()
+            job.status = status
+
+    @staticmethod
+    async def _ingest_file(job: IngestJob, path: str, writer):
+        with open(path, "rb") as f:
+            upload = UploadFile(file=f, filename=job.filename)
+            await ingest_upload(upload, writer, job, job.parallel)
+
+    def wait(self):
+        """Ожидание завершения всех поставленных задач"""
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+    def shutdown(self):
+        """Остановка обработчика после завершения поставленных задач"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+job_manager = JobManager()
@@ -0,0 +1,113 @@
+"""
+Постраничный просмотр расходов с курсором (keyset pagination).
+Страница продолжается с ключа (iso_date, id) последней строки предыдущей
+страницы, поэтому стоимость страницы не зависит от ее номера, в отличие от OFFSET.
+Строки с нераспознанной датой (iso_date IS NULL) в просмотр не попадают.
+Разделы по годам (services.partitions) читаются по очереди в порядке просмотра,
+пока страница не заполнится; разделы вне периода и до курсора не читаются.
+"""
+import base64
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Expense
+from services.partitions import PartitionSet, partition_set
+
+Cursor = Tuple[date, int]
+
+
+def encode_cursor(iso_date: date, expense_id: int) -> str:
+    """Курсор следующей страницы: непрозрачная строка из ключа последней строки"""
+    raw = f"{iso_date.isoformat()}|{expense_id}"
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Разбор курсора; ValueError для испорченного курсора"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        day, expense_id = raw.split("|")
+        return date.fromisoformat(day), int(expense_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Неверный курсор: {cursor}") from e
+
+
+def page_query(date_from: Optional[date] = None, date_to: Optional[date] = None,
+               category: Optional[str] = None, min_amount: Optional[float] = None,
+               max_amount: Optional[float] = None, after: Optional[Cursor] = None,
+               limit: int = 50, descending: bool = False, since: Optional[date] = None) -> Select:
+    """
+    Запрос одной страницы (limit + 1 строка - признак следующей страницы).
+    Фильтры по дате и категории идут по индексам ix_expenses_iso_date и
+    ix_expenses_category_iso_date; фильтр по сумме проверяется по строкам индекса.
+    since - граница архива для горячего раздела.
+    """
+    key = tuple_(Expense.iso_date, Expense.id)
+    stmt = select(Expense).where(Expense.iso_date.is_not(None))
+    if since is not None:
+        stmt = stmt.where(Expense.iso_date >= since)
+    if date_from is not None:
+        stmt = stmt.where(Expense.iso_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Expense.iso_date <= date_to)
+    if category is not None:
+        stmt = stmt.where(Expense.category == category)
+    if min_amount is not None:
+        stmt = stmt.where(Expense.amount >= min_amount)
+    if max_amount is not None:
+        stmt = stmt.where(Expense.amount <= max_amount)
+    if after is not None:
+        stmt = stmt.where(key < tuple_(*after) if descending else key > tuple_(*after))
+
+    if descending:
+        stmt = stmt.order_by(Expense.iso_date.desc(), Expense.id.desc())
+    else:
+        stmt = stmt.order_by(Expense.iso_date, Expense.id)
+    return stmt.limit(limit + 1)
+
+
+async def fetch_page(db: AsyncSession, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                     category: Optional[str] = None, min_amount: Optional[float] = None,
+                     max_amount: Optional[float] = None, after: Optional[Cursor] = None,
+                     limit: int = 50, descending: bool = False,
+                     partitions: PartitionSet = partition_set) -> List[Expense]:
+    """
+    Строки страницы (до limit + 1) по всем разделам периода: db - сессия
+    горячего раздела, архивные разделы - через их сессии.
+    Разделы не пересекаются по датам, поэтому их страницы просто продолжают друг друга.
+    """
+    parts = partitions.plan(date_from, date_to)
+    if descending:
+        parts.reverse()
+
+    expenses = []
+    for part in parts:
+        if after is not None and part.year is not None:
+            # Раздел целиком до курсора (в порядке просмотра) пропускается
+            if (part.date_from > after[0]) if descending else (part.date_to < after[0]):
+                continue
+        stmt = page_query(part.date_from, part.date_to, category, min_amount, max_amount,
+                          after, limit - len(expenses), descending, part.since)
+        if part.year is None:
+            expenses.extend((await db.execute(stmt)).scalars().all())
+        else:
+            async with partitions.sessions(part.year)() as partition_db:
+                expenses.extend((await partition_db.execute(stmt)).scalars().all())
+        if len(expenses) > limit:
+            break
+    return expenses
+
+
+def expense_to_dict(expense: Expense) -> dict:
+    """Строка расхода для API"""
+    return {
+        "id": expense.id,
+        "date": expense.date,
+        "iso_date": expense.iso_date.isoformat(),
+        "category": expense.category,
+        "amount": expense.amount,
+        "comment": expense.comment,
+    }
@@ -0,0 +1,225 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics).
+
+Собственная минимальная реализация счетчиков, датчиков и гистограмм без
+внешних зависимостей: значения хранятся в памяти процесса по наборам меток,
+обновление - словарь и блокировка, поэтому метрики можно держать включенными.
+
+  * MetricsMiddleware - задержка, число и статусы HTTP-запросов, запросы в работе;
+  * stage_timer - время этапов обработки (загрузка, отчет, PDF);
+  * счетчики принятых и отклоненных строк загрузки, время рендеринга PDF;
+  * время SQL-запросов и число медленных (database.profile_queries).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+from config import METRICS_BUCKETS
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Базовая метрика: значения по кортежам значений меток"""
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        """Строки текстового формата для этой метрики"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: tuple, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """Текущее значение (может уменьшаться)"""
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Гистограмма наблюдений по границам корзин (le), с суммой и числом"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = METRICS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Наблюдение длительности блока в секундах"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Tuple[float, int]:
+        """(сумма, число) наблюдений"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return (state[1], state[2]) if state else (0.0, 0)
+
+    def _samples(self, key: tuple, state) -> List[str]:
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Набор метрик для выдачи на /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP-запросы по методу, маршруту и статусу", ("method", "route", "status"),
+))
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса (до конца тела ответа)", ("method", "route"),
+))
+IN_PROGRESS = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке",
+))
+STAGE_DURATION = registry.register(Histogram(
+    "stage_duration_seconds", "Время этапов обработки запросов", ("operation", "stage"),
+))
+INGEST_ROWS = registry.register(Counter(
+    "ingest_rows_total", "Строки загрузок: inserted, duplicate, rejected", ("result",),
+))
+PDF_RENDER = registry.register(Histogram(
+    "pdf_render_seconds", "Время рендеринга PDF-отчета", ("backend",),
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запросов", ("engine",),
+))
+DB_SLOW_QUERIES = registry.register(Counter(
+    "db_slow_queries_total", "SQL-запросы дольше SLOW_QUERY_THRESHOLD_MS", ("engine",),
+))
+
+
+@contextmanager
+def stage_timer(operation: str, stage: str):
+    """Замер этапа обработки в stage_duration_seconds"""
+    with STAGE_DURATION.time(operation=operation, stage=stage):
+        yield
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware учета HTTP-запросов.
+    Маршрут берется из шаблона пути (/upload/jobs/{job_id}), чтобы число рядов
+    не росло с числом id; запросы без маршрута учитываются как "unmatched".
+    Время включает передачу тела ответа (в том числе потокового).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_DURATION.observe(elapsed, method=scope["method"], route=path)
+            REQUESTS.inc(method=scope["method"], route=path, status=status)
@@ -0,0 +1,383 @@
+"""
+Архивные разделы расходов по годам.
+
+Закрытые годы переносятся из таблицы expenses в отдельные файлы SQLite
+(PARTITIONS_DIR/expenses_YYYY.db) командой python manage.py archive. Файл
+раздела сжат (VACUUM) и открывается только для чтения как неизменяемый
+(immutable), поэтому чтение раздела не берет блокировок. В expenses остается
+горячий раздел - годы начиная с границы архива, так что его индексы растут
+только с недавней историей.
+
+Запросы раскладываются по разделам через PartitionSet.plan(): архивные годы
+вне периода не читаются, горячий раздел ограничивается границей архива (since).
+Сводная таблица по-прежнему покрывает все годы, поэтому отчеты читают разделы
+только для неполных крайних месяцев.
+
+Новые строки с датой до границы загружаются в раздел своего года
+(move_to_partitions): раздел не изменяется на месте, строки пишутся в его
+копию, которая заменяет файл при коммите транзакции загрузки.
+"""
+import os
+import re
+import shutil
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import URL, create_engine, delete, event, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from config import BULK_BATCH_SIZE, PARTITIONS_DIR, PARTITION_QUERY_WORKERS
+from database import profile_queries
+from models import Expense
+from services.data_version import bump_data_version
+
+_FILE_NAME = re.compile(r"^expenses_(\d{4})\.db$")
+# Копии разделов с добавленными строками, ожидающие коммита: соединение -> {файл: копия}
+_pending: "weakref.WeakKeyDictionary[Connection, Dict[str, str]]" = weakref.WeakKeyDictionary()
+# Соединения с обработчиками коммита и отката (соединение писателя живет долго)
+_listening: "weakref.WeakSet[Connection]" = weakref.WeakSet()
+
+
+class Partition(NamedTuple):
+    """
+    Раздел, который нужно прочитать для периода.
+    year - год архивного раздела (None - горячий раздел, таблица expenses);
+    date_from, date_to - границы периода внутри раздела (None - без границы);
+    since - граница архива для горячего раздела: более ранние строки там не читаются.
+    """
+    year: Optional[int]
+    date_from: Optional[date]
+    date_to: Optional[date]
+    since: Optional[date] = None
+
+
+def _read_only_url(drivername: str, path: str) -> URL:
+    return URL.create(drivername, database=f"file:{os.path.abspath(path)}",
+                      query={"mode": "ro", "immutable": "1", "uri": "true"})
+
+
+class PartitionSet:
+    """
+    Архивные разделы в каталоге directory.
+    Список разделов перечитывается при изменении каталога (архивация из
+    manage.py видна работающему приложению без перезапуска).
+    """
+
+    def __init__(self, directory: str = PARTITIONS_DIR, workers: int = PARTITION_QUERY_WORKERS):
+        self.directory = directory
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._years: Tuple[int, ...] = ()
+        self._engines: Dict[str, Tuple[tuple, Engine]] = {}
+        self._sessions: Dict[str, async_sessionmaker] = {}
+        self._executor = None
+
+    def path(self, year: int) -> str:
+        """Файл раздела года"""
+        return os.path.join(self.directory, f"expenses_{year}.db")
+
+    def years(self) -> Tuple[int, ...]:
+        """Годы архивных разделов по возрастанию"""
+        try:
+            stamp = (self.directory, os.stat(self.directory).st_mtime_ns)
+        except FileNotFoundError:
+            return ()
+        with self._lock:
+            if stamp != self._stamp:
+                years = []
+                for name in os.listdir(self.directory):
+                    match = _FILE_NAME.match(name)
+                    if match:
+                        years.append(int(match.group(1)))
+                self._years, self._stamp = tuple(sorted(years)), stamp
+            return self._years
+
+    def boundary(self) -> Optional[date]:
+        """Начало горячего раздела: 1 января года после последнего архивного (None - архива нет)"""
+        years = self.years()
+        return date(years[-1] + 1, 1, 1) if years else None
+
+    def plan(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[Partition]:
+        """
+        Разделы, пересекающиеся с периодом [date_from, date_to], в порядке дат:
+        архивные годы, затем горячий раздел. Без архива - только горячий раздел.
+        """
+        years = self.years()
+        if not years:
+            return [Partition(None, date_from, date_to)]
+
+        parts = []
+        for year in years:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+            if (date_from is not None and date_from > end) or (date_to is not None and date_to < start):
+                continue
+            parts.append(Partition(
+                year,
+                max(date_from, start) if date_from is not None else start,
+                min(date_to, end) if date_to is not None else end,
+            ))
+        boundary = date(years[-1] + 1, 1, 1)
+        if date_to is None or date_to >= boundary:
+            parts.append(Partition(None, date_from, date_to, boundary))
+        return parts
+
+    def engine(self, year: int) -> Engine:
+        """
+        Синхронный engine раздела только для чтения.
+        Engine пересоздается, когда файл раздела заменен (move_to_partitions):
+        соединения с immutable=1 продолжили бы читать прежний файл.
+        """
+        path = self.path(year)
+        try:
+            stat = os.stat(path)
+            key = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            key = ()
+        with self._lock:
+            cached = self._engines.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            engine = create_engine(_read_only_url("sqlite", path),
+                                   connect_args={"check_same_thread": False})
+            profile_queries(engine, "partition")
+            self._engines[path] = (key, engine)
+        if cached is not None:
+            cached[1].dispose()
+        return engine
+
+    def sessions(self, year: int) -> async_sessionmaker:
+        """Фабрика асинхронных сессий раздела (без пула: соединения aiosqlite привязаны к event loop)"""
+        path = self.path(year)
+        with self._lock:
+            sessions = self._sessions.get(path)
+            if sessions is None:
+                engine = create_async_engine(_read_only_url("sqlite+aiosqlite", path), poolclass=NullPool)
+                profile_queries(engine, "partition")
+                sessions = self._sessions[path] = async_sessionmaker(
+                    engine, autoflush=False, expire_on_commit=False,
+                )
+            return sessions
+
+    def max_id(self, year: int) -> int:
+        """Наибольший id строки в разделе года (0 - раздел пуст)"""
+        with self.engine(year).connect() as conn:
+            return conn.execute(select(func.max(Expense.id))).scalar() or 0
+
+    def submit(self, year: int, fn: Callable[..., object], *args) -> Future:
+        """Выполнение fn(session, *args) на разделе года в пуле потоков"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="partition-reader")
+            executor = self._executor
+
+        def run():
+            with Session(self.engine(year)) as session:
+                return fn(session, *args)
+        return executor.submit(run)
+
+    def dispose(self):
+        """Закрытие соединений разделов и остановка пула потоков"""
+        with self._lock:
+            engines, self._engines = [engine for _, engine in self._engines.values()], {}
+            self._sessions = {}
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        for engine in engines:
+            engine.dispose()
+
+
+partition_set = PartitionSet()
+
+
+def _finish_copies(conn: Connection, publish: bool):
+    """Замена разделов копиями при коммите conn или удаление копий при откате"""
+    for path, copy_path in _pending.pop(conn, {}).items():
+        if publish:
+            os.chmod(copy_path, 0o444)
+            os.replace(copy_path, path)
+        elif os.path.exists(copy_path):
+            os.remove(copy_path)
+
+
+def _pending_copies(conn: Connection) -> Dict[str, str]:
+    """
+    Копии разделов, измененные в текущей транзакции conn: файл раздела -> копия.
+    При коммите копии заменяют разделы (еще под блокировкой записи основной БД,
+    поэтому следующая загрузка копирует уже новый файл), при откате удаляются.
+    """
+    copies = _pending.get(conn)
+    if copies is None:
+        copies = _pending[conn] = {}
+        if conn not in _listening:
+            _listening.add(conn)
+            event.listen(conn, "commit", lambda conn: _finish_copies(conn, True))
+            event.listen(conn, "rollback", lambda conn: _finish_copies(conn, False))
+    return copies
+
+
+def move_to_partitions(db, boundary: date, partitions: PartitionSet = partition_set) -> List[tuple]:
+    """
+    Перенос строк expenses с датой до границы архива в разделы их годов
+    (в текущей транзакции db, под блокировкой записи). Возвращает строки
+    (iso_date, category, amount), добавленные в разделы; строки, уже имеющиеся
+    в разделе (тот же отпечаток), пропускаются.
+
+    Строки сохраняют id, выданные expenses (AUTOINCREMENT), поэтому id не
+    совпадают с id строк разделов. Файл раздела копируется один раз за
+    транзакцию; год без раздела получает новый файл.
+    """
+    conn = db.connection() if isinstance(db, Session) else db
+    table = Expense.__table__
+    rows = conn.execute(
+        select(table).where(table.c.iso_date < boundary).order_by(table.c.iso_date, table.c.id)
+    ).all()
+    by_year: Dict[int, List[dict]] = {}
+    for row in rows:
+        by_year.setdefault(row.iso_date.year, []).append(row._asdict())
+
+    added = []
+    copies = _pending_copies(conn)
+    for year, values in by_year.items():
+        path = partitions.path(year)
+        copy_path = copies.get(path)
+        if copy_path is None:
+            copy_path = path + ".pending"
+            os.makedirs(partitions.directory, exist_ok=True)
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+            if os.path.exists(path):
+                shutil.copyfile(path, copy_path)
+            copies[path] = copy_path
+        target = create_engine(f"sqlite:///{copy_path}")
+        try:
+            table.create(target, checkfirst=True)
+            with target.begin() as out:
+                added.extend(out.execute(
+                    sqlite_insert(table)
+                    .on_conflict_do_nothing(index_elements=["fingerprint"])
+                    .returning(table.c.iso_date, table.c.category, table.c.amount),
+                    values,
+                ).all())
+        finally:
+            target.dispose()
+
+    conn.execute(delete(table).where(table.c.iso_date < boundary))
+    return added
+
+
+def _earlier_rows(conn, start: date, boundary: Optional[date]) -> int:
+    """Число строк горячего раздела с датой до start"""
+    table = Expense.__table__
+    stmt = select(func.count()).select_from(table).where(table.c.iso_date < start)
+    if boundary is not None:
+        stmt = stmt.where(table.c.iso_date >= boundary)
+    return conn.execute(stmt).scalar()
+
+
+def _copy_rows(conn, target: Engine, stmt) -> Tuple[int, int]:
+    """Копирование строк запроса в файл раздела: (число строк, наибольший id)"""
+    copied, last_id = 0, 0
+    rows = conn.execution_options(yield_per=BULK_BATCH_SIZE).execute(stmt)
+    with target.begin() as out:
+        for batch in rows.partitions():
+            out.execute(insert(Expense.__table__), [row._asdict() for row in batch])
+            copied += len(batch)
+            last_id = max(last_id, max(row.id for row in batch))
+    return copied, last_id
+
+
+def archive_year(engine: Engine, year: int, partitions: PartitionSet = partition_set) -> int:
+    """
+    Перенос строк года из expenses в файл раздела. Возвращает число перенесенных строк
+    (год без строк пропускается, файл не создается).
+
+    Годы переносятся по порядку: в горячем разделе не должно оставаться более
+    ранних строк. Строки копируются и файл сжимается без блокировки записи:
+    строки в expenses только добавляются, а id не переиспользуются
+    (AUTOINCREMENT), поэтому под блокировкой остается докопировать строки
+    года с id больше скопированных, опубликовать файл и удалить строки.
+    Файл публикуется переименованием до удаления строк из expenses: если
+    процесс прервется между ними, оставшиеся строки уже скрыты границей
+    архива и удаляются при следующей архивации или загрузке.
+    """
+    boundary = partitions.boundary()
+    if boundary is not None and year < boundary.year:
+        raise ValueError(f"{year} год уже в архиве")
+
+    table = Expense.__table__
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    in_year = (table.c.iso_date >= start) & (table.c.iso_date < end)
+    by_date = (table.c.iso_date, table.c.id)
+    path = partitions.path(year)
+    temp_path = path + ".tmp"
+
+    with engine.connect() as conn:
+        if _earlier_rows(conn, start, boundary):
+            raise ValueError(f"Сначала нужно перенести в архив годы до {year}")
+
+        os.makedirs(partitions.directory, exist_ok=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        target = create_engine(f"sqlite:///{temp_path}")
+        try:
+            table.create(target)
+            # Строки ложатся в файл в порядке дат - чтение периода идет подряд
+            moved, last_id = _copy_rows(conn, target, select(table).where(in_year).order_by(*by_date))
+            conn.rollback()
+            with target.connect().execution_options(isolation_level="AUTOCOMMIT") as out:
+                out.exec_driver_sql("ANALYZE")
+                out.exec_driver_sql("VACUUM")
+
+            with engine.begin() as locked:
+                # Первая запись транзакции берет блокировку записи SQLite до коммита
+                bump_data_version(locked)
+                if partitions.boundary() != boundary:
+                    raise ValueError(f"Архив изменился во время переноса {year} года")
+                if boundary is not None:
+                    locked.execute(delete(table).where(table.c.iso_date < boundary))
+                if _earlier_rows(locked, start, boundary):
+                    raise ValueError(f"Сначала нужно перенести в архив годы до {year}")
+                # Строки года, загруженные за время копирования
+                added, _ = _copy_rows(locked, target, select(table).where(in_year, table.c.id > last_id)
+                                      .order_by(*by_date))
+                moved += added
+                target.dispose()
+                if not moved:
+                    os.remove(temp_path)
+                    return 0
+                os.chmod(temp_path, 0o444)
+                os.replace(temp_path, path)
+                locked.execute(delete(table).where(in_year))
+        finally:
+            target.dispose()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return moved
+
+
+def archive_before(engine: Engine, year: int, partitions: PartitionSet = partition_set) -> Dict[int, int]:
+    """Перенос в архив всех годов горячего раздела до year (не включая): год -> число строк"""
+    boundary = partitions.boundary()
+    table = Expense.__table__
+    stmt = select(func.min(table.c.iso_date))
+    if boundary is not None:
+        stmt = stmt.where(table.c.iso_date >= boundary)
+    with engine.connect() as conn:
+        first = conn.execute(stmt).scalar()
+
+    moved = {}
+    if first is None:
+        return moved
+    for archived_year in range(first.year, year):
+        moved[archived_year] = archive_year(engine, archived_year, partitions)
+    return moved
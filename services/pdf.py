@@ -0,0 +1,234 @@
+"""
+Генерация PDF вне event loop.
+
+Рендеринг выполняется в ограниченном пуле потоков: обработчик запроса
+ждет результат через await и не блокирует остальные запросы, а число
+одновременно рендерящихся PDF не превышает PDF_MAX_WORKERS.
+
+Бэкенды (config.PDF_BACKEND):
+  * "wkhtmltopdf" - HTML-шаблон report.html.j2 через pdfkit и внешний wkhtmltopdf;
+  * "fpdf" - отрисовка таблиц в процессе через fpdf2, без внешних программ.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from jinja2 import Environment
+
+from config import (
+    PDF_BACKEND, PDF_CACHE_DIR, PDF_FONT_BOLD_PATH, PDF_FONT_PATH, PDF_MAX_WORKERS, WKHTMLTOPDF_PATH,
+)
+from services.report_cache import template_fingerprint
+
+_executor = ThreadPoolExecutor(max_workers=PDF_MAX_WORKERS, thread_name_prefix="pdf-render")
+
+
+class PdfRenderer(ABC):
+    """
+    Интерфейс бэкенда PDF.
+    render() получает контекст отчета: total, avg, month_stats, category_stats,
+    generated_at, current_year - и возвращает содержимое PDF.
+    """
+    name = ""
+
+    @abstractmethod
+    def render(self, context: dict) -> bytes:
+        """Содержимое PDF для контекста отчета"""
+
+    @abstractmethod
+    def cache_token(self) -> str:
+        """Метка оформления: входит в ключ кэша готовых PDF"""
+
+
+class WkhtmltopdfRenderer(PdfRenderer):
+    """HTML-шаблон -> PDF через внешний процесс wkhtmltopdf"""
+    name = "wkhtmltopdf"
+    template_name = "report.html.j2"
+
+    def __init__(self, env: Environment):
+        self.env = env
+
+    def render(self, context: dict) -> bytes:
+        import pdfkit
+
+        html = self.env.get_template(self.template_name).render(**context)
+        config = pdfkit.configuration(wkhtmltopdf=WKHTMLTOPDF_PATH)
+        return pdfkit.from_string(html, False, configuration=config)
+
+    def cache_token(self) -> str:
+        return f"{self.name}:{template_fingerprint(self.template_name)}"
+
+
+class FpdfRenderer(PdfRenderer):
+    """Отрисовка отчета напрямую в PDF средствами fpdf2 (в процессе)"""
+    name = "fpdf"
+    # Увеличивать при изменении оформления, чтобы сбросить кэш PDF
+    layout_version = 3
+    # Символы, которые нужны отчету: латиница, кириллица, №, ₽, ©
+    unicode_ranges = "U+0020-007E, U+00A0-00FF, U+0400-045F, U+2013-2014, U+2116, U+20BD"
+
+    def __init__(self):
+        # Ошибка настройки видна при создании бэкенда, а не при первом отчете
+        for setting, path in (("PDF_FONT_PATH", PDF_FONT_PATH), ("PDF_FONT_BOLD_PATH", PDF_FONT_BOLD_PATH)):
+            if not os.path.isfile(path):
+                raise ValueError(f"{setting}: файл шрифта не найден: {path}")
+        self._fonts = None
+        self._covered = frozenset()
+        self._fonts_lock = threading.Lock()
+
+    def _font_paths(self, text: str = ""):
+        """
+        Шрифты для документа с текстом text.
+        Обычно - урезанные до unicode_ranges копии: полный DejaVuSans разбирается
+        fonttools около 70 мс на каждый документ, подмножество - в разы быстрее;
+        подмножество строится один раз на процесс. Если в тексте есть символы
+        вне подмножества (ґ, расширенная кириллица, CJK), берутся полные шрифты,
+        иначе эти символы пропали бы из PDF.
+        """
+        with self._fonts_lock:
+            if self._fonts is None:
+                from fontTools import subset
+
+                self._covered = frozenset(subset.parse_unicodes(self.unicode_ranges.replace(" ", "")))
+                self._fonts = tuple(self._subset_font(path) for path in (PDF_FONT_PATH, PDF_FONT_BOLD_PATH))
+            if any(ord(char) not in self._covered for char in text):
+                return PDF_FONT_PATH, PDF_FONT_BOLD_PATH
+            return self._fonts
+
+    @staticmethod
+    def _context_text(context: dict) -> str:
+        """Текст из контекста отчета, попадающий в PDF (кроме чисел и постоянных надписей)"""
+        parts = [str(context["generated_at"]), context.get("filter_label") or ""]
+        parts.extend(str(row["month"]) for row in context["month_stats"])
+        parts.extend(str(row["category"]) for row in context["category_stats"])
+        return "".join(parts)
+
+    def _subset_font(self, path: str) -> str:
+        """Построение (или переиспользование) подмножества TTF-шрифта в кэш-директории"""
+        from fontTools import subset
+
+        stat = os.stat(path)
+        raw = f"{path}:{stat.st_size}:{stat.st_mtime}:{self.unicode_ranges}"
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+        fonts_dir = os.path.join(PDF_CACHE_DIR, "fonts")
+        target = os.path.join(fonts_dir, f"{os.path.splitext(os.path.basename(path))[0]}-{digest}.ttf")
+        if os.path.exists(target):
+            return target
+
+        os.makedirs(fonts_dir, exist_ok=True)
+        options = subset.Options()
+        options.layout_features = ["*"]
+        options.name_IDs = ["*"]
+        options.drop_tables += ["FFTM"]
+        font = subset.load_font(path, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=subset.parse_unicodes(self.unicode_ranges.replace(" ", "")))
+        subsetter.subset(font)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        subset.save_font(font, tmp_path, options)
+        os.replace(tmp_path, target)
+        return target
+
+    PRIMARY = (99, 102, 241)
+    TEXT = (30, 41, 59)
+    TEXT_LIGHT = (100, 116, 139)
+    BORDER = (226, 232, 240)
+
+    def render(self, context: dict) -> bytes:
+        try:
+            from fpdf import FPDF
+        except ImportError as e:
+            raise RuntimeError("Для PDF_BACKEND = 'fpdf' установите пакет fpdf2") from e
+
+        regular, bold = self._font_paths(self._context_text(context))
+        pdf = FPDF(format="A4")
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_font("DejaVu", "", regular)
+        pdf.add_font("DejaVu", "B", bold)
+        pdf.add_page()
+
+        # Заголовок
+        pdf.set_font("DejaVu", "B", 18)
+        pdf.set_text_color(*self.PRIMARY)
+        pdf.cell(0, 10, "Отчёт по расходам", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("DejaVu", "", 10)
+        pdf.set_text_color(*self.TEXT_LIGHT)
+        pdf.cell(0, 6, f"Сформирован: {context['generated_at']}", new_x="LMARGIN", new_y="NEXT")
+        if context.get("filter_label"):
+            pdf.cell(0, 6, context["filter_label"], new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(4)
+
+        # Карточки с итогами
+        width = pdf.epw / 2
+        pdf.set_fill_color(*self.PRIMARY)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("DejaVu", "", 10)
+        pdf.cell(width, 8, "Общая сумма расходов", fill=True)
+        pdf.cell(width, 8, "Средний расход", fill=True, new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("DejaVu", "B", 16)
+        pdf.cell(width, 12, f"{context['total']:.2f} ₽", fill=True)
+        pdf.cell(width, 12, f"{context['avg']:.2f} ₽", fill=True, new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(6)
+
+        month_stats = context["month_stats"]
+        category_stats = context["category_stats"]
+        if month_stats:
+            self._table(pdf, "Расходы по месяцам", "Месяц", "month", month_stats)
+        if category_stats:
+            self._table(pdf, "Расходы по категориям", "Категория", "category", category_stats)
+        if not month_stats and not category_stats:
+            pdf.set_font("DejaVu", "", 11)
+            pdf.set_text_color(*self.TEXT)
+            pdf.cell(0, 8, "Нет данных для отображения.", new_x="LMARGIN", new_y="NEXT")
+
+        pdf.ln(6)
+        pdf.set_font("DejaVu", "", 8)
+        pdf.set_text_color(*self.TEXT_LIGHT)
+        pdf.cell(0, 6, f"© {context['current_year']} Expense Tracker", align="C")
+
+        return bytes(pdf.output())
+
+    def _table(self, pdf, title: str, key_title: str, key: str, rows):
+        """Таблица сумма/среднее по группам"""
+        pdf.set_font("DejaVu", "B", 13)
+        pdf.set_text_color(*self.TEXT)
+        pdf.cell(0, 10, title, new_x="LMARGIN", new_y="NEXT")
+
+        widths = (pdf.epw * 0.4, pdf.epw * 0.3, pdf.epw * 0.3)
+        pdf.set_font("DejaVu", "B", 10)
+        pdf.set_fill_color(*self.PRIMARY)
+        pdf.set_text_color(255, 255, 255)
+        for width, header in zip(widths, (key_title, "Сумма", "Среднее")):
+            pdf.cell(width, 8, header, fill=True)
+        pdf.ln()
+
+        pdf.set_font("DejaVu", "", 10)
+        pdf.set_text_color(*self.TEXT)
+        pdf.set_draw_color(*self.BORDER)
+        for row in rows:
+            values = (str(row[key]), f"{row['sum']:.2f} ₽", f"{row['avg']:.2f} ₽")
+            for width, value in zip(widths, values):
+                pdf.cell(width, 7, value, border="B")
+            pdf.ln()
+        pdf.ln(4)
+
+    def cache_token(self) -> str:
+        return f"{self.name}:{self.layout_version}"
+
+
+def create_renderer(env: Environment, backend: str = PDF_BACKEND) -> PdfRenderer:
+    """Бэкенд PDF по имени из конфигурации"""
+    if backend == WkhtmltopdfRenderer.name:
+        return WkhtmltopdfRenderer(env)
+    if backend == FpdfRenderer.name:
+        return FpdfRenderer()
+    raise ValueError(f"Неизвестный бэкенд PDF: {backend}")
+
+
+async def render_pdf(renderer: PdfRenderer, context: dict) -> bytes:
+    """Рендеринг PDF в пуле воркеров"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, renderer.render, context)
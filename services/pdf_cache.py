@@ -0,0 +1,113 @@
+"""
+Дисковый кэш готовых PDF-отчетов.
+Ключ - хэш версии данных, параметров отчета и шаблона, поэтому повторное
+скачивание между загрузками отдает готовый файл без запуска рендеринга.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, Hashable
+
+from config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES
+
+
+class PdfCache:
+    """
+    Директория с PDF-файлами, ограниченная по суммарному размеру.
+    Вытесняются давно не запрашиваемые файлы (LRU): время последнего
+    обращения хранится в atime, mtime остается временем построения.
+    """
+
+    def __init__(self, directory: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Ключ -> [блокировка, число запросов, которые ее держат или ждут]
+        self._locks: Dict[str, list] = {}
+
+    @staticmethod
+    def make_key(version: int, params: Hashable, template_hash: str) -> str:
+        """Ключ артефакта"""
+        raw = f"{version}:{params!r}:{template_hash}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """Путь к файлу артефакта"""
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str):
+        """Путь к готовому PDF или None. Отмечает обращение для LRU"""
+        path = self.path_for(key)
+        try:
+            mtime = os.stat(path).st_mtime
+            os.utime(path, (time.time(), mtime))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        """Атомарная запись PDF в кэш и вытеснение лишнего"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: str = None):
+        """Удаление самых давно запрошенных файлов, пока размер кэша больше лимита"""
+        entries, total = [], 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".pdf"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> str:
+        """
+        Путь к PDF из кэша; при промахе - рендеринг и сохранение.
+        Одновременные запросы одного отчета рендерят его один раз.
+        Блокировка ключа удаляется, когда ее не держит и не ждет ни один запрос:
+        по lock.locked() ожидающий запрос не виден в момент передачи блокировки.
+        """
+        path = self.get(key)
+        if path:
+            return path
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                path = self.get(key)
+                if path:
+                    return path
+                data = await render()
+                return self.put(key, data)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+pdf_cache = PdfCache()
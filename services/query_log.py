@@ -0,0 +1,106 @@
+"""
+Журнал медленных SQL-запросов.
+
+Запросы дольше threshold_ms попадают в кольцевой буфер последних медленных
+запросов вместе с параметрами и планом SQLite (EXPLAIN QUERY PLAN).
+Подключается к engine через database.profile_queries, просмотр - GET /debug/slow-queries.
+"""
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Sequence
+
+from config import SLOW_QUERY_LOG_SIZE, SLOW_QUERY_THRESHOLD_MS
+
+# Запросы, для которых имеет смысл план (DDL, PRAGMA и управление транзакциями - нет)
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def _jsonable(value):
+    """Значение параметра запроса в виде, пригодном для JSON"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def format_plan(rows: Sequence[tuple]) -> List[str]:
+    """Строки EXPLAIN QUERY PLAN (id, parent, notused, detail) с отступами по вложенности"""
+    depth = {}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth[parent] + 1 if parent in depth else 0
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def is_full_scan(plan: List[str]) -> bool:
+    """Есть ли в плане полный просмотр таблицы (SCAN без индекса)"""
+    for line in plan:
+        detail = line.strip()
+        if detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail:
+            return True
+    return False
+
+
+def explain(cursor, statement: str, parameters) -> Optional[List[str]]:
+    """План запроса на том же соединении (None - для запросов без плана)"""
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+    return format_plan(cursor.fetchall())
+
+
+class SlowQueryLog:
+    """
+    Последние size медленных запросов (старые вытесняются).
+    threshold_ms можно менять на ходу.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, size: int = SLOW_QUERY_LOG_SIZE):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def is_slow(self, duration_ms: float) -> bool:
+        return duration_ms >= self.threshold_ms
+
+    def record(self, statement: str, parameters, duration_ms: float, executemany: bool,
+               plan: Optional[List[str]], source: str):
+        """Запись медленного запроса; для executemany сохраняется первый набор параметров"""
+        if executemany:
+            rows = len(parameters)
+            parameters = parameters[0] if parameters else ()
+        else:
+            rows = 1
+        if isinstance(parameters, dict):
+            parameters = {key: _jsonable(value) for key, value in parameters.items()}
+        else:
+            parameters = [_jsonable(value) for value in parameters or ()]
+
+        entry = {
+            "sql": statement,
+            "parameters": parameters,
+            "parameter_sets": rows,
+            "duration_ms": round(duration_ms, 3),
+            "source": source,
+            "plan": plan,
+            "full_scan": is_full_scan(plan) if plan else False,
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def worst(self) -> List[dict]:
+        """Запросы из буфера, самые долгие первыми"""
+        with self._lock:
+            entries = list(self._entries)
+        return sorted(entries, key=lambda entry: entry["duration_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
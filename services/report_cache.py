@@ -0,0 +1,94 @@
+"""
+Кэш вычисленных данных отчетов с ключом по версии данных
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import REPORT_CACHE_SIZE, TEMPLATES_DIR
+from services.data_version import get_data_version
+
+
+class ReportCache:
+    """
+    LRU-кэш данных отчета в памяти процесса.
+    Ключ - (версия данных, параметры отчета); после загрузки версия меняется,
+    и старые записи просто вытесняются.
+    """
+
+    def __init__(self, maxsize: int = REPORT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_or_build(self, db: AsyncSession, build: Callable[[AsyncSession], Awaitable[dict]],
+                           params: Hashable = (), version: Optional[int] = None) -> Tuple[int, dict]:
+        """
+        Возвращает (версия, данные отчета), пересчитывая их только при смене версии.
+        build - асинхронная функция построения, получает сессию db;
+        version - уже прочитанная вызывающим версия данных (иначе читается здесь).
+        """
+        # Версия читается до данных: данные в кэше не старее своей версии
+        if version is None:
+            version = await db.run_sync(get_data_version)
+        key = (version, params)
+
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return version, self._items[key]
+
+        report = await build(db)
+
+        with self._lock:
+            self._items[key] = report
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return version, report
+
+    def clear(self):
+        """Очистка кэша"""
+        with self._lock:
+            self._items.clear()
+
+
+report_cache = ReportCache()
+
+_template_fingerprints = {}
+
+
+def template_fingerprint(*names: str) -> str:
+    """Хэш файлов шаблонов: ключи кэша меняются и при обновлении разметки"""
+    names = names or ("base.html", "report.html")
+    if names not in _template_fingerprints:
+        digest = hashlib.sha1()
+        for name in names:
+            with open(os.path.join(TEMPLATES_DIR, name), "rb") as f:
+                digest.update(f.read())
+        _template_fingerprints[names] = digest.hexdigest()[:12]
+    return _template_fingerprints[names]
+
+
+def make_etag(version: int, params: Hashable = ()) -> str:
+    """ETag отчета по версии данных, параметрам и шаблонам"""
+    raw = f"{version}:{params!r}:{template_fingerprint()}"
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка заголовка If-None-Match (список значений, слабые ETag, *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
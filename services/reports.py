@@ -0,0 +1,249 @@
+"""
+Сервис построения отчетов.
+Все разрезы (итоги, по месяцам, по категориям, по месяцам и категориям)
+вычисляются за один проход: строки уровня (месяц, категория) сворачиваются
+в более крупные группы в Python.
+
+Отчет с фильтром по датам берет целые месяцы периода из сводной таблицы,
+а неполные крайние месяцы - группировкой строк expenses по диапазону iso_date
+(по индексу), так что читаются только строки внутри периода. Крайние месяцы
+в архивных годах читаются из их разделов (services.partitions) в пуле потоков
+параллельно; обработчики ждут их асинхронно (fetch_archived_rows).
+
+Медиана и перцентили (p50, p90, p99) считаются слиянием скетчей квантилей
+групп (services.sketch) с относительной погрешностью QUANTILE_ACCURACY.
+"""
+import asyncio
+from concurrent.futures import Future
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Expense, ExpenseRollup
+from services.metrics import stage_timer
+from services.partitions import PartitionSet, partition_set
+from services.rollup import aggregate_rows, month_key
+from services.sketch import QuantileSketch
+
+
+# Квантили в отчете: ключ группы -> q
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def _new_group(**keys) -> dict:
+    """Пустая группа статистики"""
+    return dict(keys, count=0, sum=0.0, min=None, max=None, sketch=None)
+
+
+def _merge(group: dict, count: int, total: float, min_amount, max_amount, sketch_data=None):
+    """Добавление агрегатов подгруппы в группу (sketch_data - сериализованный скетч)"""
+    if sketch_data is not None:
+        if group["sketch"] is None:
+            group["sketch"] = QuantileSketch.from_bytes(sketch_data)
+        else:
+            group["sketch"].merge(QuantileSketch.from_bytes(sketch_data))
+    group["count"] += count
+    group["sum"] += total
+    if min_amount is not None and (group["min"] is None or min_amount < group["min"]):
+        group["min"] = min_amount
+    if max_amount is not None and (group["max"] is None or max_amount > group["max"]):
+        group["max"] = max_amount
+
+
+def _finalize(group: dict) -> dict:
+    """Расчет среднего и квантилей для группы (квантили - None, если скетча нет)"""
+    group["avg"] = group["sum"] / group["count"] if group["count"] else 0
+    sketch = group.pop("sketch")
+    for key, q in QUANTILES.items():
+        group[key] = sketch.quantile(q) if sketch is not None else None
+    return group
+
+
+def summarize(rows: Iterable) -> dict:
+    """
+    Сворачивание строк уровня (месяц, категория) во все разрезы отчета.
+    Каждая строка: month, category, count, total, min_amount, max_amount
+    и, необязательно, сериализованный скетч квантилей (sketch).
+    Строки должны быть упорядочены по (month, category).
+    """
+    overall = _new_group()
+    by_month, by_category, by_month_category = {}, {}, []
+
+    for month, category, *stats in rows:
+        cell = _new_group(month=month, category=category)
+        _merge(cell, *stats)
+        by_month_category.append(_finalize(cell))
+
+        if month not in by_month:
+            by_month[month] = _new_group(month=month)
+        if category not in by_category:
+            by_category[category] = _new_group(category=category)
+        for group in (overall, by_month[month], by_category[category]):
+            _merge(group, *stats)
+
+    _finalize(overall)
+    return {
+        "total": overall["sum"],
+        "avg": overall["avg"],
+        "count": overall["count"],
+        **{key: overall[key] for key in QUANTILES},
+        "by_month": [_finalize(g) for g in by_month.values()],
+        "by_category": [_finalize(by_category[c]) for c in sorted(by_category)],
+        "by_month_category": by_month_category,
+    }
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month_start(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def split_period(date_from: Optional[date], date_to: Optional[date]):
+    """
+    Разбиение периода [date_from, date_to] (None - без границы) на целые месяцы
+    и неполные крайние отрезки.
+    Возвращает ((первый месяц, месяц после последнего) или None, [(начало, конец), ...]);
+    ключи месяцев - строки YYYY-MM, None в паре месяцев - без границы.
+    """
+    full_from = date_from if date_from is None or date_from.day == 1 else _next_month_start(date_from)
+    if date_to is None:
+        full_to = None
+    elif _next_month_start(date_to) - timedelta(days=1) == date_to:
+        full_to = _next_month_start(date_to)
+    else:
+        full_to = _month_start(date_to)
+
+    if full_from is not None and full_to is not None and full_from >= full_to:
+        return None, [(date_from, date_to)]
+
+    edges = []
+    if full_from is not None and full_from != date_from:
+        edges.append((date_from, full_from - timedelta(days=1)))
+    if full_to is not None and date_to is not None and full_to <= date_to:
+        edges.append((full_to, date_to))
+    months = (
+        month_key(full_from) if full_from is not None else None,
+        month_key(full_to) if full_to is not None else None,
+    )
+    return months, edges
+
+
+def _rollup_rows(db: Session, months: Tuple[Optional[str], Optional[str]], category: Optional[str]) -> List[tuple]:
+    """Строки (месяц, категория) сводной таблицы за месяцы [первый, последний)"""
+    stmt = select(
+        ExpenseRollup.month,
+        ExpenseRollup.category,
+        ExpenseRollup.row_count,
+        ExpenseRollup.total,
+        ExpenseRollup.min_amount,
+        ExpenseRollup.max_amount,
+        ExpenseRollup.sketch,
+    )
+    month_from, month_to = months
+    if month_from is not None:
+        stmt = stmt.where(ExpenseRollup.month >= month_from)
+    if month_to is not None:
+        stmt = stmt.where(ExpenseRollup.month < month_to)
+    if category is not None:
+        stmt = stmt.where(ExpenseRollup.category == category)
+    return [tuple(row) for row in db.execute(stmt)]
+
+
+def _expense_rows(db: Session, date_from: Optional[date], date_to: Optional[date],
+                  category: Optional[str], since: Optional[date] = None) -> List[tuple]:
+    """
+    Группировка строк expenses за [date_from, date_to] до уровня (месяц, категория).
+    Для квантилей нужны сами суммы, поэтому группировка выполняется в Python.
+    since - граница архива для горячего раздела.
+    """
+    month = func.substr(Expense.iso_date, 1, 7)
+    stmt = select(month, Expense.category, Expense.amount).where(Expense.iso_date.is_not(None))
+    if since is not None:
+        stmt = stmt.where(Expense.iso_date >= since)
+    if date_from is not None:
+        stmt = stmt.where(Expense.iso_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Expense.iso_date <= date_to)
+    if category is not None:
+        stmt = stmt.where(Expense.category == category)
+    groups = aggregate_rows(db.execute(stmt))
+    return [
+        (month, category, count, total, min_amount, max_amount, sketch.to_bytes())
+        for (month, category), (count, total, min_amount, max_amount, sketch) in groups.items()
+    ]
+
+
+def _archived_futures(edges: List[Tuple[date, date]], category: Optional[str],
+                      partitions: PartitionSet) -> List[Future]:
+    """Запросы неполных крайних месяцев к архивным разделам, запущенные в пуле потоков разделов"""
+    futures = []
+    for edge_from, edge_to in edges:
+        for part in partitions.plan(edge_from, edge_to):
+            if part.year is not None:
+                futures.append(partitions.submit(part.year, _expense_rows, part.date_from, part.date_to, category))
+    return futures
+
+
+async def fetch_archived_rows(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                              category: Optional[str] = None,
+                              partitions: PartitionSet = partition_set) -> List[tuple]:
+    """
+    Строки неполных крайних месяцев из архивных разделов для build_report(archived_rows=...).
+    Разделы читаются параллельно в пуле потоков; event loop в это время свободен.
+    """
+    if date_from is not None and date_to is not None and date_from > date_to:
+        return []
+    _, edges = split_period(date_from, date_to)
+    results = await asyncio.gather(*(
+        asyncio.wrap_future(future) for future in _archived_futures(edges, category, partitions)
+    ))
+    return [row for rows in results for row in rows]
+
+
+def build_report(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                 category: Optional[str] = None, partitions: PartitionSet = partition_set,
+                 archived_rows: Optional[List[tuple]] = None) -> dict:
+    """
+    Данные отчета за период (границы включительно) и, при необходимости, по одной категории.
+    archived_rows - заранее прочитанные строки архивных разделов (fetch_archived_rows);
+    None - разделы читаются здесь же, с ожиданием (для синхронного кода).
+    """
+    if date_from is not None and date_to is not None and date_from > date_to:
+        return summarize([])
+
+    months, edges = split_period(date_from, date_to)
+    # Запросы к архивным разделам выполняются одновременно с запросами к основной БД
+    futures = _archived_futures(edges, category, partitions) if archived_rows is None else []
+    with stage_timer("report_build", "rollup_query"):
+        rows = _rollup_rows(db, months, category) if months is not None else []
+    with stage_timer("report_build", "edge_query"):
+        for edge_from, edge_to in edges:
+            for part in partitions.plan(edge_from, edge_to):
+                if part.year is None:
+                    rows.extend(_expense_rows(db, part.date_from, part.date_to, category, part.since))
+        if archived_rows is None:
+            archived_rows = [row for future in futures for row in future.result()]
+        rows.extend(archived_rows)
+    # Отрезки не пересекаются по месяцам, поэтому достаточно упорядочить строки
+    rows.sort(key=lambda row: (row[0], row[1]))
+    with stage_timer("report_build", "summarize"):
+        return summarize(rows)
+
+
+def describe_filters(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                     category: Optional[str] = None) -> str:
+    """Подпись фильтров отчета (пустая строка - отчет за все время)"""
+    parts = []
+    if date_from is not None:
+        parts.append(f"с {date_from:%d.%m.%Y}")
+    if date_to is not None:
+        parts.append(f"по {date_to:%d.%m.%Y}")
+    label = f"Период: {' '.join(parts)}" if parts else ""
+    if category is not None:
+        label = f"{label}, категория: {category}" if label else f"Категория: {category}"
+    return label
@@ -0,0 +1,168 @@
+"""
+Сводная таблица расходов по (месяц, категория).
+Обновляется инкрементально в той же транзакции, что и вставка строк,
+поэтому отчеты читают O(месяцев x категорий) строк вместо всей таблицы.
+Кроме сумм и экстремумов группа хранит скетч квантилей (services.sketch).
+Сводная таблица покрывает и архивные разделы (services.partitions).
+"""
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import LargeBinary, bindparam, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from config import BULK_BATCH_SIZE
+from models import Expense, ExpenseRollup
+from services.data_version import bump_data_version
+from services.partitions import PartitionSet, partition_set
+from services.sketch import QuantileSketch
+
+
+def month_key(iso_date) -> str:
+    """Ключ месяца YYYY-MM для канонической даты"""
+    return f"{iso_date.year:04d}-{iso_date.month:02d}"
+
+
+def aggregate_rows(rows: Iterable[tuple]) -> Dict[Tuple[str, str], list]:
+    """
+    Группировка строк (месяц, категория, сумма):
+    (месяц, категория) -> [count, sum, min, max, скетч квантилей]
+    """
+    groups = {}
+    for month, category, amount in rows:
+        key = (month, category)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [0, 0.0, amount, amount, QuantileSketch()]
+        group[0] += 1
+        group[1] += amount
+        if amount < group[2]:
+            group[2] = amount
+        if amount > group[3]:
+            group[3] = amount
+        group[4].add(amount)
+    return groups
+
+
+def _amount_rows(since: Optional[date] = None):
+    """Запрос строк (месяц, категория, сумма) с датой не раньше since"""
+    month = func.substr(Expense.iso_date, 1, 7)
+    stmt = select(month, Expense.category, Expense.amount).where(Expense.iso_date.is_not(None))
+    if since is not None:
+        stmt = stmt.where(Expense.iso_date >= since)
+    return stmt
+
+
+def apply_inserted(db, rows: Iterable[tuple]) -> int:
+    """
+    Добавление в сводную таблицу строк (месяц, категория, сумма), только что
+    вставленных в текущей транзакции. Возвращает число таких строк.
+    """
+    groups = aggregate_rows(rows)
+    upsert_groups(db, {key: group[:4] for key, group in groups.items()})
+    merge_sketches(db, {key: group[4] for key, group in groups.items()})
+    return sum(group[0] for group in groups.values())
+
+
+def merge_sketches(db, sketches: Dict[Tuple[str, str], QuantileSketch]):
+    """Слияние скетчей квантилей с хранящимися в сводной таблице (строки уже существуют)"""
+    if not sketches:
+        return
+
+    table = ExpenseRollup.__table__
+    stored = db.execute(
+        select(table.c.month, table.c.category, table.c.sketch)
+        .where(tuple_(table.c.month, table.c.category).in_(list(sketches)))
+    )
+    for month, category, data in stored:
+        if data is not None:
+            sketches[(month, category)].merge(QuantileSketch.from_bytes(data))
+    store_sketches(db, sketches)
+
+
+def store_sketches(db, sketches: Dict[Tuple[str, str], QuantileSketch]):
+    """Запись скетчей квантилей в существующие строки сводной таблицы"""
+    if not sketches:
+        return
+
+    table = ExpenseRollup.__table__
+    db.execute(
+        update(table)
+        .where(table.c.month == bindparam("b_month"), table.c.category == bindparam("b_category"))
+        .values(sketch=bindparam("b_sketch", type_=LargeBinary)),
+        [
+            {"b_month": month, "b_category": category, "b_sketch": sketch.to_bytes()}
+            for (month, category), sketch in sketches.items()
+        ],
+    )
+
+
+def upsert_groups(db: Session, groups: Dict[Tuple[str, str], list]):
+    """Слияние групп (месяц, категория) -> [count, sum, min, max] со сводной таблицей"""
+    if not groups:
+        return
+
+    table = ExpenseRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.month, table.c.category],
+        set_={
+            "row_count": table.c.row_count + stmt.excluded.row_count,
+            "total": table.c.total + stmt.excluded.total,
+            # min()/max() с двумя аргументами в SQLite - скалярные функции
+            "min_amount": func.min(table.c.min_amount, stmt.excluded.min_amount),
+            "max_amount": func.max(table.c.max_amount, stmt.excluded.max_amount),
+        },
+    )
+    db.execute(stmt, [
+        {
+            "month": month, "category": category,
+            "row_count": count, "total": total,
+            "min_amount": min_amount, "max_amount": max_amount,
+        }
+        for (month, category), (count, total, min_amount, max_amount) in groups.items()
+    ])
+
+
+def rebuild_rollup(conn: Connection, partitions: PartitionSet = partition_set):
+    """
+    Полный пересчет сводной таблицы по таблице расходов и архивным разделам
+    (восстановление после расхождений)
+    """
+    since = partitions.boundary()
+    month = func.substr(Expense.iso_date, 1, 7)
+    stmt = select(
+        month,
+        Expense.category,
+        func.count(Expense.id),
+        func.sum(Expense.amount),
+        func.min(Expense.amount),
+        func.max(Expense.amount),
+    ).where(Expense.iso_date.is_not(None))
+    if since is not None:
+        stmt = stmt.where(Expense.iso_date >= since)
+    conn.execute(delete(ExpenseRollup))
+    conn.execute(insert(ExpenseRollup).from_select(
+        ["month", "category", "row_count", "total", "min_amount", "max_amount"],
+        stmt.group_by(month, Expense.category),
+    ))
+
+    # Скетчи квантилей - проходом по суммам (порциями, без загрузки всей таблицы)
+    sketches = {}
+    result = conn.execution_options(yield_per=BULK_BATCH_SIZE).execute(_amount_rows(since=since))
+    for key_month, category, amount in result:
+        sketch = sketches.get((key_month, category))
+        if sketch is None:
+            sketch = sketches[(key_month, category)] = QuantileSketch()
+        sketch.add(amount)
+    store_sketches(conn, sketches)
+
+    # Архивные годы не пересекаются с горячим разделом по месяцам
+    for year in partitions.years():
+        with partitions.engine(year).connect() as partition:
+            groups = aggregate_rows(partition.execute(_amount_rows()))
+        upsert_groups(conn, {key: group[:4] for key, group in groups.items()})
+        store_sketches(conn, {key: group[4] for key, group in groups.items()})
+    bump_data_version(conn)
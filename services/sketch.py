@@ -0,0 +1,102 @@
+"""
+Сливаемый скетч квантилей (по схеме DDSketch).
+
+Значения раскладываются по логарифмическим корзинам: корзина i содержит
+значения из (gamma^(i-1), gamma^i], gamma = (1 + a) / (1 - a). Квантиль,
+восстановленный по корзине, отличается от точного не больше чем на
+относительную погрешность a (QUANTILE_ACCURACY). Слияние - сложение счетчиков
+корзин, поэтому скетчи хранятся по (месяц, категория) и объединяются при
+построении отчета за O(групп x корзин) без чтения строк.
+
+Суммы расходов положительны; неположительные значения учитываются как 0,
+бесконечности и NaN в скетч не попадают.
+"""
+import math
+import struct
+from typing import Dict, Iterable, Optional
+
+from config import QUANTILE_ACCURACY
+
+# Версия формата сериализации (первый байт)
+_FORMAT = 1
+
+
+class QuantileSketch:
+    """Скетч квантилей с относительной погрешностью accuracy"""
+    __slots__ = ("bins", "zero_count", "_log_gamma")
+
+    def __init__(self, accuracy: float = QUANTILE_ACCURACY):
+        if not 0 < accuracy < 1:
+            raise ValueError("accuracy должна быть в (0, 1)")
+        gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float):
+        """Учет одного значения"""
+        if value > 0:
+            if value == math.inf:
+                return
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        elif value <= 0:
+            self.zero_count += 1
+
+    def update(self, values: Iterable[float]):
+        """Учет последовательности значений"""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Добавление счетчиков другого скетча (с той же погрешностью)"""
+        if other._log_gamma != self._log_gamma:
+            raise ValueError("Скетчи с разной погрешностью не сливаются")
+        bins = self.bins
+        for index, count in other.bins.items():
+            bins[index] = bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Приближенный q-квантиль (0 <= q <= 1); None для пустого скетча"""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Середина корзины в относительной мере: 2 * gamma^i / (gamma + 1)
+                gamma = math.exp(self._log_gamma)
+                return 2 * math.exp(index * self._log_gamma) / (gamma + 1)
+        return None  # недостижимо: rank < total
+
+    def to_bytes(self) -> bytes:
+        """Компактная сериализация для хранения в БД"""
+        indexes = sorted(self.bins)
+        n = len(indexes)
+        return struct.pack(
+            f"<BdQI{n}i{n}Q", _FORMAT, self._log_gamma, self.zero_count, n,
+            *indexes, *(self.bins[i] for i in indexes),
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "QuantileSketch":
+        """Восстановление скетча из to_bytes()"""
+        version, log_gamma, zero_count, n = struct.unpack_from("<BdQI", data)
+        if version != _FORMAT:
+            raise ValueError(f"Неизвестный формат скетча: {version}")
+        values = struct.unpack_from(f"<{n}i{n}Q", data, struct.calcsize("<BdQI"))
+        sketch = cls.__new__(cls)
+        sketch._log_gamma = log_gamma
+        sketch.zero_count = zero_count
+        sketch.bins = dict(zip(values[:n], values[n:]))
+        return sketch
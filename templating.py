@@ -0,0 +1,52 @@
+"""
+Общее окружение шаблонов Jinja2 для страниц и PDF.
+
+Один экземпляр на процесс: каждый шаблон разбирается и компилируется один раз,
+а при включенном кэше байткода (enable_bytecode_cache, вызывается при старте
+приложения) скомпилированный код берется с диска и при следующих запусках.
+Кэш проверяет контрольную сумму исходника, поэтому измененный шаблон перекомпилируется.
+"""
+import os
+import time
+from typing import Iterator
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+
+from config import TEMPLATES_DIR, TEMPLATE_CACHE_DIR, TEMPLATE_STREAM_CHUNK_SIZE
+from services.metrics import STAGE_DURATION
+
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
+
+
+def enable_bytecode_cache(directory: str = TEMPLATE_CACHE_DIR):
+    """Подключение дискового кэша байткода шаблонов"""
+    os.makedirs(directory, exist_ok=True)
+    templates.env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def stream_template(name: str, context: dict, operation: str,
+                    chunk_size: int = TEMPLATE_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Потоковый рендеринг шаблона (Template.generate) для StreamingResponse.
+    Мелкие фрагменты Jinja собираются в блоки по chunk_size байт: синхронный
+    итератор StreamingResponse читается через пул потоков, и переход в поток
+    на каждый фрагмент стоил бы дороже самого рендеринга.
+    Время рендеринга (без ожидания отправки) учитывается как этап render операции operation.
+    """
+    template = templates.get_template(name)
+    parts, size, elapsed = [], 0, 0.0
+    start = time.perf_counter()
+    for fragment in template.generate(context):
+        data = fragment.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            elapsed += time.perf_counter() - start
+            yield b"".join(parts)
+            parts, size = [], 0
+            start = time.perf_counter()
+    elapsed += time.perf_counter() - start
+    STAGE_DURATION.observe(elapsed, operation=operation, stage="render")
+    if parts:
+        yield b"".join(parts)
@@ -7,15 +7,18 @@ import sys
 import time
 import tempfile
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
 # Добавляем корневую директорию проекта в путь
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from database import Base, get_db
+from database import Base, DatabaseWriter, configure_sqlite, get_read_db, get_reader_sessions, get_writer
 from models import Expense
 from main import app
+from services.report_cache import report_cache
 
 
 @pytest.fixture(scope="function")
@@ -31,6 +34,7 @@ def test_db():
         connect_args={"check_same_thread": False},
         poolclass=None  # Отключаем пулинг для тестов
     )
+    configure_sqlite(engine)
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     # Создаем таблицы
@@ -54,22 +58,41 @@ def test_db():
         except PermissionError:
             time.sleep(0.1)
 
+    # Служебные файлы режима WAL
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.unlink(db_path + suffix)
+        except OSError:
+            pass
+
 
 @pytest.fixture(scope="function")
 def client(test_db):
     """Создает тестовый клиент FastAPI с тестовой БД"""
-    def override_get_db():
-        try:
-            yield test_db
-        finally:
-            pass
+    # Сессии только для чтения к тому же файлу БД; без пула, так как
+    # соединения aiosqlite привязаны к event loop конкретного клиента
+    reader_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{test_db.bind.url.database}",
+        poolclass=NullPool,
+    )
+    configure_sqlite(reader_engine, read_only=True)
+    TestingReaderSessionLocal = async_sessionmaker(reader_engine, autoflush=False, expire_on_commit=False)
+    writer = DatabaseWriter(test_db.bind)
+
+    async def override_get_read_db():
+        async with TestingReaderSessionLocal() as db:
+            yield db
     
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
+    app.dependency_overrides[get_reader_sessions] = lambda: TestingReaderSessionLocal
+    app.dependency_overrides[get_writer] = lambda: writer
+    report_cache.clear()  # версии данных разных тестовых БД совпадают
     
     with TestClient(app) as test_client:
         yield test_client
     
     app.dependency_overrides.clear()
+    writer.close()
 
 
 @pytest.fixture
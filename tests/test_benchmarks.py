@@ -0,0 +1,55 @@
+"""
+Тесты для набора бенчмарков: генератор данных, сравнение с базой, прогон в малом масштабе
+"""
+import pytest
+
+from benchmarks.suite import METRICS, compare, run_suite
+from benchmarks.synthetic import generate_expenses
+
+
+def result(**values):
+    """Результат прогона с заданными значениями метрик"""
+    return {
+        "meta": {"rows": 1000},
+        "metrics": {
+            name: {"value": value, "unit": METRICS[name][0], "better": METRICS[name][1]}
+            for name, value in values.items()
+        },
+    }
+
+
+def test_generator_is_deterministic():
+    """Одинаковый seed - одинаковые данные; разброс категорий и дат задается параметрами"""
+    first = list(generate_expenses(500, categories=3, days=10, seed=7))
+    assert first == list(generate_expenses(500, categories=3, days=10, seed=7))
+    assert first != list(generate_expenses(500, categories=3, days=10, seed=8))
+
+    assert len({r["category"] for r in first}) == 3
+    assert len({r["iso_date"] for r in first}) <= 10
+    assert len({r["comment"] for r in first}) == 500
+
+
+def test_compare_flags_regressions():
+    """Ухудшение больше порога отмечается с учетом направления метрики"""
+    baseline = result(upload_rows_per_sec=1000.0, report_cold_ms=10.0, report_warm_ms=2.0)
+    current = result(upload_rows_per_sec=800.0, report_cold_ms=10.5, peak_rss_mb=50.0)
+
+    rows = {row["name"]: row for row in compare(baseline, current, threshold=0.1)}
+    assert set(rows) == {"upload_rows_per_sec", "report_cold_ms"}
+    assert rows["upload_rows_per_sec"]["change"] == pytest.approx(0.2)
+    assert rows["upload_rows_per_sec"]["regressed"]
+    assert rows["report_cold_ms"]["change"] == pytest.approx(0.05)
+    assert not rows["report_cold_ms"]["regressed"]
+
+
+@pytest.mark.slow
+def test_run_suite_small():
+    """Полный прогон на малом объеме дает все метрики"""
+    outcome = run_suite(rows=2000, categories=4, days=90, repeat=1, pdf_backend="fpdf")
+
+    assert outcome["meta"]["rows"] == 2000
+    expected = set(METRICS)
+    if outcome["metrics"].get("peak_rss_mb") is None:
+        expected.discard("peak_rss_mb")
+    assert set(outcome["metrics"]) == expected
+    assert all(metric["value"] > 0 for metric in outcome["metrics"].values())
@@ -0,0 +1,184 @@
+"""
+Тесты для пакетной вставки расходов
+"""
+import pytest
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from models import Expense
+from services.bulk import BulkInserter
+
+
+def make_record(i):
+    """Тестовая запись о расходе"""
+    return {
+        "date": "2024-01-15", "category": "Еда", "amount": float(i + 1),
+        "comment": None, "iso_date": date(2024, 1, 15),
+    }
+
+
+def count_in_other_session(test_db):
+    """Число строк, видимое из отдельной сессии (то есть закоммиченных)"""
+    other = sessionmaker(bind=test_db.bind)()
+    try:
+        return other.query(func.count(Expense.id)).scalar()
+    finally:
+        other.close()
+
+
+def test_bulk_insert_all_records(test_db):
+    """Все записи вставляются, включая неполный последний пакет"""
+    inserter = BulkInserter(test_db, batch_size=3)
+    for i in range(7):
+        inserter.add(make_record(i))
+
+    assert inserter.finish() == 7
+    assert test_db.query(func.count(Expense.id)).scalar() == 7
+    assert test_db.query(func.sum(Expense.amount)).scalar() == 28.0
+
+
+def test_bulk_insert_commits_per_batch(test_db):
+    """В неатомарном режиме каждый полный пакет сразу коммитится"""
+    inserter = BulkInserter(test_db, batch_size=2, atomic=False)
+    for i in range(5):
+        inserter.add(make_record(i))
+
+    assert count_in_other_session(test_db) == 4
+
+
+def test_bulk_insert_atomic_rollback(test_db):
+    """В атомарном режиме до finish() ничего не коммитится"""
+    inserter = BulkInserter(test_db, batch_size=2, atomic=True)
+    for i in range(5):
+        inserter.add(make_record(i))
+
+    assert count_in_other_session(test_db) == 0
+    test_db.rollback()
+    assert test_db.query(func.count(Expense.id)).scalar() == 0
+
+
+def test_bulk_insert_invalid_batch_size(test_db):
+    """Размер пакета должен быть положительным"""
+    with pytest.raises(ValueError):
+        BulkInserter(test_db, batch_size=0)
+
+
+@pytest.fixture
+def writer(test_db):
+    """Писатель БД на тестовой базе"""
+    from database import DatabaseWriter
+
+    writer = DatabaseWriter(test_db.bind)
+    yield writer
+    writer.close()
+
+
+def run_queued(writer, records, atomic, fail_after=None):
+    """Загрузка записей через очередь писателя; fail_after имитирует сбой разбора"""
+    import asyncio
+    from services.bulk import QueuedBulkInserter
+
+    async def run():
+        inserter = QueuedBulkInserter(writer, batch_size=2, atomic=atomic)
+        try:
+            for i, record in enumerate(records):
+                if i == fail_after:
+                    raise RuntimeError("сбой разбора")
+                await inserter.add(record)
+            return await inserter.finish()
+        except BaseException:
+            await inserter.abort()
+            raise
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_queued_bulk_insert(test_db, writer, atomic):
+    """Вставка через писателя в обоих режимах, включая сводную таблицу"""
+    from models import ExpenseRollup
+
+    assert run_queued(writer, [make_record(i) for i in range(5)], atomic) == 5
+    assert count_in_other_session(test_db) == 5
+    rollup = test_db.query(ExpenseRollup).one()
+    assert (rollup.row_count, rollup.total, rollup.min_amount, rollup.max_amount) == (5, 15.0, 1.0, 5.0)
+
+
+def test_queued_bulk_insert_atomic_abort(test_db, writer):
+    """Прерванная атомарная загрузка не оставляет строк"""
+    with pytest.raises(RuntimeError):
+        run_queued(writer, [make_record(i) for i in range(5)], atomic=True, fail_after=3)
+
+    assert count_in_other_session(test_db) == 0
+    temp_tables = writer.run_sync(
+        lambda conn: conn.exec_driver_sql("SELECT name FROM sqlite_temp_master").all()
+    )
+    assert temp_tables == []
+
+
+def test_queued_bulk_insert_non_atomic_keeps_batches(test_db, writer):
+    """В неатомарном режиме записанные до сбоя пакеты сохраняются"""
+    with pytest.raises(RuntimeError):
+        run_queued(writer, [make_record(i) for i in range(5)], atomic=False, fail_after=3)
+
+    assert count_in_other_session(test_db) == 2
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_queued_bulk_insert_skips_duplicates(test_db, writer, atomic):
+    """Повторы (в том же пакете и уже загруженные) пропускаются и не попадают в сводную таблицу"""
+    from models import ExpenseRollup
+
+    run_queued(writer, [make_record(0), make_record(1)], atomic)
+    records = [make_record(1), make_record(2), make_record(2), make_record(3)]
+
+    assert run_queued(writer, records, atomic) == 2
+    assert count_in_other_session(test_db) == 4
+    rollup = test_db.query(ExpenseRollup).one()
+    assert (rollup.row_count, rollup.total) == (4, 10.0)
+
+
+def test_bulk_insert_counts_duplicates(test_db):
+    """Синхронная вставка: число пропущенных повторов"""
+    inserter = BulkInserter(test_db, batch_size=2)
+    for i in (0, 1, 0, 2, 1):
+        inserter.add(make_record(i))
+
+    assert inserter.finish() == 3
+    assert inserter.duplicates == 2
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_rollup_ignores_rows_committed_by_other_connection(test_db, writer, atomic):
+    """
+    Другой процесс коммитит строки перед INSERT писателя (до его блокировки записи):
+    сводная таблица учитывает каждую строку один раз
+    """
+    from sqlalchemy import create_engine, event
+    from database import configure_sqlite
+    from models import ExpenseRollup
+    from services.bulk import write_batch
+
+    other = create_engine(test_db.bind.url, connect_args={"check_same_thread": False})
+    configure_sqlite(other)
+    interleaved = False
+
+    def commit_from_other(conn, cursor, statement, parameters, context, executemany):
+        nonlocal interleaved
+        if not interleaved and statement.startswith("INSERT INTO expenses"):
+            interleaved = True
+            with other.begin() as other_conn:
+                write_batch(other_conn, [make_record(i) for i in range(10, 13)])
+
+    event.listen(test_db.bind, "before_cursor_execute", commit_from_other)
+    try:
+        assert run_queued(writer, [make_record(0), make_record(1)], atomic) == 2
+    finally:
+        event.remove(test_db.bind, "before_cursor_execute", commit_from_other)
+        other.dispose()
+
+    assert interleaved
+    rollup = test_db.query(ExpenseRollup).one()
+    assert count_in_other_session(test_db) == 5
+    assert (rollup.row_count, rollup.total) == (5, 3.0 + 11.0 + 12.0 + 13.0)
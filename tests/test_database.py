@@ -122,3 +122,202 @@ def test_database_order_by(test_db, sample_expenses):
     assert by_amount[0].amount == 1500.0
     assert by_amount[-1].amount == 200.0
 
+
+
+def test_migration_backfills_iso_date(test_db):
+    """Миграция добавляет iso_date в старую схему и заполняет существующие строки"""
+    from migrations import run_migrations
+
+    engine = test_db.bind
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE expenses"))
+        conn.execute(text(
+            "CREATE TABLE expenses (id INTEGER PRIMARY KEY, date VARCHAR NOT NULL, "
+            "category VARCHAR NOT NULL, amount FLOAT NOT NULL, comment VARCHAR)"
+        ))
+        conn.execute(text(
+            "INSERT INTO expenses (date, category, amount) VALUES "
+            "('2024-01-15', 'Еда', 100), ('20.02.2024', 'Еда', 200), ('bad', 'Еда', 300)"
+        ))
+
+    run_migrations(engine)
+    run_migrations(engine)  # повторный запуск ничего не ломает
+
+    rows = test_db.execute(text("SELECT date, iso_date FROM expenses ORDER BY id")).all()
+    assert [r.iso_date for r in rows] == ["2024-01-15", "2024-02-20", None]
+
+    indexes = test_db.execute(text("PRAGMA index_list('expenses')")).all()
+    assert "ix_expenses_iso_date_category" in {i.name for i in indexes}
+
+
+def test_migration_backfills_fingerprint(test_db):
+    """Миграция заполняет отпечатки; у повторов в старых данных остается NULL"""
+    from migrations import run_migrations
+
+    engine = test_db.bind
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE expenses"))
+        conn.execute(text(
+            "CREATE TABLE expenses (id INTEGER PRIMARY KEY, date VARCHAR NOT NULL, "
+            "category VARCHAR NOT NULL, amount FLOAT NOT NULL, comment VARCHAR)"
+        ))
+        conn.execute(text(
+            "INSERT INTO expenses (date, category, amount) VALUES "
+            "('2024-01-15', 'Еда', 100), ('15.01.2024', 'Еда', 100), ('2024-01-16', 'Еда', 100)"
+        ))
+
+    run_migrations(engine)
+    run_migrations(engine)
+
+    rows = test_db.execute(text("SELECT fingerprint FROM expenses ORDER BY id")).all()
+    assert rows[0].fingerprint is not None and rows[2].fingerprint is not None
+    assert rows[1].fingerprint is None
+
+    indexes = test_db.execute(text("PRAGMA index_list('expenses')")).all()
+    assert "ux_expenses_fingerprint" in {i.name for i in indexes}
+
+
+def test_migration_adds_autoincrement(test_db):
+    """После миграции id удаленных строк не переиспользуются"""
+    from migrations import run_migrations
+
+    engine = test_db.bind
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE expenses"))
+        conn.execute(text(
+            "CREATE TABLE expenses (id INTEGER PRIMARY KEY, date VARCHAR NOT NULL, "
+            "category VARCHAR NOT NULL, amount FLOAT NOT NULL, comment VARCHAR)"
+        ))
+        conn.execute(text(
+            "INSERT INTO expenses (date, category, amount) VALUES "
+            "('2024-01-15', 'Еда', 100), ('2024-01-16', 'Еда', 200), ('2024-01-17', 'Еда', 300)"
+        ))
+
+    run_migrations(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM expenses WHERE id = 3"))
+        conn.execute(text("INSERT INTO expenses (date, category, amount) VALUES ('2024-01-18', 'Еда', 400)"))
+
+    rows = test_db.execute(text("SELECT id, iso_date FROM expenses ORDER BY id")).all()
+    assert [r.id for r in rows] == [1, 2, 4]
+    assert rows[0].iso_date == "2024-01-15"
+    indexes = test_db.execute(text("PRAGMA index_list('expenses')")).all()
+    assert "ux_expenses_fingerprint" in {i.name for i in indexes}
+
+
+def test_migration_adds_rollup_sketches(test_db, sample_expenses):
+    """Миграция добавляет колонку скетчей в старую сводную таблицу и заполняет ее"""
+    from migrations import run_migrations
+    from services.sketch import QuantileSketch
+
+    engine = test_db.bind
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE expense_rollup"))
+        conn.execute(text(
+            "CREATE TABLE expense_rollup (month VARCHAR NOT NULL, category VARCHAR NOT NULL, "
+            "row_count INTEGER NOT NULL, total FLOAT NOT NULL, min_amount FLOAT, max_amount FLOAT, "
+            "PRIMARY KEY (month, category))"
+        ))
+        conn.execute(text(
+            "INSERT INTO expense_rollup VALUES ('2024-01', 'Еда', 1, 500, 500, 500)"
+        ))
+
+    run_migrations(engine)
+    run_migrations(engine)
+
+    rows = test_db.execute(text("SELECT row_count, sketch FROM expense_rollup")).all()
+    assert sum(r.row_count for r in rows) == len(sample_expenses)
+    assert sum(QuantileSketch.from_bytes(r.sketch).count for r in rows) == len(sample_expenses)
+
+
+def test_data_version_bump(test_db):
+    """Версия данных начинается с 0 и растет при каждом изменении"""
+    from services.data_version import get_data_version, bump_data_version
+
+    assert get_data_version(test_db) == 0
+    bump_data_version(test_db)
+    bump_data_version(test_db)
+    test_db.commit()
+    assert get_data_version(test_db) == 2
+
+
+def test_sqlite_pragmas(test_db):
+    """Соединения работают в WAL с заданными настройками"""
+    assert test_db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert test_db.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert test_db.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_reader_connection_is_read_only(test_db):
+    """Соединения пула чтения не могут изменять данные"""
+    import asyncio
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from database import configure_sqlite
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{test_db.bind.url.database}", poolclass=NullPool)
+        configure_sqlite(engine, read_only=True)
+        try:
+            async with engine.connect() as conn:
+                count = (await conn.execute(text("SELECT count(*) FROM expenses"))).scalar()
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("DELETE FROM expenses"))
+                return count
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_reader_not_blocked_by_open_write_transaction(test_db):
+    """В WAL чтение идет, пока писатель держит открытую транзакцию"""
+    import threading
+    from database import DatabaseWriter
+
+    writer = DatabaseWriter(test_db.bind)
+    in_transaction, release = threading.Event(), threading.Event()
+
+    def long_write(conn):
+        conn.execute(text("INSERT INTO expenses (date, category, amount) VALUES ('2024-01-01', 'Еда', 1)"))
+        in_transaction.set()
+        release.wait(5)
+
+    future = writer._get_executor().submit(writer._run, long_write, ())
+    try:
+        assert in_transaction.wait(5)
+        # Незакоммиченная строка не видна, но чтение не ждет блокировку
+        assert test_db.execute(text("SELECT count(*) FROM expenses")).scalar() == 0
+    finally:
+        release.set()
+        future.result()
+        writer.close()
+
+    assert test_db.execute(text("SELECT count(*) FROM expenses")).scalar() == 1
+
+
+def test_writer_serializes_jobs(test_db):
+    """Все задачи писателя выполняются в одном потоке по очереди"""
+    import asyncio
+    import threading
+    from database import DatabaseWriter
+
+    writer = DatabaseWriter(test_db.bind)
+    threads = []
+
+    def job(conn, i):
+        threads.append(threading.current_thread().name)
+        conn.execute(text("INSERT INTO expenses (date, category, amount) VALUES ('2024-01-01', 'Еда', :a)"), {"a": i + 1})
+
+    async def run():
+        await asyncio.gather(*(writer.run(job, i) for i in range(20)))
+
+    try:
+        asyncio.run(run())
+    finally:
+        writer.close()
+
+    assert len(set(threads)) == 1
+    assert test_db.execute(text("SELECT count(*) FROM expenses")).scalar() == 20
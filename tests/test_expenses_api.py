@@ -0,0 +1,52 @@
+"""
+Тесты для API просмотра расходов
+"""
+from fastapi import status
+
+
+def collect_pages(client, **params):
+    """Обход всех страниц по курсору"""
+    items, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        data = client.get("/api/expenses", params=query).json()
+        items.extend(data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_list_expenses_pages(client, sample_expenses):
+    """Страницы по 2 строки покрывают все расходы по порядку даты без повторов"""
+    items = collect_pages(client, limit=2)
+
+    assert [i["iso_date"] for i in items] == [
+        "2024-01-15", "2024-01-20", "2024-02-10", "2024-02-15", "2024-03-05",
+    ]
+    assert items[0] == {
+        "id": sample_expenses[0].id, "date": "2024-01-15", "iso_date": "2024-01-15",
+        "category": "Еда", "amount": 500.0, "comment": "Продукты",
+    }
+
+
+def test_list_expenses_filters_desc(client, sample_expenses):
+    """Фильтры и обратный порядок"""
+    items = collect_pages(client, limit=1, order="desc", category="Еда", min_amount=550, to="2024-03-01")
+
+    assert [i["amount"] for i in items] == [800.0]
+
+
+def test_list_expenses_same_date_keyset(client, test_db):
+    """Строки с одинаковой датой не теряются на границе страниц"""
+    from models import Expense
+    for amount in (1.0, 2.0, 3.0):
+        test_db.add(Expense(date="2024-01-15", category="Еда", amount=amount))
+    test_db.commit()
+
+    assert [i["amount"] for i in collect_pages(client, limit=1)] == [1.0, 2.0, 3.0]
+
+
+def test_list_expenses_bad_params(client):
+    """Испорченный курсор и недопустимый размер страницы"""
+    assert client.get("/api/expenses?cursor=xyz").status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/api/expenses?limit=0").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
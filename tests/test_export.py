@@ -0,0 +1,64 @@
+"""
+Тесты для потоковой выгрузки расходов
+"""
+import gzip
+import json
+from datetime import date
+from io import BytesIO
+
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+
+from models import Expense
+from services.export import export_query
+
+
+def test_export_csv_roundtrip(client, test_db, sample_expenses):
+    """CSV выгрузки принимается загрузкой как есть (все строки - повторы)"""
+    response = client.get("/export")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "2024-01-15;Еда;500.0;Продукты"
+    assert lines[4] == "2024-03-05;Еда;600.0"
+
+    files = {"file": ("export.csv", BytesIO(response.content), "text/csv")}
+    response = client.post("/upload", files=files)
+    assert "Пропущено повторов уже загруженных строк: <strong>5</strong>" in response.text
+    assert test_db.query(Expense).count() == 5
+
+
+def test_export_ndjson_with_filters(client, sample_expenses):
+    """NDJSON с фильтром по датам (включительно) и категории"""
+    response = client.get("/export", params={
+        "format": "ndjson", "from": "2024-01-20", "to": "2024-03-05", "category": "Еда",
+    })
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(r["iso_date"], r["amount"]) for r in rows] == [("2024-02-10", 800.0), ("2024-03-05", 600.0)]
+    assert rows[0]["comment"] == "Ресторан"
+
+
+def test_export_gzip(client, sample_expenses):
+    """gzip=true - сжатый файл"""
+    response = client.get("/export?gzip=true")
+
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="expenses.csv.gz"' in response.headers["content-disposition"]
+    assert len(gzip.decompress(response.content).decode("utf-8").splitlines()) == 5
+
+
+def test_export_empty_and_invalid_format(client):
+    """Пустая таблица и неизвестный формат"""
+    assert client.get("/export").text == ""
+    assert client.get("/export?format=xml").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_export_query_has_no_full_sort(test_db):
+    """Выгрузка идет по индексу/первичному ключу без сортировки всей выборки"""
+    for stmt in (export_query(), export_query(date(2024, 1, 1), date(2024, 2, 1), "Еда")):
+        sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in test_db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan
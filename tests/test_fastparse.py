@@ -0,0 +1,102 @@
+"""
+Тесты для колоночного разборщика: решения совпадают с parse_line
+"""
+import random
+from datetime import date
+
+import pytest
+
+from services.fastparse import parse_date_cached, parse_lines
+from services.ingest import parse_line
+
+LINES = [
+    "2024-01-15;Еда;500.0;Продукты",
+    "15.01.2024;Транспорт;200",
+    "  2024-02-29;Еда;1e3;  ",
+    "",
+    "   ",
+    "2024-01-15;Еда",
+    "2023-02-29;Еда;100",
+    "2024-13-01;Еда;100",
+    "32.01.2024;Еда;100",
+    "2024-1-5;Еда;100",
+    "5.1.2024;Еда;100",
+    "2024/01/15;Еда;100",
+    "2024-01-15;Еда;0",
+    "2024-01-15;Еда;-5",
+    "2024-01-15;Еда;abc",
+    "2024-01-15;Еда;",
+    "2024-01-15;Еда;nan",
+    "2024-01-15;Еда;inf",
+    "2024-01-15;Еда; 1_000 ",
+    "0000-01-01;Еда;100",
+    "2024-01-15;;100;;лишнее",
+    "٢٠٢٤-01-15;Еда;100",
+    "неверная;Еда;100",
+]
+
+
+def reference(lines, first_line_no=1):
+    """Результат эталонного построчного разбора"""
+    results = []
+    for line_no, line in enumerate(lines, first_line_no):
+        record, error = parse_line(line)
+        if record is not None or error is not None:
+            results.append((line_no, record, error))
+    return results
+
+
+def same(actual, expected):
+    """Сравнение с учетом nan (nan != nan)"""
+    assert len(actual) == len(expected)
+    for (a_no, a_rec, a_err), (e_no, e_rec, e_err) in zip(actual, expected):
+        assert (a_no, a_err) == (e_no, e_err)
+        if e_rec is None:
+            assert a_rec is None
+            continue
+        assert a_rec.keys() == e_rec.keys()
+        for key in e_rec:
+            if key == "amount" and e_rec[key] != e_rec[key]:
+                assert a_rec[key] != a_rec[key]
+            else:
+                assert a_rec[key] == e_rec[key]
+
+
+def test_parse_lines_matches_parse_line():
+    """Прием, отклонение и тексты ошибок совпадают с parse_line"""
+    same(list(parse_lines(LINES).results()), reference(LINES))
+
+
+def test_parse_lines_line_numbers():
+    """Номера строк отсчитываются от first_line_no, пустые строки пропускаются"""
+    batch = parse_lines(["", "2024-01-15;Еда;1", "x"], first_line_no=10)
+
+    assert batch.line_nos == [11, 12]
+    assert batch.valid == [True, False]
+    assert len(batch) == 2
+    assert list(batch.records()) == [{
+        "date": "2024-01-15", "category": "Еда", "amount": 1.0,
+        "comment": None, "iso_date": date(2024, 1, 15),
+    }]
+
+
+def test_parse_date_cached():
+    """Кэш возвращает одинаковый результат и для неверных дат"""
+    assert parse_date_cached("15.01.2024") == date(2024, 1, 15)
+    assert parse_date_cached("15.01.2024") == date(2024, 1, 15)
+    assert parse_date_cached("2024-02-30") is None
+    assert parse_date_cached("2024-02-30") is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parse_lines_fuzz(seed):
+    """Случайные строки из фрагментов разбираются так же, как parse_line"""
+    rng = random.Random(seed)
+    dates = ["2024-01-15", "15.01.2024", "2024-02-30", "2024-1-5", "1.2.2024", "x", "", " 2024-01-15"]
+    amounts = ["1", "0", "-1", "2.5", "1e2", "nan", "abc", "", " 3 "]
+    lines = []
+    for _ in range(500):
+        fields = [rng.choice(dates), rng.choice(["Еда", ""]), rng.choice(amounts), "комментарий"]
+        lines.append(";".join(fields[:rng.randint(0, 4)]))
+
+    same(list(parse_lines(lines).results()), reference(lines))
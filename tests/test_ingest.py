@@ -0,0 +1,130 @@
+"""
+Тесты для потокового разбора загружаемых файлов
+"""
+import asyncio
+from datetime import date
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+
+from services.ingest import (
+    iter_chunks, iter_lines, iter_records, iter_records_parallel, parse_chunk, parse_line, unpack_record,
+)
+
+
+def collect_lines(data: bytes, chunk_size: int):
+    """Собирает все строки из iter_lines в список"""
+    async def run():
+        upload = UploadFile(file=BytesIO(data))
+        return [line async for line in iter_lines(upload, chunk_size)]
+    return asyncio.run(run())
+
+
+def collect_records(data: bytes, chunk_size: int):
+    """Собирает все пары (запись, ошибка) из iter_records в список"""
+    async def run():
+        upload = UploadFile(file=BytesIO(data))
+        return [item async for item in iter_records(upload, chunk_size)]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64 * 1024])
+def test_iter_lines_matches_splitlines(chunk_size):
+    """Разбиение на строки не зависит от размера блока"""
+    text = "2024-01-15;Еда;500.0;Продукты\r\n\r\n20.01.2024;Транспорт;200\rпоследняя;строка\n€"
+    data = text.encode("utf-8")
+
+    assert collect_lines(data, chunk_size) == text.splitlines()
+
+
+def test_iter_lines_empty_file():
+    """Пустой файл не дает строк"""
+    assert collect_lines(b"", 4) == []
+
+
+def test_iter_lines_invalid_utf8():
+    """Некорректный UTF-8 приводит к ошибке декодирования, как и раньше"""
+    with pytest.raises(UnicodeDecodeError):
+        collect_lines("Еда".encode("utf-8")[:-1], 2)
+
+
+def test_parse_line_valid():
+    """Разбор корректной строки"""
+    record, error = parse_line(" 2024-01-15;Еда;500.5;Продукты ")
+    assert error is None
+    assert record == {
+        "date": "2024-01-15", "category": "Еда", "amount": 500.5,
+        "comment": "Продукты", "iso_date": date(2024, 1, 15),
+    }
+
+
+@pytest.mark.parametrize("line, message", [
+    ("2024-01-15;Еда", "Недостаточно полей"),
+    ("2024-13-45;Еда;100", "Неверная дата"),
+    ("2024-01-15;Еда;abc", "Неверная сумма"),
+    ("2024-01-15;Еда;0", "Неверная сумма"),
+])
+def test_parse_line_errors(line, message):
+    """Сообщения об ошибках совпадают с прежними"""
+    record, error = parse_line(line)
+    assert record is None
+    assert error == f"{message}: {line}"
+
+
+def test_iter_records_skips_empty_lines():
+    """Пустые строки пропускаются, ошибки отдаются по порядку"""
+    data = "2024-01-15;Еда;500\n\n   \nbad;Еда;1\n".encode("utf-8")
+    results = collect_records(data, 3)
+
+    assert len(results) == 2
+    assert results[0][0] == 1
+    assert results[0][1]["amount"] == 500.0
+    assert results[1] == (4, None, "Неверная дата: bad;Еда;1")
+
+
+SAMPLE = (
+    "2024-01-15;Еда;500.0;Продукты\r\n\n"
+    "15.01.2024;Транспорт;200\r"
+    "invalid-date;Еда;1\n"
+    "2024-02-10;Развлечения;-100;Кино\n"
+    "2024-03-05;Еда;300;Кафе €\n"
+    "2024-03-10;Еда"
+)
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 16, 1024])
+def test_iter_chunks_cut_at_newlines(chunk_bytes):
+    """Куски заканчиваются на \\n и в сумме дают исходный файл"""
+    data = SAMPLE.encode("utf-8")
+
+    async def run():
+        return [chunk async for chunk in iter_chunks(UploadFile(file=BytesIO(data)), chunk_bytes)]
+
+    chunks = asyncio.run(run())
+    assert b"".join(chunks) == data
+    assert all(chunk.endswith(b"\n") for chunk in chunks[:-1])
+
+
+def test_parse_chunk_counts_lines():
+    """Разбор куска возвращает номера строк внутри куска и их число"""
+    results, line_count = parse_chunk("2024-01-15;Еда;1\n\nbad;Еда;1\n".encode("utf-8"))
+    assert line_count == 3
+    assert [(line_no, error) for line_no, _, error in results] == [(1, None), (3, "Неверная дата: bad;Еда;1")]
+    assert unpack_record(results[0][1]) == parse_line("2024-01-15;Еда;1")[0]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 16, 1024])
+def test_parallel_matches_sequential(chunk_bytes):
+    """Параллельный разбор дает те же записи, ошибки и номера строк исходного файла"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    data = SAMPLE.encode("utf-8")
+
+    async def run():
+        # Пул потоков вместо процессов: проверяется порядок и нумерация
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            upload = UploadFile(file=BytesIO(data))
+            return [item async for item in iter_records_parallel(upload, chunk_bytes, executor)]
+
+    assert asyncio.run(run()) == collect_records(data, 5)
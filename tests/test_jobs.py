@@ -0,0 +1,100 @@
+"""
+Тесты для фоновых задач загрузки
+"""
+import asyncio
+
+from fastapi import UploadFile
+
+from services.jobs import IngestJob, JobManager, ingest
+
+
+class FakeInserter:
+    """Вставка в список вместо БД"""
+
+    def __init__(self, fail_on=None):
+        self.rows = []
+        self.inserted = 0
+        self.duplicates = 0
+        self.aborted = False
+        self.fail_on = fail_on
+
+    async def add(self, record):
+        if record == self.fail_on:
+            raise RuntimeError("ошибка вставки")
+        self.rows.append(record)
+        self.inserted += 1
+
+    async def finish(self):
+        return self.inserted
+
+    async def abort(self):
+        self.aborted = True
+
+
+async def results(*items):
+    for n, item in enumerate(items, 1):
+        yield (n, item, None) if isinstance(item, dict) else (n, None, item)
+
+
+def test_ingest_counts_progress():
+    """Счетчики задачи, номера строк в ошибках и ограничение числа хранимых ошибок"""
+    job = IngestJob(max_errors=1)
+    inserter = FakeInserter()
+
+    inserted = asyncio.run(ingest(results({"a": 1}, "ошибка 1", "ошибка 2", {"a": 2}), inserter, job))
+
+    assert inserted == 2
+    assert (job.rows_processed, job.rows_inserted, job.error_count) == (4, 2, 2)
+    assert job.errors == ["Строка 2: ошибка 1"]
+
+
+def test_ingest_aborts_on_failure():
+    """Исключение при вставке откатывает загрузку"""
+    inserter = FakeInserter(fail_on={"a": 2})
+
+    try:
+        asyncio.run(ingest(results({"a": 1}, {"a": 2}), inserter, IngestJob()))
+    except RuntimeError:
+        pass
+
+    assert inserter.aborted
+
+
+def test_job_failure_is_reported(tmp_path):
+    """Ошибка задачи попадает в статус, файл очереди удаляется"""
+    class BrokenWriter:
+        async def run(self, fn, *args):
+            raise RuntimeError("БД недоступна")
+
+    source = tmp_path / "src.txt"
+    source.write_bytes("2024-01-15;Еда;1\n".encode("utf-8"))
+    upload = UploadFile(file=open(source, "rb"), filename="src.txt")
+
+    manager = JobManager(spool_dir=str(tmp_path / "spool"), history_size=1)
+    job = asyncio.run(manager.submit(upload, BrokenWriter()))
+    manager.wait()
+    manager.shutdown()
+    upload.file.close()
+
+    assert job.status == "failed"
+    assert "БД недоступна" in job.failure
+    assert list((tmp_path / "spool").iterdir()) == []
+
+
+def test_manager_restarts_after_shutdown(tmp_path):
+    """После shutdown (остановка приложения) менеджер снова принимает задачи"""
+    class NoopWriter:
+        async def run(self, fn, *args):
+            return False if fn.__name__ == "is_known_file" else None
+
+    manager = JobManager(spool_dir=str(tmp_path), history_size=10)
+    manager.wait()  # до первой задачи поток не создан
+    manager.shutdown()
+
+    upload = UploadFile(file=open(__file__, "rb"), filename="x.txt")
+    job = asyncio.run(manager.submit(upload, NoopWriter()))
+    manager.wait()
+    manager.shutdown()
+    upload.file.close()
+
+    assert job.finished
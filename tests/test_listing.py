@@ -0,0 +1,38 @@
+"""
+Тесты для постраничного просмотра расходов (курсор и план запроса)
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+
+from services.listing import decode_cursor, encode_cursor, page_query
+
+
+def test_cursor_roundtrip():
+    """Курсор восстанавливает ключ последней строки"""
+    cursor = encode_cursor(date(2024, 1, 15), 42)
+    assert decode_cursor(cursor) == (date(2024, 1, 15), 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "мусор", "MjAyNC0wMS0xNQ", encode_cursor(date(2024, 1, 1), 1)[:-2]])
+def test_decode_cursor_invalid(cursor):
+    """Испорченный курсор - ValueError"""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"after": (date(2024, 1, 1), 5)},
+    {"category": "Еда", "after": (date(2024, 1, 1), 5)},
+    {"date_from": date(2024, 1, 1), "max_amount": 10.0, "descending": True},
+])
+def test_page_query_uses_index_without_sort(test_db, params):
+    """Страница читается по индексу без сортировки (стоимость не зависит от глубины)"""
+    sql = str(page_query(**params).compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = " ".join(row[-1] for row in test_db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    assert "USING INDEX" in plan
+    assert "TEMP B-TREE" not in plan
@@ -68,3 +68,39 @@ def test_routers_included():
     assert "/report" in routes
     assert "/report/pdf" in routes
 
+    assert "/export" in routes
+    assert "/api/expenses" in routes
+
+
+def test_templates_shared():
+    """Все страницы рендерятся через одно окружение шаблонов"""
+    import main
+    from routers import reports, upload
+    from templating import templates
+
+    assert main.templates is upload.templates is reports.templates is templates
+
+
+def test_lifespan_enables_bytecode_cache(client):
+    """При старте приложения подключается дисковый кэш байткода шаблонов"""
+    from jinja2 import FileSystemBytecodeCache
+    from templating import templates
+
+    assert isinstance(templates.env.bytecode_cache, FileSystemBytecodeCache)
+
+
+@pytest.mark.slow
+def test_import_is_lazy(tmp_path):
+    """Импорт main не создает БД и не загружает PDF-стек"""
+    import os
+    import subprocess
+    import sys
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    code = (
+        "import os, sys; sys.path.insert(0, %r); import main; "
+        "print(os.path.exists('expenses.db'), 'services.pdf' in sys.modules)" % root
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True,
+                            capture_output=True, text=True).stdout
+    assert output.split() == ["False", "False"]
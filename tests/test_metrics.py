@@ -0,0 +1,74 @@
+"""
+Тесты для метрик Prometheus и эндпоинта /metrics
+"""
+from io import BytesIO
+
+import pytest
+from fastapi import status
+
+from services.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_text_format():
+    """Корзины гистограммы накопительные, с суммой и числом наблюдений"""
+    registry = Registry()
+    histogram = registry.register(Histogram("op_seconds", "Время", ("stage",), buckets=(0.1, 1.0)))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+
+    text = registry.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{stage="parse",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+    assert 'op_seconds_sum{stage="parse"} 5.55' in text
+    assert 'op_seconds_count{stage="parse"} 3' in text
+
+
+def test_counter_labels():
+    """Значения меток экранируются; набор меток проверяется"""
+    registry = Registry()
+    counter = registry.register(Counter("rows_total", "Строки", ("result",)))
+    counter.inc(3, result='a"b')
+
+    assert 'rows_total{result="a\\"b"} 3' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(1, other="x")
+
+
+def test_metrics_endpoint(client):
+    """Запросы, этапы загрузки и отчета и строки загрузки видны на /metrics"""
+    from services.metrics import INGEST_ROWS, REQUESTS, STAGE_DURATION
+
+    rejected = INGEST_ROWS.value(result="rejected")
+    requests = REQUESTS.value(method="GET", route="/upload/jobs/{job_id}", status="404")
+    renders = STAGE_DURATION.snapshot(operation="report", stage="render")[1]
+
+    files = {"file": ("e.txt", BytesIO("2024-01-15;Еда;500\nплохая строка".encode("utf-8")), "text/plain")}
+    client.post("/upload", files=files)
+    client.get("/report")
+    client.get("/upload/jobs/missing")
+
+    assert INGEST_ROWS.value(result="rejected") == rejected + 1
+    assert REQUESTS.value(method="GET", route="/upload/jobs/{job_id}", status="404") == requests + 1
+    assert STAGE_DURATION.snapshot(operation="report", stage="render")[1] == renders + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for name in ("http_request_duration_seconds_bucket", "http_requests_in_progress",
+                 'stage="parse"', 'stage="rollup_query"', "ingest_rows_total"):
+        assert name in response.text
+
+
+def test_upload_job_reports_stages(client):
+    """Время этапов загрузки видно в статусе фоновой задачи"""
+    from services.jobs import job_manager
+
+    files = {"file": ("e.txt", BytesIO(b"2024-01-15;Food;500"), "text/plain")}
+    job_id = client.post("/upload/jobs", files=files).json()["id"]
+    job_manager.wait()
+
+    stages = client.get(f"/upload/jobs/{job_id}").json()["stages"]
+    assert {"hash", "parse", "insert", "commit", "remember"} <= set(stages)
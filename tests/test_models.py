@@ -2,7 +2,8 @@
 Тесты для моделей базы данных
 """
 import pytest
-from models import Expense
+from datetime import date
+from models import Expense, normalize_date, row_fingerprint
 
 
 def test_expense_creation(test_db):
@@ -103,3 +104,36 @@ def test_expense_query_by_amount_range(test_db):
     assert len(mid_range_expenses) == 1
     assert mid_range_expenses[0].amount == 500.0
 
+
+
+def test_expense_iso_date_from_both_formats(test_db):
+    """Каноническая дата заполняется для обоих форматов исходной даты"""
+    test_db.add(Expense(date="2024-01-15", category="Еда", amount=100.0))
+    test_db.add(Expense(date="15.01.2024", category="Еда", amount=200.0))
+    test_db.commit()
+
+    iso_dates = {e.iso_date for e in test_db.query(Expense).all()}
+    assert iso_dates == {date(2024, 1, 15)}
+
+
+def test_normalize_date_invalid():
+    """Нераспознанная дата вызывает ValueError"""
+    with pytest.raises(ValueError):
+        normalize_date("2024/01/15")
+
+
+def test_row_fingerprint():
+    """Отпечаток не зависит от формата даты и записи суммы, но различает строки"""
+    same = row_fingerprint(date(2024, 1, 15), "Еда", 500, None)
+    assert same == row_fingerprint(date(2024, 1, 15), "Еда", 500.0, "")
+    assert same != row_fingerprint(date(2024, 1, 15), "Еда", 500.0, "Продукты")
+    assert same != row_fingerprint(date(2024, 1, 16), "Еда", 500.0, None)
+
+
+def test_expense_fingerprint_filled_on_insert(test_db):
+    """Строки, добавленные через ORM, получают отпечаток"""
+    expense = Expense(date="15.01.2024", category="Еда", amount=500.0)
+    test_db.add(expense)
+    test_db.commit()
+
+    assert expense.fingerprint == row_fingerprint(date(2024, 1, 15), "Еда", 500.0, None)
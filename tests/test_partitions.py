@@ -0,0 +1,214 @@
+"""
+Тесты для архивных разделов по годам
+"""
+import asyncio
+import os
+import stat
+import threading
+from datetime import date, timedelta
+from io import BytesIO
+
+import pytest
+from fastapi import status
+
+from models import Expense
+from services.bulk import write_batch
+from services import partitions as partitions_module
+from services.partitions import Partition, archive_before, archive_year, partition_set
+from services import reports
+from services.reports import build_report, fetch_archived_rows
+from services.rollup import rebuild_rollup
+
+
+@pytest.fixture
+def partitions(tmp_path):
+    """Глобальный набор разделов во временном каталоге"""
+    saved = partition_set.directory
+    partition_set.directory = str(tmp_path / "partitions")
+    yield partition_set
+    partition_set.dispose()
+    partition_set.directory = saved
+
+
+def upload(client, text):
+    files = {"file": ("expenses.txt", BytesIO(text.encode("utf-8")), "text/plain")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == status.HTTP_200_OK
+    return response
+
+
+def three_years():
+    """Строки за 2022-2024 годы: каждые 9 дней, две категории, в порядке дат"""
+    lines, day = [], date(2022, 1, 3)
+    for i in range(120):
+        lines.append(f"{day.isoformat()};{'Еда' if i % 3 else 'Транспорт'};{100 + i * 7 % 53}.5;#{i}")
+        day += timedelta(days=9)
+    return "\n".join(lines)
+
+
+def collect_pages(client, **params):
+    items, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        data = client.get("/api/expenses", params=query).json()
+        items.extend(data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_plan_prunes_years(partitions):
+    """Читаются только годы, пересекающиеся с периодом; горячий раздел - с границы архива"""
+    assert partitions.plan(date(2020, 1, 1), None) == [Partition(None, date(2020, 1, 1), None)]
+
+    os.makedirs(partitions.directory)
+    for year in (2022, 2023):
+        open(partitions.path(year), "w").close()
+
+    assert partitions.years() == (2022, 2023)
+    assert partitions.boundary() == date(2024, 1, 1)
+    assert partitions.plan(date(2023, 3, 1), date(2024, 5, 1)) == [
+        Partition(2023, date(2023, 3, 1), date(2023, 12, 31)),
+        Partition(None, date(2023, 3, 1), date(2024, 5, 1), date(2024, 1, 1)),
+    ]
+    assert partitions.plan(None, date(2022, 6, 30)) == [Partition(2022, date(2022, 1, 1), date(2022, 6, 30))]
+
+
+def test_archived_rows_do_not_block_event_loop(partitions, monkeypatch):
+    """Пока читаются архивные разделы, event loop продолжает обрабатывать другие задачи"""
+    os.makedirs(partitions.directory)
+    open(partitions.path(2023), "w").close()
+    started, released = threading.Event(), threading.Event()
+
+    def slow_rows(db, date_from, date_to, category, since=None):
+        started.set()
+        # Снять ожидание может только корутина в event loop
+        return [(date_from, category, 1.0)] if released.wait(5) else []
+    monkeypatch.setattr(reports, "_expense_rows", slow_rows)
+
+    async def scenario():
+        task = asyncio.create_task(fetch_archived_rows(date(2023, 5, 5), date(2023, 5, 25), "Еда"))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        released.set()
+        return await task
+
+    assert asyncio.run(scenario()) == [(date(2023, 5, 5), "Еда", 1.0)]
+
+
+def test_archive_keeps_reads_unchanged(client, test_db, partitions):
+    """После переноса 2022-2023 годов отчеты, просмотр и выгрузка не меняются"""
+    upload(client, three_years())
+    periods = [(None, None), (date(2022, 3, 15), date(2024, 2, 10)), (date(2023, 5, 5), date(2023, 5, 25))]
+    reports = [build_report(test_db, *period) for period in periods]
+    pages = collect_pages(client, limit=7)
+    pages_desc = collect_pages(client, limit=7, order="desc", **{"from": "2022-06-01"})
+    export = client.get("/export").text
+    test_db.rollback()
+
+    moved = archive_before(test_db.bind, 2024)
+
+    assert moved == {2022: 41, 2023: 40}
+    assert test_db.query(Expense).filter(Expense.iso_date < date(2024, 1, 1)).count() == 0
+    assert partitions.years() == (2022, 2023)
+    assert stat.S_IMODE(os.stat(partitions.path(2022)).st_mode) == 0o444
+    assert [build_report(test_db, *period) for period in periods] == reports
+    assert collect_pages(client, limit=7) == pages
+    assert collect_pages(client, limit=7, order="desc", **{"from": "2022-06-01"}) == pages_desc
+    assert client.get("/export").text == export
+    # Повторная загрузка выгрузки: строки архивных годов - повторы, а не ошибки
+    response = upload(client, export + "\n")
+    assert "Пропущено повторов уже загруженных строк: <strong>120</strong>" in response.text
+    assert "Обнаружены ошибки" not in response.text
+
+    rebuild_rollup(test_db.connection())
+    assert build_report(test_db) == reports[0]
+
+
+def test_archived_period_rows_go_to_partitions(client, test_db, partitions):
+    """
+    Новые строки архивного периода добавляются в разделы своих годов, уже имеющиеся
+    в разделе - повторы, остальные загружаются как обычно
+    """
+    upload(client, "2023-05-01;Еда;100\n2024-02-01;Еда;200")
+    archive_before(test_db.bind, 2024)
+
+    response = upload(client, "2023-06-01;Еда;300\n2023-05-01;Еда;100\n2022-01-01;Еда;1\n2024-03-01;Еда;400")
+
+    assert "Обнаружены ошибки" not in response.text
+    assert "Добавлено записей: <strong>3</strong>" in response.text
+    assert "Пропущено повторов уже загруженных строк: <strong>1</strong>" in response.text
+    assert [e.iso_date.year for e in test_db.query(Expense).order_by(Expense.id)] == [2024, 2024]
+    assert partitions.years() == (2022, 2023)
+    assert stat.S_IMODE(os.stat(partitions.path(2023)).st_mode) == 0o444
+    report = build_report(test_db)
+    assert report["total"] == 1001.0
+    assert build_report(test_db, date(2023, 6, 1), date(2023, 6, 30))["total"] == 300.0
+    items = collect_pages(client)
+    assert [item["date"] for item in items] == ["2022-01-01", "2023-05-01", "2023-06-01", "2024-02-01", "2024-03-01"]
+    assert len({item["id"] for item in items}) == 5
+    rebuild_rollup(test_db.connection())
+    assert build_report(test_db) == report
+    test_db.rollback()
+    archived_id = partitions.max_id(2023)
+
+    # Откат транзакции не меняет раздел; коммит публикует новую копию
+    row = {"date": "2023-07-01", "category": "Еда", "amount": 50.0, "comment": None, "iso_date": date(2023, 7, 1)}
+    assert write_batch(test_db, [dict(row)]) == 1
+    test_db.rollback()
+    assert partitions.max_id(2023) == archived_id
+    assert build_report(test_db, date(2023, 7, 1), date(2023, 7, 31))["total"] == 0
+    assert not os.path.exists(partitions.path(2023) + ".pending")
+    assert write_batch(test_db, [dict(row)]) == 1
+    test_db.commit()
+    assert build_report(test_db, date(2023, 7, 1), date(2023, 7, 31))["total"] == 50.0
+    assert partitions.max_id(2023) > archived_id
+    assert test_db.query(Expense).count() == 2
+
+
+def test_archive_year_order(test_db, partitions):
+    """Годы переносятся по порядку и только один раз"""
+    for day in ("2022-01-10", "2023-01-10"):
+        test_db.add(Expense(date=day, category="Еда", amount=1.0))
+    test_db.commit()
+
+    with pytest.raises(ValueError):
+        archive_year(test_db.bind, 2023)
+    assert archive_year(test_db.bind, 2022) == 1
+    with pytest.raises(ValueError):
+        archive_year(test_db.bind, 2022)
+    assert archive_year(test_db.bind, 2023) == 1
+    assert test_db.query(Expense).count() == 0
+
+
+def test_archived_ids_are_not_reused(client, test_db, partitions):
+    """id строк, перенесенных в архив, не выдаются новым строкам"""
+    upload(client, "2024-03-01;Еда;1\n2023-06-01;Еда;2")
+    archive_before(test_db.bind, 2024)
+    upload(client, "2024-04-01;Еда;3")
+
+    ids = [item["id"] for item in collect_pages(client)]
+    assert len(ids) == len(set(ids)) == 3
+
+
+def test_rows_added_during_archive_copy(test_db, partitions, monkeypatch):
+    """Строки года, загруженные во время копирования (без блокировки записи), тоже переносятся"""
+    test_db.add(Expense(date="2023-01-10", category="Еда", amount=1.0))
+    test_db.commit()
+    copy_rows = partitions_module._copy_rows
+
+    def copy_and_upload(conn, target, stmt):
+        result = copy_rows(conn, target, stmt)
+        if copy_and_upload.first:
+            copy_and_upload.first = False
+            with test_db.bind.begin() as other:
+                other.execute(Expense.__table__.insert(), [
+                    {"date": "2023-12-31", "category": "Еда", "amount": 2.0, "iso_date": date(2023, 12, 31)},
+                ])
+        return result
+    copy_and_upload.first = True
+    monkeypatch.setattr(partitions_module, "_copy_rows", copy_and_upload)
+
+    assert archive_year(test_db.bind, 2023) == 2
+    assert test_db.query(Expense).count() == 0
+    assert partitions.max_id(2023) == 2
@@ -0,0 +1,116 @@
+"""
+Тесты для бэкендов генерации PDF
+"""
+import pytest
+from jinja2 import Environment, FileSystemLoader
+
+from config import TEMPLATES_DIR
+from services.pdf import FpdfRenderer, PdfRenderer, WkhtmltopdfRenderer, create_renderer
+
+CONTEXT = {
+    "total": 1700.0,
+    "avg": 425.0,
+    "month_stats": [
+        {"month": "2024-01", "sum": 900.0, "avg": 300.0},
+        {"month": "2024-02", "sum": 800.0, "avg": 800.0},
+    ],
+    "category_stats": [
+        {"category": "Еда", "sum": 1500.0, "avg": 500.0},
+        {"category": "Транспорт", "sum": 200.0, "avg": 200.0},
+    ],
+    "generated_at": "15.01.2024 12:00",
+    "current_year": 2024,
+}
+
+
+@pytest.fixture
+def env():
+    """Окружение Jinja с шаблонами приложения"""
+    return Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True)
+
+
+def test_create_renderer_by_name(env):
+    """Выбор бэкенда по имени из конфигурации"""
+    assert isinstance(create_renderer(env, "wkhtmltopdf"), WkhtmltopdfRenderer)
+    assert isinstance(create_renderer(env, "fpdf"), FpdfRenderer)
+    with pytest.raises(ValueError):
+        create_renderer(env, "unknown")
+
+
+def test_fpdf_renderer_checks_font_path(env, monkeypatch, tmp_path):
+    """Неверный путь к шрифту - ошибка настройки при создании бэкенда"""
+    import services.pdf as pdf_module
+    missing = str(tmp_path / "missing.ttf")
+    monkeypatch.setattr(pdf_module, "PDF_FONT_PATH", missing)
+
+    with pytest.raises(ValueError, match=f"PDF_FONT_PATH: файл шрифта не найден: {missing}"):
+        create_renderer(env, "fpdf")
+
+
+def test_renderer_must_implement_interface():
+    """Бэкенд без render или cache_token не создается"""
+    class Incomplete(PdfRenderer):
+        def render(self, context):
+            return b""
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_cache_tokens_differ_between_backends(env):
+    """Кэш PDF разных бэкендов не пересекается"""
+    assert create_renderer(env, "wkhtmltopdf").cache_token() != create_renderer(env, "fpdf").cache_token()
+
+
+def test_wkhtmltopdf_renderer_passes_template_html(env, monkeypatch):
+    """HTML-бэкенд рендерит report.html.j2 и передает его в pdfkit"""
+    import pdfkit
+
+    captured = {}
+
+    def fake_from_string(html, output_path, configuration=None):
+        captured["html"] = html
+        captured["output_path"] = output_path
+        return b"%PDF-1.4"
+
+    monkeypatch.setattr(pdfkit, "configuration", lambda **kwargs: None)
+    monkeypatch.setattr(pdfkit, "from_string", fake_from_string)
+
+    assert WkhtmltopdfRenderer(env).render(CONTEXT) == b"%PDF-1.4"
+    assert captured["output_path"] is False
+    assert "1700.00" in captured["html"]
+    assert "Транспорт" in captured["html"]
+
+
+def test_fpdf_renderer_produces_pdf():
+    """Встроенный бэкенд строит PDF без внешних программ"""
+    pytest.importorskip("fpdf")
+
+    data = FpdfRenderer().render(CONTEXT)
+    assert data.startswith(b"%PDF")
+    assert len(data) > 1000
+
+
+def test_fpdf_renderer_keeps_characters_outside_subset(monkeypatch, tmp_path):
+    """Символы вне урезанного шрифта (ґ, CJK) не теряются: берется полный шрифт"""
+    pytest.importorskip("fpdf")
+    import services.pdf as pdf_module
+    monkeypatch.setattr(pdf_module, "PDF_CACHE_DIR", str(tmp_path))
+
+    renderer = FpdfRenderer()
+    subset_fonts = renderer._font_paths("Еда")
+    assert subset_fonts[0].startswith(str(tmp_path))
+    assert renderer._font_paths("Ґанок") == (pdf_module.PDF_FONT_PATH, pdf_module.PDF_FONT_BOLD_PATH)
+    assert renderer._font_paths("食品")[0] == pdf_module.PDF_FONT_PATH
+    assert renderer._font_paths("Транспорт") == subset_fonts
+
+    context = dict(CONTEXT, category_stats=[{"category": "Ґанок", "sum": 1.0, "avg": 1.0}])
+    assert renderer.render(context).startswith(b"%PDF")
+
+
+def test_fpdf_renderer_empty_report():
+    """Встроенный бэкенд справляется с пустым отчетом"""
+    pytest.importorskip("fpdf")
+
+    context = dict(CONTEXT, total=0, avg=0, month_stats=[], category_stats=[])
+    assert FpdfRenderer().render(context).startswith(b"%PDF")
@@ -0,0 +1,87 @@
+"""
+Тесты для дискового кэша PDF-отчетов
+"""
+import asyncio
+import os
+
+from services.pdf_cache import PdfCache
+
+
+def test_pdf_cache_put_and_get(tmp_path):
+    """Сохраненный PDF находится по ключу"""
+    cache = PdfCache(str(tmp_path), max_bytes=1024)
+    key = cache.make_key(1, (), "tpl")
+
+    assert cache.get(key) is None
+    path = cache.put(key, b"%PDF data")
+    assert cache.get(key) == path
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF data"
+
+
+def test_pdf_cache_key_depends_on_inputs():
+    """Ключ зависит от версии данных, параметров и шаблона"""
+    base = PdfCache.make_key(1, (), "tpl")
+    assert base != PdfCache.make_key(2, (), "tpl")
+    assert base != PdfCache.make_key(1, ("Еда",), "tpl")
+    assert base != PdfCache.make_key(1, (), "tpl2")
+
+
+def test_pdf_cache_evicts_least_recently_used(tmp_path):
+    """При превышении лимита удаляются давно не запрашиваемые файлы"""
+    cache = PdfCache(str(tmp_path), max_bytes=250)
+    paths = {}
+    for i, key in enumerate(["a", "b"]):
+        paths[key] = cache.put(key, b"x" * 100)
+        os.utime(paths[key], (1000 + i, 1000 + i))
+
+    cache.get("a")  # "a" запрошен последним
+    cache.put("c", b"x" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_pdf_cache_renders_once_for_concurrent_requests(tmp_path):
+    """Одновременные промахи по одному ключу рендерят PDF один раз"""
+    cache = PdfCache(str(tmp_path))
+    calls = []
+
+    async def render():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"%PDF"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_render("k", render) for _ in range(5)))
+
+    paths = asyncio.run(run())
+    assert len(set(paths)) == 1
+    assert len(calls) == 1
+
+
+def test_pdf_cache_lock_kept_while_requests_wait(tmp_path):
+    """Запрос, пришедший во время повторного рендеринга после ошибки, ждет его, а не рендерит сам"""
+    cache = PdfCache(str(tmp_path))
+    calls = []
+
+    async def render():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RuntimeError("сбой рендеринга")
+        return b"%PDF"
+
+    async def request(delay):
+        await asyncio.sleep(delay)
+        return await cache.get_or_render("k", render)
+
+    async def run():
+        return await asyncio.gather(request(0), request(0.01), request(0.07), return_exceptions=True)
+
+    first, second, third = asyncio.run(run())
+    assert isinstance(first, RuntimeError)
+    assert second == third
+    assert len(calls) == 2
+    assert cache._locks == {}
@@ -0,0 +1,84 @@
+"""
+Тесты для журнала медленных запросов
+"""
+from io import BytesIO
+
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, text
+
+from database import profile_queries
+from models import Expense
+from services.query_log import SlowQueryLog, format_plan, is_full_scan
+
+
+def test_format_plan_and_full_scan():
+    """План выводится с отступами; SCAN без индекса - полный просмотр"""
+    plan = format_plan([(2, 0, 0, "SCAN expenses"), (5, 2, 0, "USE TEMP B-TREE FOR GROUP BY")])
+    assert plan == ["SCAN expenses", "  USE TEMP B-TREE FOR GROUP BY"]
+    assert is_full_scan(plan)
+    assert not is_full_scan(["SEARCH expenses USING INDEX ix_expenses_iso_date (iso_date>?)"])
+    assert not is_full_scan(["SCAN expenses USING COVERING INDEX ix_expenses_category_iso_date"])
+
+
+def test_slow_queries_recorded_with_plan(test_db, sample_expenses):
+    """Запросы дольше порога записываются с параметрами и планом"""
+    log = SlowQueryLog(threshold_ms=0, size=4)
+    profile_queries(test_db.bind, "test", log)
+
+    month = func.substr(Expense.iso_date, 1, 7)
+    test_db.execute(select(month, func.sum(Expense.amount)).where(Expense.category == "Еда").group_by(month)).all()
+    test_db.execute(select(Expense.id).where(Expense.iso_date >= "2024-02-01")).all()
+    test_db.execute(select(func.count(Expense.id)).where(Expense.comment == "Кино")).all()
+
+    queries = log.worst()
+    assert len(queries) <= 4
+    assert [q["duration_ms"] for q in queries] == sorted((q["duration_ms"] for q in queries), reverse=True)
+
+    group_by = next(q for q in queries if "GROUP BY" in q["sql"])
+    assert "Еда" in group_by["parameters"]
+    assert any("GROUP BY" in line for line in group_by["plan"])
+    unindexed = next(q for q in queries if "comment =" in q["sql"])
+    assert unindexed["full_scan"]
+    ranged = next(q for q in queries if "iso_date >=" in q["sql"])
+    assert not ranged["full_scan"]
+    assert any("USING" in line for line in ranged["plan"])
+
+
+def test_fast_queries_not_recorded(test_db):
+    """Быстрые запросы и DDL без плана не мешают работе"""
+    log = SlowQueryLog(threshold_ms=10_000)
+    profile_queries(test_db.bind, "test", log)
+    test_db.execute(text("SELECT 1"))
+    assert log.worst() == []
+
+
+def test_debug_endpoints_disabled_by_default(client):
+    """Без DEBUG_ENDPOINTS отладочные эндпоинты не подключены"""
+    assert client.get("/debug/slow-queries").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_slow_queries_endpoint(client, test_db, monkeypatch):
+    """Эндпоинт отдает журнал без значений параметров; executemany записывается без плана"""
+    from routers import debug
+    from services.query_log import slow_query_log
+
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+    slow_query_log.clear()
+    profile_queries(test_db.bind, "writer", slow_query_log)
+
+    files = {"file": ("e.txt", BytesIO(b"2024-01-15;Food;500\n2024-01-16;Food;100"), "text/plain")}
+    client.post("/upload", files=files)
+
+    debug_app = FastAPI()
+    debug_app.include_router(debug.router)
+    debug_client = TestClient(debug_app)
+    body = debug_client.get("/debug/slow-queries").json()
+    assert body["threshold_ms"] == 0
+    assert body["queries"]
+    assert any(q["plan"] for q in body["queries"])
+    assert all("parameters" not in q and q["parameter_sets"] >= 1 for q in body["queries"])
+    assert "Food" not in str(body)
+
+    assert debug_client.delete("/debug/slow-queries").status_code == status.HTTP_204_NO_CONTENT
+    assert debug_client.get("/debug/slow-queries").json()["queries"] == []
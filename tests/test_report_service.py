@@ -0,0 +1,127 @@
+"""
+Тесты для сервиса построения отчетов
+"""
+import pytest
+from datetime import date
+
+from config import QUANTILE_ACCURACY
+from services.reports import summarize
+
+
+def test_summarize_all_slices_from_one_pass():
+    """Все разрезы отчета сворачиваются из строк уровня (месяц, категория)"""
+    rows = [
+        ("2024-01", "Еда", 2, 700.0, 200.0, 500.0),
+        ("2024-01", "Транспорт", 1, 200.0, 200.0, 200.0),
+        ("2024-02", "Еда", 1, 800.0, 800.0, 800.0),
+    ]
+    report = summarize(rows)
+
+    assert report["total"] == 1700.0
+    assert report["count"] == 4
+    assert report["avg"] == 425.0
+
+    assert [(g["month"], g["sum"], g["count"]) for g in report["by_month"]] == [
+        ("2024-01", 900.0, 3),
+        ("2024-02", 800.0, 1),
+    ]
+    food = report["by_category"][0]
+    assert (food["category"], food["sum"], food["min"], food["max"]) == ("Еда", 1500.0, 200.0, 800.0)
+    assert food["avg"] == 500.0
+    assert len(report["by_month_category"]) == 3
+    assert report["by_month_category"][0]["avg"] == 350.0
+
+
+def test_summarize_empty():
+    """Пустые данные дают нулевые итоги"""
+    report = summarize([])
+    assert report["total"] == 0
+    assert report["avg"] == 0
+    assert report["by_month"] == []
+    assert report["by_category"] == []
+    assert report["p50"] is None
+
+
+def test_summarize_merges_sketches():
+    """Квантили групп считаются слиянием скетчей строк; без скетчей - None"""
+    from services.sketch import QuantileSketch
+
+    def sketch(*values):
+        s = QuantileSketch()
+        s.update(values)
+        return s.to_bytes()
+
+    rows = [
+        ("2024-01", "Еда", 3, 700.0, 100.0, 500.0, sketch(100, 100, 500)),
+        ("2024-02", "Еда", 2, 1600.0, 800.0, 800.0, sketch(800, 800)),
+        ("2024-02", "Транспорт", 1, 50.0, 50.0, 50.0),
+    ]
+    report = summarize(rows)
+
+    food = report["by_category"][0]
+    assert food["p50"] == pytest.approx(500, rel=QUANTILE_ACCURACY)
+    assert food["p99"] == pytest.approx(800, rel=QUANTILE_ACCURACY)
+    assert report["by_month"][0]["p50"] == pytest.approx(100, rel=QUANTILE_ACCURACY)
+    assert report["by_category"][1]["p50"] is None
+    assert "sketch" not in food
+
+
+def brute_force(expenses, date_from, date_to, category):
+    """Итоги по строкам напрямую, без сводной таблицы"""
+    rows = [
+        e for e in expenses
+        if (date_from is None or e.iso_date >= date_from)
+        and (date_to is None or e.iso_date <= date_to)
+        and (category is None or e.category == category)
+    ]
+    return sum(e.amount for e in rows), len(rows)
+
+
+def brute_force_median(expenses, date_from, date_to, category):
+    """Точная медиана (с тем же определением ранга, что и в скетче)"""
+    amounts = sorted(
+        e.amount for e in expenses
+        if (date_from is None or e.iso_date >= date_from)
+        and (date_to is None or e.iso_date <= date_to)
+        and (category is None or e.category == category)
+    )
+    return amounts[(len(amounts) - 1) // 2] if amounts else None
+
+
+@pytest.mark.parametrize("date_from,date_to,category", [
+    (None, None, None),
+    (None, None, "Еда"),
+    (date(2024, 1, 1), date(2024, 2, 29), None),
+    (date(2024, 1, 16), date(2024, 3, 4), None),
+    (date(2024, 1, 16), date(2024, 1, 31), "Транспорт"),
+    (date(2024, 2, 11), None, "Еда"),
+    (None, date(2024, 2, 12), None),
+    (date(2024, 3, 1), date(2024, 1, 1), None),
+])
+def test_build_report_filters_match_rows(test_db, sample_expenses, date_from, date_to, category):
+    """Отчет за период (сводная таблица + неполные месяцы из expenses) совпадает с подсчетом по строкам"""
+    from services.reports import build_report
+    from services.rollup import rebuild_rollup
+
+    rebuild_rollup(test_db.connection())
+    report = build_report(test_db, date_from, date_to, category)
+
+    assert (report["total"], report["count"]) == brute_force(sample_expenses, date_from, date_to, category)
+    median = brute_force_median(sample_expenses, date_from, date_to, category)
+    if median is None:
+        assert report["p50"] is None
+    else:
+        assert report["p50"] == pytest.approx(median, rel=QUANTILE_ACCURACY)
+
+
+def test_split_period():
+    """Целые месяцы берутся из сводной таблицы, крайние неполные - из expenses"""
+    from services.reports import split_period
+
+    assert split_period(None, None) == ((None, None), [])
+    assert split_period(date(2024, 1, 1), date(2024, 3, 31)) == (("2024-01", "2024-04"), [])
+    assert split_period(date(2024, 1, 15), date(2024, 3, 10)) == (
+        ("2024-02", "2024-03"),
+        [(date(2024, 1, 15), date(2024, 1, 31)), (date(2024, 3, 1), date(2024, 3, 10))],
+    )
+    assert split_period(date(2024, 1, 15), date(2024, 2, 10)) == (None, [(date(2024, 1, 15), date(2024, 2, 10))])
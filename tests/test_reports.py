@@ -0,0 +1,304 @@
+"""
+Тесты для роутера отчетов
+"""
+import pytest
+from io import BytesIO
+from fastapi import status
+
+
+def upload(client, text):
+    """Загрузка файла с расходами через API"""
+    files = {"file": ("expenses.txt", BytesIO(text.encode("utf-8")), "text/plain")}
+    response = client.post("/upload", files=files)
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_report_empty(client):
+    """Отчет по пустой БД"""
+    response = client.get("/report")
+    assert response.status_code == status.HTTP_200_OK
+    assert "Нет данных для отображения" in response.text
+
+
+def test_report_groups_months_for_both_date_formats(client):
+    """Даты в формате DD.MM.YYYY попадают в правильный месяц"""
+    upload(client, "2024-01-15;Еда;500\n20.01.2024;Еда;300\n05.02.2024;Транспорт;200")
+
+    response = client.get("/report")
+    assert response.status_code == status.HTTP_200_OK
+    assert "2024-01" in response.text
+    assert "2024-02" in response.text
+    assert "20.01.2" not in response.text
+    assert "800.00" in response.text
+
+
+def test_report_reads_rollup(client, test_db):
+    """Загрузка обновляет сводную таблицу, отчет строится по ней"""
+    from models import ExpenseRollup
+
+    upload(client, "2024-01-15;Еда;500\n2024-01-20;Еда;100\n2024-02-05;Еда;200")
+    upload(client, "2024-01-25;Еда;50")
+
+    rows = test_db.query(ExpenseRollup).order_by(ExpenseRollup.month).all()
+    assert [(r.month, r.row_count, r.total, r.min_amount, r.max_amount) for r in rows] == [
+        ("2024-01", 3, 650.0, 50.0, 500.0),
+        ("2024-02", 1, 200.0, 200.0, 200.0),
+    ]
+
+    response = client.get("/report")
+    assert "850.00" in response.text   # общая сумма
+    assert "212.50" in response.text   # средний расход
+
+
+def test_rollup_sketches_merge_across_uploads(client, test_db):
+    """Скетчи, дополненные по загрузкам, совпадают с построенными пересчетом"""
+    from models import ExpenseRollup
+    from services.rollup import rebuild_rollup
+
+    upload(client, "2024-01-15;Еда;100\n2024-01-16;Еда;200")
+    upload(client, "2024-01-17;Еда;300\n2024-01-18;Еда;900\n2024-02-01;Еда;50")
+    incremental = {(r.month, r.category): r.sketch for r in test_db.query(ExpenseRollup).all()}
+
+    rebuild_rollup(test_db.connection())
+    test_db.commit()
+    rebuilt = {(r.month, r.category): r.sketch for r in test_db.query(ExpenseRollup).all()}
+    assert incremental == rebuilt
+
+    response = client.get("/report")
+    assert "Медианный расход" in response.text
+    assert "198.37 ₽" in response.text  # медиана 200 с погрешностью скетча
+
+
+def test_rebuild_rollup_recovers_drift(test_db, sample_expenses):
+    """Пересчет сводной таблицы учитывает строки, вставленные в обход загрузки"""
+    from models import ExpenseRollup
+    from services.rollup import rebuild_rollup
+
+    assert test_db.query(ExpenseRollup).count() == 0
+    rebuild_rollup(test_db.connection())
+    test_db.commit()
+
+    totals = {(r.month, r.category): r.total for r in test_db.query(ExpenseRollup).all()}
+    assert totals[("2024-01", "Еда")] == 500.0
+    assert totals[("2024-02", "Развлечения")] == 1500.0
+    assert sum(totals.values()) == 3600.0
+
+
+def test_report_etag_not_modified(client):
+    """Повторный запрос с If-None-Match получает 304 без тела"""
+    upload(client, "2024-01-15;Еда;500")
+
+    first = client.get("/report")
+    etag = first.headers["etag"]
+
+    second = client.get("/report", headers={"If-None-Match": etag})
+    assert second.status_code == status.HTTP_304_NOT_MODIFIED
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_report_not_modified_without_build(client, monkeypatch):
+    """304 отдается без построения отчета, даже если в кэше процесса его нет"""
+    import routers.reports as reports_router
+    from services.report_cache import report_cache
+
+    upload(client, "2024-01-15;Еда;500")
+    etag = client.get("/report").headers["etag"]
+    report_cache.clear()  # как у другого воркера или после вытеснения
+
+    calls = []
+    original = reports_router.build_report
+
+    def counting_build(db, **filters):
+        calls.append(1)
+        return original(db, **filters)
+
+    monkeypatch.setattr(reports_router, "build_report", counting_build)
+    response = client.get("/report", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert calls == []
+
+
+def test_report_etag_changes_after_upload(client):
+    """После загрузки версия данных и ETag меняются, отчет пересчитывается"""
+    upload(client, "2024-01-15;Еда;500")
+    etag = client.get("/report").headers["etag"]
+
+    upload(client, "2024-01-16;Еда;250")
+    response = client.get("/report", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert "750.00" in response.text
+
+
+def test_report_cached_between_uploads(client, monkeypatch):
+    """Без новых загрузок данные отчета берутся из кэша"""
+    import routers.reports as reports_router
+
+    calls = []
+    original = reports_router.build_report
+
+    def counting_build(db, **filters):
+        calls.append(1)
+        return original(db, **filters)
+
+    monkeypatch.setattr(reports_router, "build_report", counting_build)
+    upload(client, "2024-01-15;Еда;500")
+    client.get("/report")
+    client.get("/report")
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def fake_renderer(monkeypatch, tmp_path):
+    """Подмена бэкенда PDF: фиксирует контекст и поток, в котором шел рендеринг"""
+    import threading
+    import time
+    import routers.reports as reports_router
+    from services.pdf import PdfRenderer
+    from services.pdf_cache import pdf_cache
+
+    calls = []
+
+    class FakeRenderer(PdfRenderer):
+        name = "fake"
+
+        def render(self, context):
+            calls.append({"context": context, "thread": threading.current_thread().name})
+            time.sleep(0.2)
+            return b"%PDF-1.4 fake"
+
+        def cache_token(self):
+            return self.name
+
+    monkeypatch.setattr(pdf_cache, "directory", str(tmp_path))
+    monkeypatch.setattr(reports_router, "pdf_renderer", FakeRenderer())
+    return calls
+
+
+def test_report_pdf_rendered_in_worker_pool(client, fake_renderer):
+    """PDF рендерится в пуле воркеров"""
+    upload(client, "2024-01-15;Еда;500")
+
+    response = client.get("/report/pdf")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/pdf"
+    assert 'filename="report.pdf"' in response.headers["content-disposition"]
+    assert response.content == b"%PDF-1.4 fake"
+
+    assert len(fake_renderer) == 1
+    assert fake_renderer[0]["thread"].startswith("pdf-render")
+    assert fake_renderer[0]["context"]["total"] == 500.0
+
+
+def test_report_pdf_does_not_block_event_loop(client, fake_renderer):
+    """Пока PDF рендерится, другие эндпоинты отвечают без ожидания"""
+    import asyncio
+    import time
+    import httpx
+    from main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            finished = {}
+
+            async def timed(name, url):
+                response = await ac.get(url)
+                finished[name] = time.perf_counter()
+                return response
+
+            pdf, page = await asyncio.gather(timed("pdf", "/report/pdf"), timed("page", "/"))
+            return pdf, page, finished
+
+    pdf, page, finished = asyncio.run(run())
+    assert pdf.status_code == status.HTTP_200_OK
+    assert page.status_code == status.HTTP_200_OK
+    assert finished["page"] < finished["pdf"]
+
+
+def test_report_pdf_served_from_cache(client, fake_renderer):
+    """Повторное скачивание между загрузками не запускает рендеринг"""
+    upload(client, "2024-01-15;Еда;500")
+
+    first = client.get("/report/pdf")
+    second = client.get("/report/pdf")
+    assert first.content == second.content == b"%PDF-1.4 fake"
+    assert len(fake_renderer) == 1
+
+    upload(client, "2024-01-16;Еда;100")
+    client.get("/report/pdf")
+    assert len(fake_renderer) == 2
+    assert fake_renderer[1]["context"]["total"] == 600.0
+
+
+def test_report_filters(client):
+    """Фильтры по периоду и категории; ссылка на PDF сохраняет фильтры"""
+    upload(client, "2024-01-15;Еда;500\n2024-02-10;Еда;800\n2024-02-15;Транспорт;200\n2024-03-05;Еда;600")
+
+    response = client.get("/report", params={"from": "2024-02-01", "to": "2024-03-01", "category": "Еда"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "800.00" in response.text
+    assert "1900.00" not in response.text
+    assert "Период: с 01.02.2024 по 01.03.2024, категория: Еда" in response.text
+    assert 'href="/report/pdf?from=2024-02-01&amp;to=2024-03-01&amp;category=%D0%95%D0%B4%D0%B0"' in response.text
+
+    # Пустые поля формы - без фильтра
+    assert "2100.00" in client.get("/report?from=&to=&category=").text
+    assert client.get("/report?from=01.02.2024").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_report_filters_have_own_etag(client):
+    """Отчеты с разными фильтрами кэшируются и проверяются по ETag независимо"""
+    upload(client, "2024-01-15;Еда;500\n2024-02-10;Еда;800")
+
+    full = client.get("/report").headers["etag"]
+    filtered = client.get("/report?from=2024-02-01").headers["etag"]
+    assert full != filtered
+
+    response = client.get("/report?from=2024-02-01", headers={"If-None-Match": filtered})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get("/report", headers={"If-None-Match": filtered}).status_code == status.HTTP_200_OK
+
+
+def test_report_pdf_filters(client, fake_renderer):
+    """PDF за период рендерится и кэшируется отдельно от полного"""
+    upload(client, "2024-01-15;Еда;500\n2024-02-10;Еда;800")
+
+    client.get("/report/pdf")
+    client.get("/report/pdf?from=2024-02-01")
+    client.get("/report/pdf?from=2024-02-01")
+
+    assert [call["context"]["total"] for call in fake_renderer] == [1300.0, 800.0]
+    assert fake_renderer[1]["context"]["filter_label"] == "Период: с 01.02.2024"
+
+
+def test_stream_template_matches_render():
+    """Потоковый рендеринг дает тот же HTML блоками не меньше chunk_size"""
+    from templating import stream_template, templates
+
+    context = {
+        "request": None, "total": 100.0, "avg": 50.0, "median": 50.0, "by_month": [],
+        "by_category": [], "filter_label": "", "pdf_url": "/report/pdf",
+        "by_month_category": [
+            {"month": "2024-01", "category": f"Категория {i}", "sum": 1.0, "avg": 1.0}
+            for i in range(200)
+        ],
+    }
+    chunks = list(stream_template("report.html", context, "test", chunk_size=4096))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 4096 for chunk in chunks[:-1])
+    assert b"".join(chunks).decode("utf-8") == templates.get_template("report.html").render(context)
+
+
+def test_report_page_is_streamed(client):
+    """Отчет отдается потоком (без Content-Length), с ETag"""
+    upload(client, "2024-01-15;Еда;500")
+
+    response = client.get("/report")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert "content-length" not in response.headers
+    assert "etag" in response.headers
+    assert "500.00" in response.text
@@ -0,0 +1,76 @@
+"""
+Тесты для скетча квантилей
+"""
+import math
+import random
+
+import pytest
+
+from services.sketch import QuantileSketch
+
+
+def exact_quantile(values, q):
+    """Точный квантиль с тем же определением ранга, что и в скетче"""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_quantiles_within_relative_accuracy(seed):
+    """Квантили отличаются от точных не больше чем на относительную погрешность"""
+    rng = random.Random(seed)
+    values = [round(rng.lognormvariate(6, 1.5), 2) for _ in range(20_000)]
+    sketch = QuantileSketch(accuracy=0.01)
+    sketch.update(values)
+
+    assert sketch.count == len(values)
+    for q in (0.0, 0.5, 0.9, 0.99, 1.0):
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_merge_equals_single_sketch():
+    """Слияние скетчей частей дает тот же результат, что и скетч всех значений"""
+    rng = random.Random(1)
+    values = [rng.uniform(1, 10_000) for _ in range(5_000)]
+    whole = QuantileSketch()
+    whole.update(values)
+
+    merged = QuantileSketch()
+    for start in range(0, len(values), 700):
+        part = QuantileSketch()
+        part.update(values[start:start + 700])
+        merged.merge(part)
+
+    assert merged.bins == whole.bins
+    assert merged.quantile(0.5) == whole.quantile(0.5)
+
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(accuracy=0.05))
+
+
+def test_serialization_round_trip():
+    """to_bytes / from_bytes сохраняют состояние"""
+    sketch = QuantileSketch()
+    sketch.update([0, 0.01, 1, 500, 500, 1e9])
+    restored = QuantileSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.bins == sketch.bins
+    assert restored.zero_count == sketch.zero_count
+    assert [restored.quantile(q) for q in (0, 0.5, 1)] == [sketch.quantile(q) for q in (0, 0.5, 1)]
+
+    with pytest.raises(ValueError):
+        QuantileSketch.from_bytes(b"\x09" + sketch.to_bytes()[1:])
+
+
+def test_special_values():
+    """NaN и бесконечность пропускаются, неположительные значения считаются нулем"""
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+
+    sketch.update([math.nan, math.inf, -5, 0])
+    assert sketch.count == 2
+    assert sketch.quantile(0.5) == 0.0
+
+    sketch.update([100, 100, 100])
+    assert sketch.quantile(1.0) == pytest.approx(100, rel=0.01)
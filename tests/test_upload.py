@@ -1,6 +1,7 @@
 """
 Тесты для роутера загрузки файлов
 """
+import os
 import pytest
 from io import BytesIO
 from fastapi import status
@@ -187,3 +188,99 @@ invalid-date;Транспорт;200.0;Метро
     assert expenses[0].amount == 500.0
     assert expenses[1].amount == 300.0
 
+
+
+def test_upload_parallel_mode(client, test_db, monkeypatch):
+    """Параллельный разбор в пуле процессов дает тот же результат (и те же номера строк)"""
+    import services.jobs as jobs
+    monkeypatch.setattr(jobs, "PARSE_WORKERS", 2)
+
+    file_content = """2024-01-15;Еда;500.0;Продукты
+invalid-date;Транспорт;200.0;Метро
+2024-02-10;Развлечения;-100.0;Кино
+2024-03-05;Еда;300.0;Кафе""".encode("utf-8")
+
+    files = {"file": ("expenses.txt", BytesIO(file_content), "text/plain")}
+    response = client.post("/upload?parallel=true", files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "Строка 2: Неверная дата: invalid-date;Транспорт;200.0;Метро" in response.text
+
+    expenses = test_db.query(Expense).order_by(Expense.id).all()
+    assert [e.amount for e in expenses] == [500.0, 300.0]
+
+
+def test_upload_parallel_mode_single_worker(client, test_db, monkeypatch):
+    """С одним процессом разбора параллельный режим не включается"""
+    import services.jobs as jobs
+    monkeypatch.setattr(jobs, "PARSE_WORKERS", 1)
+    monkeypatch.setattr(jobs, "iter_records_parallel", None)
+
+    files = {"file": ("expenses.txt", BytesIO("2024-01-15;Еда;500.0".encode("utf-8")), "text/plain")}
+    response = client.post("/upload?parallel=true", files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert test_db.query(Expense).count() == 1
+
+
+@pytest.fixture
+def job_spool(tmp_path, monkeypatch):
+    """Каталог фоновых загрузок во временной директории"""
+    from services.jobs import job_manager
+    monkeypatch.setattr(job_manager, "spool_dir", str(tmp_path))
+    return job_manager
+
+
+def test_upload_job(client, test_db, job_spool):
+    """Фоновая загрузка: id сразу, ход загрузки по GET /upload/jobs/{id}"""
+    file_content = """2024-01-15;Еда;500.0;Продукты
+invalid-date;Транспорт;200.0;Метро
+2024-03-05;Еда;300.0;Кафе""".encode("utf-8")
+
+    files = {"file": ("expenses.txt", BytesIO(file_content), "text/plain")}
+    response = client.post("/upload/jobs", files=files)
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["id"]
+    assert response.headers["location"].endswith(f"/upload/jobs/{job_id}")
+
+    job_spool.wait()
+    job = client.get(f"/upload/jobs/{job_id}").json()
+    assert job["status"] == "done"
+    assert job["rows_processed"] == 3
+    assert job["rows_inserted"] == 2
+    assert job["error_count"] == 1
+    assert job["errors"] == ["Строка 2: Неверная дата: invalid-date;Транспорт;200.0;Метро"]
+    assert test_db.query(Expense).count() == 2
+    assert list(os.scandir(job_spool.spool_dir)) == []  # файл очереди удален
+
+
+def test_upload_job_not_found(client):
+    """Неизвестная задача - 404"""
+    response = client.get("/upload/jobs/unknown")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_upload_same_file_twice(client, test_db):
+    """Повторная загрузка того же файла пропускается целиком"""
+    file_content = "2024-01-15;Еда;500.0;Продукты\n2024-01-20;Транспорт;200.0;Метро".encode("utf-8")
+
+    for _ in range(2):
+        files = {"file": ("expenses.txt", BytesIO(file_content), "text/plain")}
+        response = client.post("/upload", files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "Файл уже загружался" in response.text
+    assert test_db.query(Expense).count() == 2
+
+
+def test_upload_overlapping_file_skips_duplicates(client, test_db):
+    """Пересекающаяся выгрузка: уже загруженные строки пропускаются"""
+    first = "2024-01-15;Еда;500.0;Продукты\n2024-01-20;Транспорт;200.0;Метро".encode("utf-8")
+    second = "20.01.2024;Транспорт;200;Метро\n2024-02-01;Еда;300.0;Кафе".encode("utf-8")
+
+    client.post("/upload", files={"file": ("a.txt", BytesIO(first), "text/plain")})
+    response = client.post("/upload", files={"file": ("b.txt", BytesIO(second), "text/plain")})
+
+    assert "Пропущено повторов уже загруженных строк: <strong>1</strong>" in response.text
+    assert test_db.query(Expense).count() == 3